@@ -0,0 +1,262 @@
+import asyncio
+import functools
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import aiohttp
+from loguru import logger
+from pipecat.services.heygen.api import HeyGenApi, HeyGenSession, NewSessionRequest
+
+
+def _percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def create_session(api: HeyGenApi, request: NewSessionRequest) -> HeyGenSession:
+    """Create and start a HeyGen streaming session, as ``HeyGenClient`` does on setup."""
+    session = await api.new_session(request)
+    try:
+        await api.start_session(session.session_id)
+    except Exception:
+        await api.close_session(session.session_id)
+        raise
+    return session
+
+
+class _IdleSession:
+    def __init__(self, session: HeyGenSession, created_at: float):
+        self.session = session
+        self.created_at = created_at
+        self.kept_alive_at = created_at
+
+
+class AvatarSessionPool:
+    """Keeps ``size`` HeyGen streaming sessions created and started ahead of the calls needing them.
+
+    ``streaming.new`` + ``streaming.start`` are most of the avatar's time to first frame. The
+    pool runs them in the background for one ``request`` and hands a ready session to the
+    next call that asks for the same request; the call then owns it and closes it as usual,
+    and the pool creates a replacement. Waiting sessions get ``streaming.keep_alive`` every
+    ``keepalive_secs`` to stay under HeyGen's activity idle timeout, and are closed and
+    replaced after ``max_idle_secs`` so none is handed out near the end of its life. Pooled
+    sessions count against the account's concurrent session limit.
+
+    ``base_url`` points the pool (and the clients it serves) at another HeyGen API, e.g. the
+    stand-in of benchmarks/stand_ins.py.
+    """
+
+    def __init__(self, api_key: str, request: NewSessionRequest, *, size: int = 1,
+                 base_url: Optional[str] = None, keepalive_secs: float = 60.0,
+                 max_idle_secs: float = 600.0, check_interval_secs: float = 5.0):
+        self._api_key = api_key
+        self._request = request
+        self._size = size
+        self.base_url = base_url
+        self._keepalive = keepalive_secs
+        self._max_idle = max_idle_secs
+        self._check_interval = check_interval_secs
+        self._idle: Deque[_IdleSession] = deque()
+        self._creating = 0
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._api: Optional[HeyGenApi] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.recycled = 0
+        self.keepalives = 0
+        self.errors = 0
+        self._ttff: Dict[str, Deque[float]] = {"hit": deque(maxlen=500), "miss": deque(maxlen=500)}
+
+    def api(self, session: aiohttp.ClientSession) -> HeyGenApi:
+        api = HeyGenApi(self._api_key, session=session)
+        if self.base_url:
+            api.BASE_URL = self.base_url
+        return api
+
+    def start(self):
+        """Start filling the pool; a no-op when it is running or its size is 0."""
+        if self._size <= 0 or (self._task is not None and not self._task.done()):
+            return
+        if self._http is None:
+            self._http = aiohttp.ClientSession()
+            self._api = self.api(self._http)
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._maintain())
+
+    async def _add(self):
+        self._creating += 1
+        try:
+            session = await create_session(self._api, self._request)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Unable to pre-warm a HeyGen session: {e}")
+            return
+        finally:
+            self._creating -= 1
+        self._idle.append(_IdleSession(session, time.monotonic()))
+        self.created += 1
+        logger.debug(f"Pre-warmed HeyGen session {session.session_id}")
+
+    async def _close(self, session: HeyGenSession):
+        try:
+            await self._api.close_session(session.session_id)
+        except Exception as e:
+            logger.debug(f"Unable to close HeyGen session {session.session_id}: {e}")
+
+    async def _tend(self):
+        now = time.monotonic()
+        for idle in list(self._idle):
+            if idle not in self._idle:
+                continue  # handed out meanwhile
+            if now - idle.created_at >= self._max_idle:
+                self._idle.remove(idle)
+                self.recycled += 1
+                await self._close(idle.session)
+            elif now - idle.kept_alive_at >= self._keepalive:
+                try:
+                    await self._api._request(
+                        "/streaming.keep_alive", {"session_id": idle.session.session_id},
+                        expect_data=False,
+                    )
+                    idle.kept_alive_at = now
+                    self.keepalives += 1
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Dropping HeyGen session {idle.session.session_id}: {e}")
+                    if idle in self._idle:
+                        self._idle.remove(idle)
+
+    async def _maintain(self):
+        while True:
+            await self._tend()
+            missing = self._size - len(self._idle) - self._creating
+            if missing > 0:
+                await asyncio.gather(*(self._add() for _ in range(missing)))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def acquire(self, request: NewSessionRequest) -> Optional[HeyGenSession]:
+        """A started session for ``request``, or ``None`` when none is ready (the caller creates one)."""
+        if self._size <= 0:
+            return None
+        self.start()
+        self._wake.set()
+        if request == self._request and self._idle:
+            # Oldest first: it is the next one to be recycled.
+            self.hits += 1
+            return self._idle.popleft().session
+        self.misses += 1
+        return None
+
+    def record_first_frame(self, secs: float, *, hit: bool):
+        self._ttff["hit" if hit else "miss"].append(secs * 1000)
+
+    async def aclose(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._idle:
+            await self._close(self._idle.popleft().session)
+        if self._http:
+            await self._http.close()
+            self._http = None
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "size": self._size,
+            "ready": len(self._idle),
+            "creating": self._creating,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "created": self.created,
+            "recycled": self.recycled,
+            "keepalives": self.keepalives,
+            "errors": self.errors,
+            "first_frame_ms": {
+                kind: {
+                    "count": len(values),
+                    "p50": round(_percentile(values, 0.5)),
+                    "p95": round(_percentile(values, 0.95)),
+                }
+                for kind, values in self._ttff.items()
+            },
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def pooled_heygen_service_class():
+    """``PooledHeyGenVideoService``, defined on first use.
+
+    The HeyGen client pulls in LiveKit, which bot.py's import path does without.
+    """
+    from pipecat.services.heygen.client import HeyGenCallbacks, HeyGenClient
+    from pipecat.services.heygen.video import HEY_GEN_SAMPLE_RATE, HeyGenVideoService
+    from pipecat.transports.base_transport import TransportParams
+
+    class PooledHeyGenClient(HeyGenClient):
+        """HeyGenClient that takes a pre-warmed session from the pool before creating one."""
+
+        def __init__(self, *, pool: AvatarSessionPool, **kwargs):
+            super().__init__(**kwargs)
+            self._pool = pool
+            self._api = pool.api(self._api.session)
+            self.pooled = False
+
+        async def _initialize(self):
+            session = self._pool.acquire(self._session_request)
+            if session is None:
+                await super()._initialize()
+                return
+            self._heyGen_session = session
+            self.pooled = True
+            logger.info(f"Using pre-warmed HeyGen session {session.session_id}")
+
+    class PooledHeyGenVideoService(HeyGenVideoService):
+        """HeyGenVideoService on a pooled session, reporting its time to first frame to the pool."""
+
+        def __init__(self, *, pool: AvatarSessionPool, **kwargs):
+            super().__init__(**kwargs)
+            self._pool = pool
+            self._setup_at: Optional[float] = None
+            self._first_frame = False
+
+        async def setup(self, setup):
+            self._setup_at = time.monotonic()
+            # HeyGenVideoService.setup(), with the pooled client.
+            await super(HeyGenVideoService, self).setup(setup)
+            self._client = PooledHeyGenClient(
+                pool=self._pool,
+                api_key=self._api_key,
+                session=self._session,
+                params=TransportParams(
+                    audio_in_enabled=True,
+                    video_in_enabled=True,
+                    audio_out_enabled=True,
+                    audio_out_sample_rate=HEY_GEN_SAMPLE_RATE,
+                ),
+                session_request=self._session_request,
+                callbacks=HeyGenCallbacks(
+                    on_participant_connected=self._on_participant_connected,
+                    on_participant_disconnected=self._on_participant_disconnected,
+                ),
+            )
+            await self._client.setup(setup)
+
+        async def _on_participant_video_frame(self, video_frame):
+            if not self._first_frame and self._setup_at is not None:
+                self._first_frame = True
+                self._pool.record_first_frame(time.monotonic() - self._setup_at,
+                                              hit=self._client.pooled)
+            await super()._on_participant_video_frame(video_frame)
+
+    return PooledHeyGenVideoService
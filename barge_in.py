@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from pipecat.frames.frames import Frame, InterruptionFrame, LLMTextFrame
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.llm_service import FunctionCallParams
+from pipecat.services.openai.llm import OpenAILLMService
+
+# Rough characters-per-token ratio used to estimate output tokens of abandoned completions.
+CHARS_PER_TOKEN = 4
+
+
+class BargeInStats:
+    """Per-session counters for work thrown away because the patient interrupted."""
+
+    def __init__(self):
+        self.interruptions = 0
+        self.cancelled_completions = 0
+        self.wasted_output_tokens = 0
+        self.cancelled_tool_calls = 0
+        self.wasted_tool_secs = 0.0
+        self.late_results_dropped = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class InterruptibleOpenAILLMService(OpenAILLMService):
+    """OpenAILLMService that abandons in-flight work as soon as the patient barges in.
+
+    On an interruption the streaming completion is closed, which releases the socket and
+    stops generation upstream. Function handlers registered with ``cancel_on_interruption``
+    drop any result that arrives after an interruption instead of handing it to the LLM.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.barge_in_stats = BargeInStats()
+        self._generation = 0
+        self._active_stream = None
+        self._streamed_chars = 0
+
+    async def get_chat_completions(self, params):
+        self._active_stream = await super().get_chat_completions(params)
+        return self._active_stream
+
+    async def _process_context(self, context):
+        self._streamed_chars = 0
+        try:
+            await super()._process_context(context)
+        except asyncio.CancelledError:
+            stream, self._active_stream = self._active_stream, None
+            if stream is not None:
+                self.barge_in_stats.cancelled_completions += 1
+                self.barge_in_stats.wasted_output_tokens += self._streamed_chars // CHARS_PER_TOKEN
+                await stream.close()
+            raise
+        finally:
+            self._active_stream = None
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        if isinstance(frame, LLMTextFrame):
+            self._streamed_chars += len(frame.text)
+        await super().push_frame(frame, direction)
+
+    async def _handle_interruptions(self, frame: InterruptionFrame):
+        self._generation += 1
+        self.barge_in_stats.interruptions += 1
+        await super()._handle_interruptions(frame)
+
+    def register_function(self, function_name: Optional[str], handler: Any,
+                          start_callback=None, *, cancel_on_interruption: bool = True):
+        if cancel_on_interruption:
+            handler = self._interruptible(handler)
+        super().register_function(
+            function_name, handler, start_callback,
+            cancel_on_interruption=cancel_on_interruption,
+        )
+
+    def _interruptible(self, handler):
+        async def interruptible_handler(params: FunctionCallParams):
+            generation = self._generation
+            started = time.perf_counter()
+            result_callback = params.result_callback
+
+            async def guarded_result_callback(result, *, properties=None):
+                if self._generation != generation:
+                    self.barge_in_stats.late_results_dropped += 1
+                    logger.debug(f"Dropping late result for {params.function_name} after barge-in")
+                    return
+                await result_callback(result, properties=properties)
+
+            params.result_callback = guarded_result_callback
+            try:
+                await handler(params)
+            except asyncio.CancelledError:
+                self.barge_in_stats.cancelled_tool_calls += 1
+                self.barge_in_stats.wasted_tool_secs += time.perf_counter() - started
+                raise
+
+        return interruptible_handler
@@ -0,0 +1,81 @@
+"""Intent matcher micro-benchmark and false-positive check.
+
+Run from the repository root:
+
+    python benchmarks/intent_matcher_bench.py
+
+Checks every sentence of intent_corpus.json against the configured intents (exits 1 on
+any mismatch), compares with the old substring scan, and times matching with the
+configured phrase set and with several hundred synthetic clinical terms.
+"""
+
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from intent_matcher import DEFAULT_INTENTS_FILE, IntentMatcher  # noqa: E402
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.json")
+ITERATIONS = 2000
+
+
+def substring_scan(keywords, text):
+    text_lower = text.lower()
+    return any(keyword in text_lower for keyword in keywords)
+
+
+def check_corpus(matcher, keywords, corpus):
+    failures = 0
+    legacy_false_positives = 0
+    for expected, sentences in corpus.items():
+        for sentence in sentences:
+            got = matcher.match(sentence) or "none"
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH expected={expected} got={got}: {sentence}")
+            if expected == "none" and substring_scan(keywords, sentence):
+                legacy_false_positives += 1
+    total = sum(len(s) for s in corpus.values())
+    print(f"corpus: {total} sentences, {failures} mismatches, "
+          f"{legacy_false_positives} false positives with the old substring scan")
+    return failures
+
+
+def bench(label, fn, sentences):
+    chars = sum(len(s) for s in sentences)
+    secs = timeit.timeit(lambda: [fn(s) for s in sentences], number=ITERATIONS)
+    per_call = secs / (ITERATIONS * len(sentences)) * 1e6
+    per_char = secs / (ITERATIONS * chars) * 1e9
+    print(f"{label:<40} {per_call:8.2f} us/sentence {per_char:8.1f} ns/char")
+
+
+def main():
+    with open(DEFAULT_INTENTS_FILE) as f:
+        intents = json.load(f)
+    with open(CORPUS_FILE) as f:
+        corpus = json.load(f)
+
+    keywords = intents["visual_request"]
+    matcher = IntentMatcher(intents)
+    failures = check_corpus(matcher, keywords, corpus)
+
+    sentences = [s for group in corpus.values() for s in group]
+    synthetic = [f"term{i} finding{i % 7}" for i in range(500)]
+    large = IntentMatcher({"visual_request": keywords + synthetic})
+
+    bench(f"automaton, {len(keywords)} phrases", matcher.match, sentences)
+    bench(f"automaton, {len(keywords) + len(synthetic)} phrases", large.match, sentences)
+    bench(f"substring scan, {len(keywords)} phrases",
+          lambda s: substring_scan(keywords, s), sentences)
+    bench(f"substring scan, {len(keywords) + len(synthetic)} phrases",
+          lambda s: substring_scan(keywords + synthetic, s), sentences)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
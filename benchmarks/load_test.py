@@ -0,0 +1,326 @@
+"""Offline load test: how many concurrent consultations one bot.py process sustains.
+
+Run from the repository root:
+
+    python benchmarks/load_test.py --levels 1,2,4,8
+    python benchmarks/load_test.py --render-audio   # once; renders the patient lines, needs CARTESIA_API_KEY
+
+Every session runs ``run_bot()`` from bot.py, with its real pipeline layout, VAD and
+smart-turn models, context handling and OpenAI service, fed by a ``ReplayTransport`` and
+answered by the local stand-ins in stand_ins.py. At each concurrency level the sessions are
+started (staggered), replayed to the end, and the process's CPU, RSS, event-loop lag and
+per-stage turn latencies are reported, with the avatar session pool's hit rate and the
+avatar's time to first frame, and the frame processors holding the event loop longest. Without rendered or recorded audio the calls run in
+scripted mode (no VAD / smart-turn inference). Exits 1 when ``--max-turn-p95-ms`` is
+exceeded at any level, so it can gate a deploy.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from loguru import logger  # noqa: E402
+from pipecat.runner.types import RunnerArguments  # noqa: E402
+from pipecat.transports.base_transport import TransportParams  # noqa: E402
+from replay_transport import PATIENT_VOICE_ID, SAMPLE_RATE, RecordedCall, ReplayTransport  # noqa: E402
+from stand_ins import StandInServer, stand_in_services  # noqa: E402
+
+from latency_observer import LatencyHistogram, latency_histograms  # noqa: E402
+
+DEFAULT_CALL = os.path.join(BENCH_DIR, "calls", "consultation.json")
+REPORT_STAGES = ("smart_turn", "stt_final", "llm_ttfb", "tool_call", "tts_first_byte",
+                 "avatar_first_frame", "turn")
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is KiB on Linux, bytes on macOS; peak rather than current, but close enough.
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+class ResourceMonitor:
+    """Samples process CPU and RSS, and measures how late the event loop wakes up."""
+
+    def __init__(self, *, interval_secs: float = 0.5, lag_interval_secs: float = 0.05):
+        self._interval = interval_secs
+        self._lag_interval = lag_interval_secs
+        self._tasks: List[asyncio.Task] = []
+        self.loop_lag = LatencyHistogram()
+        self.cpu_percent: List[float] = []
+        self.rss_max = 0
+
+    def start(self):
+        self.loop_lag.reset()
+        self.cpu_percent = []
+        self.rss_max = rss_bytes()
+        self._tasks = [asyncio.create_task(self._sample()), asyncio.create_task(self._lag())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _sample(self):
+        wall, cpu = time.monotonic(), time.process_time()
+        while True:
+            await asyncio.sleep(self._interval)
+            now_wall, now_cpu = time.monotonic(), time.process_time()
+            self.cpu_percent.append((now_cpu - cpu) / (now_wall - wall) * 100)
+            wall, cpu = now_wall, now_cpu
+            self.rss_max = max(self.rss_max, rss_bytes())
+
+    async def _lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._lag_interval)
+            self.loop_lag.record(int((time.perf_counter() - start - self._lag_interval) * 1e6))
+
+    def report(self) -> Dict[str, Any]:
+        cpu = self.cpu_percent or [0.0]
+        return {
+            "cpu_mean_pct": sum(cpu) / len(cpu),
+            "cpu_max_pct": max(cpu),
+            "rss_max_mb": self.rss_max / 2**20,
+            "loop_lag_ms": {
+                "p50": self.loop_lag.percentile(50) / 1000,
+                "p99": self.loop_lag.percentile(99) / 1000,
+                "max": self.loop_lag.max_us / 1000,
+            },
+        }
+
+
+def transport_params(bot, scripted: bool) -> TransportParams:
+    """The webrtc TransportParams of bot.bot(), with the analyzers dropped in scripted mode."""
+    return TransportParams(
+        audio_in_enabled=True,
+        audio_out_enabled=True,
+        video_in_enabled=True,
+        video_out_enabled=True,
+        video_out_is_live=True,
+        video_out_width=1280,
+        video_out_height=720,
+        vad_analyzer=None if scripted else bot.create_vad_analyzer(),
+        turn_analyzer=None if scripted else bot.create_turn_analyzer(),
+    )
+
+
+async def run_session(bot, call: RecordedCall, index: int, *, scripted: bool,
+                      seed: int) -> Tuple[ReplayTransport, Dict[str, Any]]:
+    transport = ReplayTransport(call, transport_params(bot, scripted), scripted=scripted,
+                                client={"id": f"replay-{index}"})
+    services = []
+
+    def create_services(session):
+        # Keep the production LLM service (pointed at the stand-in server), fake the rest.
+        _, llm, _, _ = bot.create_ai_services(session)
+        services.append(llm)
+        return stand_in_services(llm, transport.transcript, seed=seed + index,
+                                 avatar_pool=bot.avatar_pool, http=session,
+                                 avatar_request=bot.avatar_session_request())
+
+    await bot.run_bot(transport, RunnerArguments(), create_services=create_services)
+    return transport, services[0].speculation_stats.as_dict()
+
+
+async def run_level(bot, call: RecordedCall, sessions: int, monitor: ResourceMonitor,
+                    args) -> Dict[str, Any]:
+    # Sessions arrive at a warm worker: give the avatar pool time to fill between levels.
+    deadline = time.monotonic() + 15
+    while bot.avatar_pool.stats()["ready"] < args.avatar_pool and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    hits, misses = bot.avatar_pool.hits, bot.avatar_pool.misses
+    latency_histograms.reset()
+    monitor.start()
+    start = time.monotonic()
+    tasks = []
+    for index in range(sessions):
+        tasks.append(asyncio.create_task(
+            run_session(bot, call, index, scripted=args.scripted, seed=args.seed)
+        ))
+        await asyncio.sleep(args.stagger_secs)
+    sessions_done = await asyncio.gather(*tasks)
+    transports = [transport for transport, _ in sessions_done]
+    speculation = [stats for _, stats in sessions_done]
+    await monitor.stop()
+
+    stages = {}
+    for stage in REPORT_STAGES:
+        histogram = latency_histograms.stages[stage]
+        stages[stage] = {
+            "count": histogram.count,
+            "p50_ms": histogram.percentile(50) / 1000,
+            "p95_ms": histogram.percentile(95) / 1000,
+        }
+    return {
+        "sessions": sessions,
+        "wall_secs": time.monotonic() - start,
+        "utterances": sum(t.utterances_sent for t in transports),
+        "unanswered": sum(t.unanswered for t in transports),
+        "completed": sum(t.finished for t in transports),
+        "speculation": {
+            key: sum(s[key] for s in speculation)
+            for key in ("turns", "started", "hits", "misses", "superseded", "wasted_output_tokens")
+        },
+        "avatar_pool_hits": bot.avatar_pool.hits - hits,
+        "avatar_pool_misses": bot.avatar_pool.misses - misses,
+        **monitor.report(),
+        "stages": stages,
+    }
+
+
+def print_row(row: Dict[str, Any]):
+    turn = row["stages"]["turn"]
+    speculation = row["speculation"]
+    hit_pct = 100 * speculation["hits"] / speculation["turns"] if speculation["turns"] else 0.0
+    pool_requests = row["avatar_pool_hits"] + row["avatar_pool_misses"]
+    pool_pct = 100 * row["avatar_pool_hits"] / pool_requests if pool_requests else 0.0
+    print(
+        f"{row['sessions']:>8} {row['completed']:>9} {row['unanswered']:>10} "
+        f"{row['cpu_mean_pct']:>8.0f} {row['cpu_max_pct']:>7.0f} {row['rss_max_mb']:>8.0f} "
+        f"{row['loop_lag_ms']['p99']:>8.1f} {row['loop_lag_ms']['max']:>8.1f} "
+        f"{turn['p50_ms']:>8.0f} {turn['p95_ms']:>8.0f} {hit_pct:>9.0f} {pool_pct:>9.0f}",
+        flush=True,
+    )
+
+
+def render_audio(call_path: str, audio_dir: str):
+    from tts_cache import PhraseAudioCache
+
+    with open(call_path) as f:
+        script = json.load(f)
+    cache = PhraseAudioCache(audio_dir, api_key=os.getenv("CARTESIA_API_KEY"))
+    cache.warm_up(
+        [u["text"] for u in script["utterances"] if not u.get("audio")],
+        voice_id=PATIENT_VOICE_ID,
+        model="sonic-2",
+        speed=None,
+        language="en",
+        sample_rate=SAMPLE_RATE,
+    )
+
+
+async def main(args) -> int:
+    call = RecordedCall.load(args.call)
+    if not call.has_audio and not args.scripted:
+        print("No audio for every utterance (see --render-audio), running scripted turns.")
+        args.scripted = True
+
+    # Sessions must not reach the real providers; phrases and models are set up here instead.
+    os.environ["PRELOAD_TTS_PHRASES"] = "0"
+    os.environ["PRELOAD_MODELS"] = "0"
+    import bot
+    from webhook_client import WebhookClient
+
+    server = StandInServer(seed=args.seed)
+    url = await server.start()
+    os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+    os.environ["OPENAI_API_KEY"] = "stand-in"
+    bot.n8n_client = WebhookClient(
+        f"{url}/webhook/medical-assistant",
+        cache_ttl_secs=float(os.getenv("N8N_CACHE_TTL_SECS", "300")),
+    )
+    from avatar_pool import AvatarSessionPool
+    bot.avatar_pool = AvatarSessionPool(
+        "stand-in", bot.avatar_session_request(), size=args.avatar_pool, base_url=f"{url}/v1",
+    )
+    bot.avatar_pool.start()
+    if not args.scripted:
+        bot.model_registry.warm_up()
+
+    print(f"Call '{call.name}', {len(call.utterances)} utterances, "
+          f"{'scripted turns' if args.scripted else 'recorded audio'}")
+    print(f"{'sessions':>8} {'completed':>9} {'unanswered':>10} {'cpu%':>8} {'cpu%max':>7} "
+          f"{'rss MB':>8} {'lag p99':>8} {'lag max':>8} {'turn p50':>8} {'turn p95':>8} {'spec hit%':>9} {'pool hit%':>9}")
+    monitor = ResourceMonitor()
+    rows = []
+    try:
+        for sessions in args.levels:
+            row = await run_level(bot, call, sessions, monitor, args)
+            rows.append(row)
+            print_row(row)
+        first_frame = bot.avatar_pool.stats()["first_frame_ms"]
+        print("Avatar first frame p50/p95 (ms): "
+              + ", ".join(f"{kind} {v['p50']}/{v['p95']} ({v['count']})"
+                          for kind, v in first_frame.items()))
+        turn = bot.turn_engine.stats()
+        print(f"Smart Turn batches: {turn['batches']}, mean size {turn['mean_batch_size']:.1f}, "
+              f"p50/p95 {turn['p50_ms']:.1f}/{turn['p95_ms']:.1f} ms")
+        stalls = bot.loop_monitor.stats()
+        print(f"Event loop stalls >= {stalls['stall_ms_threshold']} ms: {stalls['stalls']} "
+              f"(max {stalls['stall_ms_max']} ms)")
+        print("Loop time by processor (busy ms, max step ms): " + ", ".join(
+            f"{name} {t['busy_ms']:.0f}/{t['max_step_ms']:.1f}"
+            for name, t in list(bot.processor_timings.snapshot()["processors"].items())[:5]))
+    finally:
+        await bot.avatar_pool.aclose()
+        await server.stop()
+        await bot.n8n_client.aclose()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "call": call.name,
+                "mode": "scripted" if args.scripted else "audio",
+                "stand_ins": {"completions": server.completions, "tool_calls": server.tool_calls,
+                              "webhook_calls": server.webhook_calls,
+                              "heygen_calls": server.heygen_calls},
+                "avatar_pool": bot.avatar_pool.stats(),
+                "n8n_client": bot.n8n_client.stats(),
+                "turn_inference": bot.turn_engine.stats(),
+                "loop_stalls": bot.loop_monitor.stats(),
+                "processor_timings": bot.processor_timings.snapshot()["processors"],
+                "levels": rows,
+            }, f, indent=2)
+
+    if args.max_turn_p95_ms:
+        over = [r for r in rows if r["stages"]["turn"]["p95_ms"] > args.max_turn_p95_ms]
+        for row in over:
+            print(f"FAIL: {row['sessions']} sessions, turn p95 "
+                  f"{row['stages']['turn']['p95_ms']:.0f} ms > {args.max_turn_p95_ms:.0f} ms")
+        return 1 if over else 0
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--call", default=DEFAULT_CALL, help="call script to replay")
+    parser.add_argument("--levels", default="1,2,4,8",
+                        type=lambda s: [int(n) for n in s.split(",")],
+                        help="comma-separated numbers of concurrent sessions")
+    parser.add_argument("--stagger-secs", type=float, default=0.5,
+                        help="delay between session starts within a level")
+    parser.add_argument("--scripted", action="store_true",
+                        help="emit turns from the script even when audio is available")
+    parser.add_argument("--seed", type=int, default=7, help="seed of the stand-in latencies")
+    parser.add_argument("--avatar-pool", type=int, default=1,
+                        help="pre-warmed HeyGen sessions (0 creates one per session)")
+    parser.add_argument("--max-turn-p95-ms", type=float, default=0.0,
+                        help="fail when the turn p95 exceeds this at any level")
+    parser.add_argument("--json", help="write the full report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--render-audio", action="store_true",
+                        help="render missing patient audio with Cartesia and exit")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    if args.render_audio:
+        render_audio(args.call, os.path.join(os.path.dirname(os.path.abspath(args.call)), "audio"))
+        sys.exit(0)
+    sys.exit(asyncio.run(main(args)))
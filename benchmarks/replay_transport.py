@@ -0,0 +1,238 @@
+"""Transport that plays a recorded consultation into the bot and discards its output.
+
+A call is a JSON script of patient utterances (see calls/consultation.json). Each utterance
+is played from its 16 kHz mono WAV, or from audio pre-rendered with ``--render-audio``; the
+real VAD and smart-turn analyzers then decide when the patient has finished. Without audio
+the call runs *scripted*: silence of the utterance's natural length is sent and the
+speaking / stopped events are emitted from the script instead of by VAD.
+
+Like a patient, the replay waits for the bot to finish answering before speaking again.
+"""
+
+import asyncio
+import json
+import os
+import time
+import wave
+from typing import Any, List, Optional
+
+from pipecat.audio.vad.vad_analyzer import VADState
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    Frame,
+    InputAudioRawFrame,
+    OutputAudioRawFrame,
+    OutputImageRawFrame,
+    StartFrame,
+    VADUserStartedSpeakingFrame,
+    VADUserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import BaseTransport, TransportParams
+
+SAMPLE_RATE = 16000
+CHUNK_SECS = 0.02
+# What the scripted mode waits between the end of speech and the end-of-turn decision.
+SCRIPTED_TURN_SECS = 0.3
+SCRIPTED_WORDS_PER_SEC = 2.6
+# Cartesia voice the patient lines are rendered with (any voice other than the doctor's).
+PATIENT_VOICE_ID = "5ee9feff-1265-424a-9d7f-8e4d431a12c7"
+
+
+class Utterance:
+    def __init__(self, text: str, audio: Optional[bytes], pause_secs: float):
+        self.text = text
+        self.audio = audio
+        self.pause_secs = pause_secs
+
+
+class RecordedCall:
+    """Patient side of one consultation, loaded from a call script."""
+
+    def __init__(self, name: str, utterances: List[Utterance], max_reply_secs: float):
+        self.name = name
+        self.utterances = utterances
+        self.max_reply_secs = max_reply_secs
+
+    @property
+    def has_audio(self) -> bool:
+        return all(u.audio for u in self.utterances)
+
+    @staticmethod
+    def phrase_key(text: str) -> str:
+        from tts_cache import PhraseAudioCache
+
+        return PhraseAudioCache.key(text, voice_id=PATIENT_VOICE_ID, model="sonic-2",
+                                    speed=None, language="en", sample_rate=SAMPLE_RATE)
+
+    @classmethod
+    def load(cls, path: str, audio_dir: Optional[str] = None) -> "RecordedCall":
+        with open(path) as f:
+            script = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        audio_dir = audio_dir or os.path.join(base, "audio")
+        utterances = []
+        for entry in script["utterances"]:
+            audio = None
+            if entry.get("audio"):
+                audio = cls._read_wav(os.path.join(base, entry["audio"]))
+            else:
+                rendered = os.path.join(audio_dir, f"{cls.phrase_key(entry['text'])}.pcm")
+                if os.path.exists(rendered):
+                    with open(rendered, "rb") as f:
+                        audio = f.read()
+            utterances.append(Utterance(entry["text"], audio, entry.get("pause_secs", 1.0)))
+        return cls(script.get("name", os.path.basename(path)), utterances,
+                   script.get("max_reply_secs", 20.0))
+
+    @staticmethod
+    def _read_wav(path: str) -> bytes:
+        with wave.open(path, "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise ValueError(f"{path}: expected 16 kHz mono 16-bit PCM")
+            return wav.readframes(wav.getnframes())
+
+
+class ReplayInputTransport(BaseInputTransport):
+    def __init__(self, transport: "ReplayTransport", call: RecordedCall,
+                 params: TransportParams, *, scripted: bool, **kwargs):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._call = call
+        self._scripted = scripted
+        self._replay_task: Optional[asyncio.Task] = None
+        self._silence = bytes(int(SAMPLE_RATE * CHUNK_SECS) * 2)
+        self._next_chunk = 0.0
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        await self.set_transport_ready(frame)
+        if not self._replay_task:
+            self._replay_task = self.create_task(self._replay())
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._replay_task:
+            await self.cancel_task(self._replay_task)
+            self._replay_task = None
+
+    async def _send(self, chunk: bytes):
+        """Push one chunk, paced in real time like a microphone."""
+        await self.push_audio_frame(InputAudioRawFrame(chunk, SAMPLE_RATE, 1))
+        self._next_chunk = max(self._next_chunk, time.monotonic() - CHUNK_SECS) + CHUNK_SECS
+        await asyncio.sleep(max(0.0, self._next_chunk - time.monotonic()))
+
+    async def _send_audio(self, audio: bytes):
+        size = len(self._silence)
+        for offset in range(0, len(audio), size):
+            await self._send(audio[offset:offset + size].ljust(size, b"\0"))
+
+    async def _send_silence(self, secs: float):
+        for _ in range(int(secs / CHUNK_SECS)):
+            await self._send(self._silence)
+
+    async def _wait_for_bot(self, pause_secs: float):
+        """Send silence until the bot has answered and then been quiet for ``pause_secs``."""
+        transport = self._transport
+        transport.bot_spoke = False
+        deadline = time.monotonic() + self._call.max_reply_secs
+        while time.monotonic() < deadline:
+            await self._send(self._silence)
+            if (transport.bot_spoke and not transport.bot_speaking
+                    and time.monotonic() - transport.bot_quiet_since >= pause_secs):
+                return True
+        self._transport.unanswered += 1
+        return False
+
+    async def _replay(self):
+        await self._transport._call_event_handler("on_client_connected", self._transport.client)
+        for utterance in self._call.utterances:
+            await self._wait_for_bot(utterance.pause_secs)
+            self._transport.current_text = utterance.text
+            if self._scripted:
+                await self.push_frame(VADUserStartedSpeakingFrame())
+                await self._handle_user_interruption(VADState.SPEAKING)
+                await self._send_silence(len(utterance.text.split()) / SCRIPTED_WORDS_PER_SEC)
+                await self.push_frame(VADUserStoppedSpeakingFrame())
+                await self._send_silence(SCRIPTED_TURN_SECS)
+                await self._handle_user_interruption(VADState.QUIET)
+            else:
+                await self._send_audio(utterance.audio)
+            self._transport.utterances_sent += 1
+        await self._wait_for_bot(0.5)
+        self._transport.finished = True
+        await self._transport._call_event_handler("on_client_disconnected", self._transport.client)
+
+
+class ReplayOutputTransport(BaseOutputTransport):
+    """Accepts the bot's audio and video at the pace a WebRTC peer would, and drops them."""
+
+    def __init__(self, transport: "ReplayTransport", params: TransportParams, **kwargs):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._next_audio = 0.0
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        await self.set_transport_ready(frame)
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        # HeyGen swallows these on their way upstream, so the input side can't see them.
+        if direction == FrameDirection.DOWNSTREAM:
+            if isinstance(frame, BotStartedSpeakingFrame):
+                self._transport.bot_speaking = self._transport.bot_spoke = True
+            elif isinstance(frame, BotStoppedSpeakingFrame):
+                self._transport.bot_speaking = False
+                self._transport.bot_quiet_since = time.monotonic()
+        await super().push_frame(frame, direction)
+
+    async def write_audio_frame(self, frame: OutputAudioRawFrame):
+        duration = len(frame.audio) / 2 / frame.num_channels / frame.sample_rate
+        now = time.monotonic()
+        self._next_audio = max(self._next_audio, now) + duration
+        await asyncio.sleep(self._next_audio - now - duration)
+
+    async def write_video_frame(self, frame: OutputImageRawFrame):
+        self._transport.video_frames += 1
+
+
+class ReplayTransport(BaseTransport):
+    """One replayed patient session."""
+
+    def __init__(self, call: RecordedCall, params: TransportParams, *, scripted: bool,
+                 client: Any = None, **kwargs):
+        super().__init__(**kwargs)
+        self._call = call
+        self._params = params
+        self._scripted = scripted
+        self._input: Optional[ReplayInputTransport] = None
+        self._output: Optional[ReplayOutputTransport] = None
+        self.client = client or {"id": "replay"}
+        self.current_text: Optional[str] = None
+        self.bot_speaking = False
+        self.bot_spoke = False
+        self.bot_quiet_since = 0.0
+        self.utterances_sent = 0
+        self.unanswered = 0
+        self.video_frames = 0
+        self.finished = False
+        self._register_event_handler("on_client_connected")
+        self._register_event_handler("on_client_disconnected")
+
+    def transcript(self) -> Optional[str]:
+        """What the patient is saying now, for the stand-in STT."""
+        return self.current_text
+
+    def input(self) -> ReplayInputTransport:
+        if not self._input:
+            self._input = ReplayInputTransport(self, self._call, self._params,
+                                               scripted=self._scripted, name=f"{self.name}#input")
+        return self._input
+
+    def output(self) -> ReplayOutputTransport:
+        if not self._output:
+            self._output = ReplayOutputTransport(self, self._params, name=f"{self.name}#output")
+        return self._output
@@ -0,0 +1,432 @@
+"""Local stand-ins for the external services bot.py talks to, for offline load tests.
+
+OpenAI, the n8n webhook and HeyGen's session API are served over real HTTP by
+``StandInServer``, so the production ``InterruptibleOpenAILLMService``, ``WebhookClient`` and
+``AvatarSessionPool`` run unchanged against it. Cartesia STT/TTS and the HeyGen media are
+replaced by in-process services with the same streaming shape (Cartesia STT only speaks
+``wss://`` and HeyGen needs LiveKit). Every latency is drawn
+from a log-normal distribution fitted to the median and p95 in ``LATENCY_PROFILE``.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from typing import AsyncGenerator, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from aiohttp import web
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    InterruptionFrame,
+    OutputImageRawFrame,
+    SpeechOutputAudioRawFrame,
+    StartFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.ai_service import AIService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.utils.time import time_now_iso8601
+
+from avatar_pool import create_session
+
+# (median ms, p95 ms) per step, roughly what production logs show for each provider.
+LATENCY_PROFILE: Dict[str, Tuple[float, float]] = {
+    "stt_final": (250, 600),
+    "llm_ttfb": (450, 1200),
+    "llm_token": (15, 35),
+    "n8n": (1200, 3000),
+    "tts_first_byte": (150, 400),
+    "avatar_first_frame": (500, 1200),
+    "heygen_new": (800, 2000),
+    "heygen_start": (600, 1500),
+    "avatar_connect": (400, 1000),
+}
+# Cartesia renders several seconds of speech per second of wall time.
+TTS_REALTIME_FACTOR = 4.0
+SPEECH_WORDS_PER_SEC = 2.6
+INTERIM_INTERVAL_SECS = 0.4
+
+# Words that make the stand-in LLM call medical_assistant instead of answering directly.
+TOOL_TRIGGERS = ("medication", "medicine", "dose", "ibuprofen", "paracetamol", "allergic")
+REPLY = ("I understand, that sounds uncomfortable. How long have you had these symptoms, and "
+         "does anything make them better or worse?")
+TOOL_REPLY = ("From what I can see, you can take it with food, but please do not go over the "
+              "dose on the label. Does that help?")
+SUMMARY = "The patient reported symptoms and was asked about their duration and triggers."
+WEBHOOK_ANSWER = {"output": "Take with food. Adults: up to 3 doses a day. Avoid with ulcers."}
+
+
+class Latency:
+    """Log-normal latency sampler fitted to a median and a p95, in seconds."""
+
+    def __init__(self, median_ms: float, p95_ms: float, rng: random.Random):
+        self._mu = math.log(median_ms / 1000)
+        self._sigma = max(math.log(p95_ms / median_ms) / 1.645, 1e-6)
+        self._rng = rng
+
+    def sample(self) -> float:
+        return self._rng.lognormvariate(self._mu, self._sigma)
+
+
+def latencies(seed: Optional[int] = None,
+              profile: Dict[str, Tuple[float, float]] = LATENCY_PROFILE) -> Dict[str, Latency]:
+    rng = random.Random(seed)
+    return {step: Latency(median, p95, rng) for step, (median, p95) in profile.items()}
+
+
+def speech_secs(text: str) -> float:
+    return max(len(text.split()) / SPEECH_WORDS_PER_SEC, 0.5)
+
+
+def _tone(sample_rate: int, secs: float) -> bytes:
+    """Quiet 220 Hz tone: audible enough that pipecat's silence check sees speech."""
+    t = np.arange(int(sample_rate * secs)) / sample_rate
+    return (np.sin(2 * np.pi * 220 * t) * 3000).astype(np.int16).tobytes()
+
+
+class StandInServer:
+    """OpenAI chat completions, the n8n webhook and HeyGen's session API, served locally over HTTP."""
+
+    def __init__(self, *, seed: Optional[int] = None):
+        self._latency = latencies(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+        self.completions = 0
+        self.tool_calls = 0
+        self.webhook_calls = 0
+        self.heygen_calls: Dict[str, int] = {}
+        self.heygen_sessions = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat_completions)
+        app.router.add_get("/webhook/medical-assistant", self._webhook)
+        app.router.add_post("/v1/streaming.{action}", self._heygen)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @staticmethod
+    def _reply_for(body: dict):
+        """(text, tool query) the stand-in LLM answers ``body`` with."""
+        messages = body.get("messages") or []
+        last = messages[-1] if messages else {}
+        if last.get("role") == "tool":
+            return TOOL_REPLY, None
+        content = last.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if p.get("type") == "text")
+        content = content or ""
+        if body.get("tools") and any(t in content.lower() for t in TOOL_TRIGGERS):
+            return None, content
+        return REPLY, None
+
+    @staticmethod
+    def _event(delta: Optional[dict] = None, finish_reason: Optional[str] = None,
+               usage: Optional[dict] = None) -> bytes:
+        chunk = {
+            "id": "chatcmpl-stand-in",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "gpt-4o",
+            "choices": [] if delta is None else [
+                {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            ],
+        }
+        if usage:
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    async def _chat_completions(self, request: web.Request):
+        body = await request.json()
+        self.completions += 1
+        text, tool_query = self._reply_for(body)
+        await asyncio.sleep(self._latency["llm_ttfb"].sample())
+
+        if not body.get("stream"):
+            # run_inference (context summaries)
+            return web.json_response({
+                "id": "chatcmpl-stand-in",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-4o",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": SUMMARY}}],
+                "usage": {"prompt_tokens": 500, "completion_tokens": 30, "total_tokens": 530},
+            })
+
+        # A barge-in or a dropped speculation closes the stream from the bot side.
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        try:
+            await response.prepare(request)
+            if tool_query is not None:
+                self.tool_calls += 1
+                call = {"index": 0, "id": f"call_{self.tool_calls}", "type": "function",
+                        "function": {"name": "medical_assistant",
+                                     "arguments": json.dumps({"query": tool_query})}}
+                await response.write(self._event({"role": "assistant", "tool_calls": [call]}))
+                finish_reason, tokens = "tool_calls", 1
+            else:
+                tokens = 0
+                for word in text.split(" "):
+                    await response.write(self._event({"content": f" {word}" if tokens else word}))
+                    tokens += 1
+                    await asyncio.sleep(self._latency["llm_token"].sample())
+                finish_reason = "stop"
+            await response.write(self._event({}, finish_reason))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                await response.write(self._event(usage={
+                    "prompt_tokens": 500, "completion_tokens": tokens, "total_tokens": 500 + tokens,
+                }))
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def _webhook(self, request: web.Request):
+        self.webhook_calls += 1
+        await asyncio.sleep(self._latency["n8n"].sample())
+        return web.json_response(WEBHOOK_ANSWER)
+
+
+    async def _heygen(self, request: web.Request):
+        action = request.match_info["action"]
+        self.heygen_calls[action] = self.heygen_calls.get(action, 0) + 1
+        body = await request.json()
+        if action == "new":
+            await asyncio.sleep(self._latency["heygen_new"].sample())
+            session_id = f"stand-in-{sum(self.heygen_calls.values())}"
+            self.heygen_sessions.add(session_id)
+            return web.json_response({"code": 100, "data": {
+                "session_id": session_id,
+                "access_token": "stand-in",
+                "realtime_endpoint": "ws://127.0.0.1/stand-in",
+                "url": "ws://127.0.0.1/stand-in",
+            }})
+        if body.get("session_id") not in self.heygen_sessions:
+            return web.json_response({"code": 10005, "message": "session not found"}, status=400)
+        if action == "start":
+            await asyncio.sleep(self._latency["heygen_start"].sample())
+        elif action == "stop":
+            self.heygen_sessions.discard(body["session_id"])
+        return web.json_response({"code": 100, "message": "success"})
+
+
+class StandInSTTService(STTService):
+    """Streams the patient's scripted words as interim transcripts and finalizes on turn end.
+
+    Like Cartesia's streaming STT it sends ``finalize`` when the turn ends, and the final
+    transcript arrives ``stt_final`` later. ``transcript()`` returns what the patient is
+    currently saying (the replay transport knows).
+    """
+
+    def __init__(self, *, transcript: Callable[[], Optional[str]],
+                 latency: Dict[str, Latency], **kwargs):
+        super().__init__(**kwargs)
+        self._transcript = transcript
+        self._latency = latency
+        self._interim_task: Optional[asyncio.Task] = None
+        self._final_task: Optional[asyncio.Task] = None
+        self._finalized: Optional[str] = None
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        yield None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            if not self._interim_task:
+                self._interim_task = self.create_task(self._interims())
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            if self._interim_task:
+                await self.cancel_task(self._interim_task)
+                self._interim_task = None
+            if not self._final_task:
+                self._final_task = self.create_task(self._finalize())
+
+    async def _interims(self):
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(INTERIM_INTERVAL_SECS)
+            text = self._transcript()
+            if not text or text == self._finalized:
+                continue
+            words = text.split()
+            heard = int((time.monotonic() - started) * SPEECH_WORDS_PER_SEC) or 1
+            await self.push_frame(InterimTranscriptionFrame(
+                " ".join(words[:heard]), "patient", time_now_iso8601()
+            ))
+
+    async def _finalize(self):
+        await self.start_ttfb_metrics()
+        await asyncio.sleep(self._latency["stt_final"].sample())
+        await self.stop_ttfb_metrics()
+        self._final_task = None
+        text = self._transcript()
+        if text and text != self._finalized:
+            self._finalized = text
+            await self.push_frame(TranscriptionFrame(text, "patient", time_now_iso8601()))
+
+    async def cleanup(self):
+        await super().cleanup()
+        for task in (self._interim_task, self._final_task):
+            if task:
+                await self.cancel_task(task)
+
+
+class StandInTTSService(TTSService):
+    """Renders each sentence as a tone of natural speech length, faster than real time."""
+
+    CHUNK_SECS = 0.1
+
+    def __init__(self, *, latency: Dict[str, Latency], **kwargs):
+        super().__init__(**kwargs)
+        self._latency = latency
+        self._chunk: bytes = b""
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        if not self._chunk:
+            self._chunk = _tone(self.sample_rate, self.CHUNK_SECS)
+        await self.start_ttfb_metrics()
+        await asyncio.sleep(self._latency["tts_first_byte"].sample())
+        await self.stop_ttfb_metrics()
+        yield TTSStartedFrame()
+        for _ in range(int(speech_secs(text) / self.CHUNK_SECS)):
+            yield TTSAudioRawFrame(self._chunk, self.sample_rate, 1)
+            await asyncio.sleep(self.CHUNK_SECS / TTS_REALTIME_FACTOR)
+        yield TTSStoppedFrame()
+
+
+class StandInHeyGenVideoService(AIService):
+    """Takes TTS audio like HeyGenVideoService and streams avatar video and audio back.
+
+    Video frames (a fixed, preallocated image) and 20 ms audio frames flow continuously, as
+    they do from the HeyGen room; speech comes back ``avatar_first_frame`` after the first
+    TTS audio of an utterance, and silence otherwise.
+
+    With ``pool`` the HeyGen session is taken from it or, on a miss, created against the pool's
+    (stand-in) API with ``http``, then media starts ``avatar_connect`` later, as the LiveKit
+    room would. The time to first video frame is reported to the pool.
+    """
+
+    AUDIO_FRAME_SECS = 0.02
+    VIDEO_FPS = 25
+
+    def __init__(self, *, latency: Dict[str, Latency], size: Tuple[int, int] = (1280, 720),
+                 pool=None, http=None, request=None, **kwargs):
+        super().__init__(**kwargs)
+        self._latency = latency
+        self._pool = pool
+        self._api = pool.api(http) if pool else None
+        self._request = request
+        self._heygen_session = None
+        self._size = size
+        self._image = bytes(size[0] * size[1] * 3)
+        self._speech = bytearray()
+        self._speech_at = 0.0
+        self._media_task: Optional[asyncio.Task] = None
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        started_at, hit = time.monotonic(), False
+        if self._pool:
+            self._heygen_session = self._pool.acquire(self._request)
+            hit = self._heygen_session is not None
+            if not hit:
+                self._heygen_session = await create_session(self._api, self._request)
+            await asyncio.sleep(self._latency["avatar_connect"].sample())
+        self._media_task = self.create_task(
+            self._media(frame.audio_out_sample_rate, started_at, hit)
+        )
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._stop_media()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._stop_media()
+
+    async def _stop_media(self):
+        if self._media_task:
+            await self.cancel_task(self._media_task)
+            self._media_task = None
+        if self._heygen_session:
+            await self._api.close_session(self._heygen_session.session_id)
+            self._heygen_session = None
+
+    async def _media(self, sample_rate: int, started_at: float, hit: bool):
+        frame_bytes = int(sample_rate * self.AUDIO_FRAME_SECS) * 2
+        silence = bytes(frame_bytes)
+        frames_per_image = round(1 / self.AUDIO_FRAME_SECS / self.VIDEO_FPS) or 1
+        tick = 0
+        next_tick = time.monotonic()
+        while True:
+            if tick % frames_per_image == 0:
+                await self.push_frame(OutputImageRawFrame(self._image, self._size, "RGB"))
+                if tick == 0 and self._pool:
+                    self._pool.record_first_frame(time.monotonic() - started_at, hit=hit)
+            if self._speech and time.monotonic() >= self._speech_at:
+                audio = bytes(self._speech[:frame_bytes])
+                del self._speech[:frame_bytes]
+                audio = audio.ljust(frame_bytes, b"\0")
+            else:
+                audio = silence
+            await self.push_frame(SpeechOutputAudioRawFrame(audio, sample_rate, 1))
+            tick += 1
+            next_tick += self.AUDIO_FRAME_SECS
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TTSAudioRawFrame):
+            if not self._speech:
+                self._speech_at = time.monotonic() + self._latency["avatar_first_frame"].sample()
+            self._speech.extend(frame.audio)
+        elif isinstance(frame, InterruptionFrame):
+            self._speech.clear()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, (TTSStartedFrame, BotStartedSpeakingFrame)):
+            pass
+        else:
+            await self.push_frame(frame, direction)
+
+
+def stand_in_services(llm, transcript: Callable[[], Optional[str]], *,
+                      seed: Optional[int] = None, avatar_pool=None, http=None,
+                      avatar_request=None):
+    """(stt, llm, tts, avatar) for one session, in the order ``create_ai_services`` returns."""
+    latency = latencies(seed)
+    return (
+        StandInSTTService(transcript=transcript, latency=latency),
+        llm,
+        StandInTTSService(latency=latency),
+        StandInHeyGenVideoService(latency=latency, pool=avatar_pool, http=http,
+                                  request=avatar_request),
+    )
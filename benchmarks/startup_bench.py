@@ -0,0 +1,154 @@
+"""Cold-start benchmark: how long a fresh bot.py process takes to be ready for its first session.
+
+Run from the repository root:
+
+    python benchmarks/startup_bench.py --runs 5 --budget-ms 6000
+    python benchmarks/startup_bench.py --profile        # per-module import breakdown
+
+Each run is a new Python process that goes through what a Pipecat Cloud agent does before it
+can answer its first call: import bot.py, import the selected transport, load and warm the
+VAD / smart-turn models and build one session's services. Phases are timed separately and
+the median of the runs is reported. Exits 1 when the median total exceeds ``--budget-ms``,
+so it can gate a deploy. No provider is contacted: the TTS phrase pre-render is skipped and
+services are only constructed.
+
+``--profile`` runs once under ``python -X importtime`` and prints where import time goes,
+by package (self time) and by slowest import (cumulative time).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+PHASES = ("import_bot", "import_transport", "models", "services")
+TRANSPORT_MODULES = {
+    "webrtc": "pipecat.transports.smallwebrtc.transport",
+    "daily": "pipecat.transports.daily.transport",
+}
+
+# Run in the child process; prints one JSON line of phase timings (ms).
+CHILD = """
+import asyncio, importlib, json, sys, time
+timings = {}
+start = time.perf_counter()
+import bot
+timings["import_bot"] = (time.perf_counter() - start) * 1000
+mark = time.perf_counter()
+importlib.import_module(sys.argv[1])
+timings["import_transport"] = (time.perf_counter() - mark) * 1000
+mark = time.perf_counter()
+bot.model_registry.warm_up()
+timings["models"] = (time.perf_counter() - mark) * 1000
+
+async def services():
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        bot.create_ai_services(session)
+
+mark = time.perf_counter()
+asyncio.run(services())
+timings["services"] = (time.perf_counter() - mark) * 1000
+timings["total"] = (time.perf_counter() - start) * 1000
+print("STARTUP " + json.dumps(timings))
+"""
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PRELOAD_MODELS": "0",
+        "PRELOAD_TTS_PHRASES": "0",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    for key in ("OPENAI_API_KEY", "CARTESIA_API_KEY", "HEYGEN_API_KEY"):
+        env.setdefault(key, "startup-bench")
+    return env
+
+
+def run_once(transport: str, *, importtime: bool = False) -> Tuple[Dict[str, float], str]:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD, TRANSPORT_MODULES[transport]]
+    result = subprocess.run(command, cwd=ROOT, env=child_env(), capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP "):]), result.stderr
+    raise RuntimeError(f"startup run failed:\n{result.stderr[-2000:]}")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self us, cumulative us) for every ``-X importtime`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        self_us = head.split(":")[1]
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def package_of(module: str) -> str:
+    parts = module.split(".")
+    # pipecat is one distribution with many optional parts; break it down one level further.
+    return ".".join(parts[:3] if parts[0] == "pipecat" else parts[:1])
+
+
+def print_profile(rows: List[Tuple[str, int, int, int]], top: int):
+    by_package: Dict[str, int] = defaultdict(int)
+    for module, _, self_us, _ in rows:
+        by_package[package_of(module)] += self_us
+    total_us = sum(by_package.values())
+    print(f"Import time {total_us / 1000:.0f} ms in {len(rows)} modules\n")
+    print(f"{'package (self time)':<48} {'ms':>8} {'share':>6}")
+    for package, us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<48} {us / 1000:>8.1f} {us / total_us:>6.1%}")
+    print(f"\n{'slowest imports (cumulative)':<48} {'ms':>8} {'depth':>6}")
+    for module, depth, _, cumulative_us in sorted(rows, key=lambda row: -row[3])[:top]:
+        print(f"{module:<48} {cumulative_us / 1000:>8.1f} {depth:>6}")
+
+
+def main(args) -> int:
+    if args.profile:
+        timings, stderr = run_once(args.transport, importtime=True)
+        print_profile(parse_importtime(stderr), args.top)
+        print("\nPhases (ms, inflated by -X importtime): "
+              + ", ".join(f"{phase} {timings[phase]:.0f}" for phase in (*PHASES, "total")))
+        return 0
+
+    runs = [run_once(args.transport)[0] for _ in range(args.runs)]
+    print(f"Cold start, {args.transport} transport, median of {args.runs} runs")
+    print(" ".join(f"{phase:>16}" for phase in (*PHASES, "total")))
+    print(" ".join(f"{statistics.median(run[phase] for run in runs):>16.0f}"
+                   for phase in (*PHASES, "total")))
+    total = statistics.median(run["total"] for run in runs)
+    if args.budget_ms and total > args.budget_ms:
+        print(f"FAIL: cold start {total:.0f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--transport", choices=sorted(TRANSPORT_MODULES), default="webrtc")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to time")
+    parser.add_argument("--budget-ms", type=float, default=0.0,
+                        help="fail when the median cold start exceeds this")
+    parser.add_argument("--profile", action="store_true",
+                        help="print a per-module import-time breakdown of one run")
+    parser.add_argument("--top", type=int, default=25, help="rows per profile table")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -28,54 +28,166 @@
 # pip install "pipecat-ai[local-smart-turn-v3]"clear
 
 import os
-import httpx
+import asyncio
+import contextlib
+import functools
+import uuid
 import aiohttp
 import warnings
 from loguru import logger
 from typing import Optional
 from datetime import datetime
 from dotenv import load_dotenv
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pipecat.audio.vad.vad_analyzer import VADParams
 from pipecat.audio.turn.smart_turn.base_smart_turn import SmartTurnParams
-from pipecat.audio.turn.smart_turn.local_smart_turn_v3 import LocalSmartTurnAnalyzerV3
 
 from SystemPrompt import system_prompt
+from avatar_pool import AvatarSessionPool, pooled_heygen_service_class
+from camera_control import OnDemandCameraController
+from cartesia_pool import CartesiaConnectionPool, pooled_cartesia_stt_class
+from context_window import ContextWindowManager
+from image_prep import ImagePreparer, image_message
+from intent_matcher import load_intent_matcher
+from latency_observer import TurnLatencyObserver, latency_histograms
+from loop_monitor import LoopMonitor, ProcessorTimings
+from model_cache import model_registry
+from session_store import SessionRecorder, SessionStore
+from speculative_llm import SpeculativeOpenAILLMService, TranscriptSpeculator
+from text_chunker import ClauseTextAggregator
+from tool_results import ToolResultCompactor
+from tts_cache import CachedCartesiaTTSService, PhraseAudioCache
+from turn_taking import AdaptiveTurnAnalyzer
+from turn_inference import SmartTurnInferenceEngine
+from video_quality import VIDEO_LEVELS, AdaptiveVideoController, host_cpu, start_level, video_decisions
+from webhook_client import WebhookClient
+from worker_load import CapacityBudget, worker_load
 
 from openai.types.chat import ChatCompletionSystemMessageParam
 
 from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.adapters.schemas.tools_schema import ToolsSchema
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
-from pipecat.processors.aggregators.llm_context import LLMContext
 from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext, OpenAILLMContextFrame
 from pipecat.processors.aggregators.user_response import UserResponseAggregator
-from pipecat.processors.filters.wake_check_filter import WakeCheckFilter
 from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
 
 from pipecat.processors.frameworks.rtvi import RTVIProcessor, RTVIConfig, RTVIObserver
 from pipecat.runner.types import RunnerArguments
-from pipecat.services.cartesia.stt import CartesiaLiveOptions, CartesiaSTTService
-from pipecat.services.cartesia.tts import CartesiaTTSService  # Needed for audio output
 from pipecat.services.llm_service import FunctionCallParams
-from pipecat.services.openai.llm import OpenAILLMService
 from pipecat.transports.base_transport import BaseTransport, TransportParams
-from pipecat.transports.daily.transport import DailyParams, DailyTransport
 from pipecat.transcriptions.language import Language
 from pipecat.services.heygen.api import AvatarQuality, NewSessionRequest
-from pipecat.services.heygen.video import HeyGenVideoService
 from pipecat.frames.frames import (
     Frame, TextFrame, TTSSpeakFrame, UserImageRawFrame,
-    UserImageRequestFrame, LLMContextFrame, BotStartedSpeakingFrame, LLMRunFrame)
-from pipecat.runner.utils import (
-    create_transport, get_transport_client_id, maybe_capture_participant_camera)
+    UserImageRequestFrame, LLMRunFrame)
+from pipecat.runner.utils import create_transport
 
 warnings.filterwarnings("ignore", category=RuntimeWarning, module="faster_whisper.feature_extractor")
 load_dotenv(override=True)
 
+# One batched end-of-turn engine per worker, shared by every session's turn analyzer.
+turn_engine = SmartTurnInferenceEngine(
+    model_registry,
+    batch_window_ms=float(os.getenv("SMART_TURN_BATCH_WINDOW_MS", "10")),
+    max_batch_size=int(os.getenv("SMART_TURN_MAX_BATCH", "16")),
+)
+
+# Pooled, cached and de-duplicated client for the medical_assistant n8n webhook.
+n8n_client = WebhookClient(
+    os.getenv("N8N_WEBHOOK_URL"),
+    auth=(os.getenv("N8N_USER"), os.getenv("N8N_PASS")),
+    timeout=15,
+    cache_ttl_secs=float(os.getenv("N8N_CACHE_TTL_SECS", "300")),
+)
+
+# Webhook answers stay in the context for the rest of the session: keep them small.
+tool_result_compactor = ToolResultCompactor(
+    fields=os.getenv("TOOL_RESULT_FIELDS", "").split(","),
+    max_tokens=int(os.getenv("TOOL_RESULT_MAX_TOKENS", "400")),
+    max_text_chars=int(os.getenv("TOOL_RESULT_MAX_TEXT_CHARS", "1200")),
+    extract=os.getenv("TOOL_RESULT_EXTRACT", "1") == "1",
+)
+
+# Transcripts, tool calls and metrics of every session, written to SQLite off the event loop.
+session_store = None
+if os.getenv("SESSION_STORE_PATH", "sessions/sessions.db"):
+    session_store = SessionStore(
+        os.getenv("SESSION_STORE_PATH", "sessions/sessions.db"),
+        batch_size=int(os.getenv("SESSION_STORE_BATCH", "200")),
+        flush_interval_secs=float(os.getenv("SESSION_STORE_FLUSH_SECS", "1.0")),
+    )
+
+def avatar_session_request(quality: AvatarQuality = AvatarQuality.medium) -> NewSessionRequest:
+    return NewSessionRequest(
+        avatar_id="Katya_Chair_Sitting_public",
+        version="v2",
+        quality=quality,
+        # voice_id="your_preferred_voice_id",
+    )
+
+
+# HeyGen sessions created ahead of the calls, for sessions starting at the default quality.
+avatar_pool = AvatarSessionPool(
+    os.getenv("HEYGEN_API_KEY"),
+    avatar_session_request(VIDEO_LEVELS[-1].avatar_quality),
+    size=int(os.getenv("HEYGEN_POOL_SIZE", "1")),
+    base_url=os.getenv("HEYGEN_API_URL") or None,
+    keepalive_secs=float(os.getenv("HEYGEN_POOL_KEEPALIVE_SECS", "60")),
+    max_idle_secs=float(os.getenv("HEYGEN_POOL_MAX_IDLE_SECS", "600")),
+)
+
+# Cartesia STT/TTS websockets dialled ahead of the sessions; TTS ones are reused across sessions.
+cartesia_connections = CartesiaConnectionPool(
+    size=int(os.getenv("CARTESIA_POOL_SIZE", "2")),
+    max_uses=int(os.getenv("CARTESIA_POOL_MAX_USES", "20")),
+    max_idle_secs=float(os.getenv("CARTESIA_POOL_MAX_IDLE_SECS", "240")),
+)
+
+# What this worker takes on before it stops accepting sessions (reported on /worker/capacity)
+worker_load.budget = CapacityBudget(
+    max_sessions=int(os.getenv("WORKER_MAX_SESSIONS", "8")),
+    max_cpu_pct=float(os.getenv("WORKER_MAX_CPU_PCT", "90")),
+    max_loop_lag_ms=float(os.getenv("WORKER_MAX_LOOP_LAG_MS", "200")),
+    max_rss_mb=float(os.getenv("WORKER_MAX_RSS_MB", "0")),
+)
+WORKER_DRAIN_TIMEOUT_SECS = float(os.getenv("WORKER_DRAIN_TIMEOUT_SECS", "300"))
+
+# Loop time of every frame processor, and event-loop stalls with where they happened
+processor_timings = ProcessorTimings(enabled=os.getenv("PROCESSOR_TIMING", "1") == "1")
+loop_monitor = LoopMonitor(
+    timings=processor_timings,
+    stall_ms=float(os.getenv("LOOP_STALL_MS", "100")),
+)
+
+# Fixed utterances are pre-rendered once and played from a memory-mapped PCM cache.
+TTS_VOICE_ID = "f9836c6e-a0bd-460e-9d3c-f7299fa60f94"
+TTS_MODEL = "sonic-2"
+TTS_SPEED = "fast"
+AUDIO_OUT_SAMPLE_RATE = 24000
+GREETING = ("Hello! I'm Dr. Sarah, and I'm here to help you with your health concerns. "
+            "What symptoms are you experiencing today?")
+HOLDING_PHRASE = "Ok."
+
+phrase_cache = PhraseAudioCache(
+    os.getenv("TTS_CACHE_DIR", ".tts_cache"),
+    api_key=os.getenv("CARTESIA_API_KEY"),
+)
+if os.getenv("PRELOAD_TTS_PHRASES", "1") == "1":
+    phrase_cache.warm_up(
+        [GREETING, HOLDING_PHRASE],
+        voice_id=TTS_VOICE_ID,
+        model=TTS_MODEL,
+        speed=TTS_SPEED,
+        language="en",
+        sample_rate=AUDIO_OUT_SAMPLE_RATE,
+        background=True,
+    )
+
 
 class UserImageRequester(FrameProcessor):
     """Converts incoming text into requests for user images ONLY when patient asks to show something."""
@@ -83,19 +195,15 @@ class UserImageRequester(FrameProcessor):
     def __init__(self, participant_id: Optional[str] = None):
         super().__init__()
         self._participant_id = participant_id
+        # Built once per process from intents.json and shared by every session
+        self._intents = load_intent_matcher()
 
     def set_participant_id(self, participant_id: str):
         self._participant_id = participant_id
 
     def _should_request_image(self, text: str) -> bool:
         """Check if the text indicates patient wants to show something visually."""
-        visual_keywords = [
-            "can you see", "look at", "show you", "see it", "see this",
-            "look at this", "see my", "look at my", "show me", "visible",
-            "bruise", "rash", "swelling", "wound", "cut", "injury"
-        ]
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in visual_keywords)
+        return self._intents.match(text) == "visual_request"
 
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         await super().process_frame(frame, direction)
@@ -115,10 +223,21 @@ class UserImageRequester(FrameProcessor):
 
 
 class UserImageProcessor(FrameProcessor):
-    """Converts incoming user images into context frames."""
+    """Adds requested user images to the session's context as a user turn and runs the LLM on it.
+
+    The image goes into the main context, after the conversation so far, so the answer can use
+    the earlier symptoms, and the system prompt and tools in front stay byte-identical for
+    OpenAI's prompt cache. ContextWindowManager drops the image once it has been answered.
+    """
 
-    def __init__(self):
+    def __init__(self, context: OpenAILLMContext):
         super().__init__()
+        self._context = context
+        # Downscales, encodes and de-duplicates camera frames before they reach gpt-4o
+        self._preparer = ImagePreparer(
+            max_side=int(os.getenv("VISION_MAX_SIDE", "768")),
+            jpeg_quality=int(os.getenv("VISION_JPEG_QUALITY", "80")),
+        )
 
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         await super().process_frame(frame, direction)
@@ -126,31 +245,83 @@ class UserImageProcessor(FrameProcessor):
         if isinstance(frame, UserImageRawFrame):
             logger.info(f"Processing user image for visual examination")
             if frame.request and frame.request.context:
-                # Create context that includes the system prompt with the image
-                context = LLMContext()
-
-                # Add a system message to ensure proper behavior with images
-                context.add_message({
-                    "role": "system",
-                    "content": f"{system_prompt()}\n\nThe patient is showing you an image and asking: {frame.request.context}"
-                })
-
-                # Add the image message
-                context.add_image_frame_message(
-                    image=frame.image,
-                    text=frame.request.context,
-                    size=frame.size,
-                    format=frame.format,
+                # Add the image message, prepared off the event loop
+                prepared = await asyncio.to_thread(
+                    self._preparer.prepare, frame.image, frame.size, frame.format
+                )
+                logger.debug(
+                    f"Prepared image {frame.size} -> {prepared.size}, {len(prepared.jpeg)} bytes, "
+                    f"reused={prepared.reused}, timings={self._preparer.timings}"
                 )
+                self._context.add_message(image_message(
+                    f"The patient is showing you an image and asking: {frame.request.context}",
+                    prepared,
+                ))
 
-                frame = LLMContextFrame(context)
+                frame = OpenAILLMContextFrame(self._context)
                 await self.push_frame(frame)
         else:
             await self.push_frame(frame, direction)
 
 
-async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
+def create_ai_services(session: aiohttp.ClientSession,
+                       avatar_quality: AvatarQuality = AvatarQuality.medium):
+    """STT, LLM, TTS and avatar services of one session (benchmarks/ swaps in stand-ins)."""
+    # Imported here so that neither bot.py's import nor the stand-ins pay for them
+    from pipecat.services.cartesia.stt import CartesiaLiveOptions
+
+    # Custom configuration with live options
+    live_options = CartesiaLiveOptions(
+        model="ink-whisper",
+        language=Language.EN,
+    )
+    stt = pooled_cartesia_stt_class()(
+        connections=cartesia_connections,
+        api_key=os.getenv("CARTESIA_API_KEY"),
+        base_url="api.cartesia.ai",
+        live_options=live_options,
+        streaming=True,
+    )
+    # Closes the completion stream and drops late tool results when the patient barges in
+    openai = SpeculativeOpenAILLMService(
+        model="gpt-4o",  # Using gpt-4o for full vision capabilities
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # Start the reply on the stable interim transcript, commit it if the final one matches
+        speculate=os.getenv("SPECULATIVE_LLM", "1") == "1",
+        params=SpeculativeOpenAILLMService.InputParams(
+            temperature=0.3,  # Increased temperature to allow more helpful responses
+            max_tokens=150,  # Reduced tokens for more concise responses
+        )
+    )
+    # TTS for audio output - HeyGen handles video, Cartesia handles audio
+    tts = CachedCartesiaTTSService(
+        phrase_cache=phrase_cache,
+        connections=cartesia_connections,
+        api_key=os.getenv("CARTESIA_API_KEY"),
+        voice_id=TTS_VOICE_ID,
+        # f9836c6e-a0bd-460e-9d3c-f7299fa60f94, 5ee9feff-1265-424a-9d7f-8e4d431a12c7
+        model=TTS_MODEL,
+        params=CachedCartesiaTTSService.InputParams(
+            language=Language.EN,
+            speed=TTS_SPEED
+        ),
+        aggregate_sentences=False,
+    )
+    # Starts on a pre-warmed HeyGen session when the pool has one for this quality
+    heyGen = pooled_heygen_service_class()(
+        pool=avatar_pool,
+        api_key=os.getenv("HEYGEN_API_KEY"),
+        session=session,
+        session_request=avatar_session_request(avatar_quality),
+    )
+    return stt, openai, tts, heyGen
+
+
+async def run_bot(transport: BaseTransport, runner_args: RunnerArguments,
+                  create_services=create_ai_services):
     logger.info(f"Starting optimized bot")
+    avatar_pool.start()
+    loop_monitor.start()
     async with aiohttp.ClientSession() as session:
         ########################################################################################
         ####################################### AI Services ####################################
@@ -158,56 +329,32 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
         user_response = UserResponseAggregator()
         # Smart image processing - only when the patient asks to show something
         image_requester = UserImageRequester()
-        image_processor = UserImageProcessor()
-
-        # Custom configuration with live options
-        live_options = CartesiaLiveOptions(
-            model="ink-whisper",
-            language=Language.EN,
+        # Receive the camera only while an image request is being served
+        camera = OnDemandCameraController(
+            transport,
+            webrtc_connection=getattr(runner_args, "webrtc_connection", None),
+            on_demand=os.getenv("CAMERA_MODE", "on_demand") == "on_demand",
+            hold_secs=float(os.getenv("CAMERA_HOLD_SECS", "5")),
+            # Measured from aiortc's decoder on WebRTC; set it for Daily, where it can't be
+            decode_cpu_per_sec=float(os.getenv("CAMERA_DECODE_CPU_PER_SEC", "0")) or None,
         )
-        stt = CartesiaSTTService(
-            api_key=os.getenv("CARTESIA_API_KEY"),
-            base_url="api.cartesia.ai",
-            live_options=live_options,
-            streaming=True,
-        )
-        openai = OpenAILLMService(
-            model="gpt-4o",  # Using gpt-4o for full vision capabilities
-            api_key=os.getenv("OPENAI_API_KEY"),
-            params=OpenAILLMService.InputParams(
-                temperature=0.3,  # Increased temperature to allow more helpful responses
-                max_tokens=150,  # Reduced tokens for more concise responses
+
+        stt, openai, tts, heyGen = create_services(session)
+        # Steps the avatar video down (and back up) as host CPU, frame backlog or egress demand
+        webrtc_connection = getattr(runner_args, "webrtc_connection", None)
+        video_controller = None
+        if os.getenv("ADAPTIVE_VIDEO", "1") == "1":
+            video_controller = AdaptiveVideoController(
+                transport,
+                connection=webrtc_connection,
+                cpu_high=float(os.getenv("VIDEO_CPU_HIGH_PCT", "85")),
+                cpu_low=float(os.getenv("VIDEO_CPU_LOW_PCT", "60")),
+                egress_low=float(os.getenv("VIDEO_EGRESS_LOW", "0.7")),
+                egress_high=float(os.getenv("VIDEO_EGRESS_HIGH", "0.9")),
             )
-        )
-        # TTS for audio output - HeyGen handles video, Cartesia handles audio
-        tts = CartesiaTTSService(
-            api_key=os.getenv("CARTESIA_API_KEY"),
-            voice_id="f9836c6e-a0bd-460e-9d3c-f7299fa60f94",
-            # f9836c6e-a0bd-460e-9d3c-f7299fa60f94, 5ee9feff-1265-424a-9d7f-8e4d431a12c7
-            model="sonic-2",
-            params=CartesiaTTSService.InputParams(
-                language=Language.EN,
-                speed="fast"
-            ),
-            aggregate_sentences=False,
-        )
-        heyGen = HeyGenVideoService(
-            api_key=os.getenv("HEYGEN_API_KEY"),
-            session=session,
-            session_request=NewSessionRequest(
-                avatar_id="Katya_Chair_Sitting_public",
-                version="v2",
-                quality=AvatarQuality.medium,
-                # voice_id="your_preferred_voice_id",
-            ),
-        )
         ########################################################################################
         ##################################### Function Calling #################################
         ########################################################################################
-        N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL')
-        N8N_USER = os.getenv('N8N_USER')
-        N8N_PASS = os.getenv('N8N_PASS')
-
         # Define function schema
         assistant = FunctionSchema(
             name="medical_assistant",
@@ -230,10 +377,17 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
         ]
         context = OpenAILLMContext(messages=messages, tools=tools)
         context_aggregator = openai.create_context_aggregator(context)
+        image_processor = UserImageProcessor(context)
+        # Keeps the prompt under budget, summarizing older turns in the background
+        context_window = ContextWindowManager(
+            context,
+            openai,
+            max_tokens=int(os.getenv("LLM_CONTEXT_MAX_TOKENS", "4000")),
+        )
 
         async def medical_assistant(params: FunctionCallParams):
             # Immediately send a holding message
-            await task.queue_frame(TTSSpeakFrame("Ok."))
+            await task.queue_frame(TTSSpeakFrame(HOLDING_PHRASE))
             query = None
             if isinstance(params.arguments, dict):
                 query = params.arguments.get("query")
@@ -242,41 +396,59 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
                 return
 
             try:
-                async with httpx.AsyncClient(timeout=15) as client:
-                    resp = await client.get(
-                        N8N_WEBHOOK_URL,
-                        params={"query": query},
-                        auth=(N8N_USER, N8N_PASS),
-                        headers={"Accept": "application/json"},
-                    )
-                resp.raise_for_status()
-
-                try:
-                    data = resp.json()
-                except ValueError:
-                    data = {"text": resp.text}
-                await params.result_callback(data)
+                data = await n8n_client.query(query)
+                await params.result_callback(tool_result_compactor.compact(data, query=query))
             except Exception as e:
                 await params.result_callback({"error": str(e)})
 
         openai.register_function("medical_assistant", medical_assistant)
+        # A speculative medical_assistant call warms the webhook cache for the real one
+        openai.prefetch_function("medical_assistant", lambda args: n8n_client.query(args["query"]))
+        speculator = TranscriptSpeculator(
+            openai,
+            stable_secs=float(os.getenv("SPECULATION_STABLE_MS", "500")) / 1000,
+        )
+        text_chunker = ClauseTextAggregator(
+            first_min_chars=int(os.getenv("TTS_FIRST_CHUNK_CHARS", "15")),
+            min_chars=int(os.getenv("TTS_CHUNK_CHARS", "60")),
+        )
 
         ########################################################################################
         ################################# Pipeline Configuration ###############################
         ########################################################################################
         rtvi = RTVIProcessor(config=RTVIConfig(config=[]))
+        conversation_id = str(uuid.uuid4())
+        observers = [
+            RTVIObserver(rtvi),
+            # Per-stage turn latencies, aggregated for the whole worker
+            TurnLatencyObserver(
+                input=transport.input(),
+                stt=stt,
+                llm=openai,
+                tts=tts,
+                avatar=heyGen,
+                output=transport.output(),
+            ),
+        ]
+        if session_store:
+            observers.append(SessionRecorder(session_store, conversation_id, stt=stt, llm=openai))
         pipeline = Pipeline(
             [
                 transport.input(),
+                camera,
                 rtvi,
                 stt,
+                speculator,  # starts the LLM early on a stable interim transcript
                 image_requester,  # only triggers when the patient asks to show something
                 image_processor,
                 context_aggregator.user(),
                 user_response,
+                context_window,
                 openai,
+                text_chunker,  # clause-sized, markdown-free text for TTS
                 tts,
                 heyGen,
+                *([video_controller] if video_controller else []),
                 transport.output(),
                 context_aggregator.assistant(),
             ]
@@ -288,11 +460,11 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
                 enable_usage_metrics=True,
                 allow_interruptions=True,
                 audio_in_sample_rate=16000,
-                audio_out_sample_rate=24000,
+                audio_out_sample_rate=AUDIO_OUT_SAMPLE_RATE,
                 enable_heartbeats=True,
                 heartbeats_period_secs=2.0,
                 start_metadata={
-                    "conversation_id": "conv-7",
+                    "conversation_id": conversation_id,
                     "session_data": {
                         "user_id": "user-samuel",
                         "start_time": datetime.now(),
@@ -301,7 +473,7 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
             ),
             idle_timeout_secs=300,  # Reduced timeout
             cancel_on_idle_timeout=False,
-            observers=[RTVIObserver(rtvi)],
+            observers=observers,
         )
         ########################################################################################
         ##################################### Event Handlers ###################################
@@ -310,14 +482,12 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
         async def on_client_connected(transport, client):
             logger.info(f"Client connected: {client}")
 
-            # Enable camera for visual examination when requested
-            await maybe_capture_participant_camera(transport, client)
-            client_id = get_transport_client_id(transport, client)
+            # Camera stays off until the patient asks to show something
+            client_id = await camera.attach(client)
             image_requester.set_participant_id(client_id)
 
             # Introduction
-            await task.queue_frame(TTSSpeakFrame(
-                "Hello! I'm Dr. Sarah, and I'm here to help you with your health concerns. What symptoms are you experiencing today?"))
+            await task.queue_frame(TTSSpeakFrame(GREETING))
 
             # Kick off the conversation - let the main system prompt handle the greeting
             await task.queue_frames([LLMRunFrame()])
@@ -325,6 +495,22 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
         @transport.event_handler("on_client_disconnected")
         async def on_client_disconnected(transport, client):
             logger.info(f"Client disconnected")
+            logger.info(f"Barge-in waste: {openai.barge_in_stats.as_dict()}")
+            logger.info(f"Speculation: {openai.speculation_stats.as_dict()}")
+            logger.info(f"Prompt cache: {openai.prompt_cache_stats.as_dict()}")
+            logger.info(f"Context window: {context_window.stats()}")
+            logger.info(f"TTS chunks: {text_chunker.stats()}")
+            logger.info(f"Tool results: {tool_result_compactor.stats()}")
+            logger.info(f"n8n webhook: {n8n_client.stats()}")
+            if video_controller:
+                logger.info(f"Avatar video: {video_controller.stats()}")
+            logger.info(f"Camera: {camera.stats()}")
+            logger.info(f"Avatar pool: {avatar_pool.stats()}")
+            logger.info(f"Cartesia connections: {cartesia_connections.stats()}")
+            logger.info(f"Turn latency p50/p95 (ms): {latency_summary()}")
+            turn_analyzer = transport.input().turn_analyzer
+            if isinstance(turn_analyzer, AdaptiveTurnAnalyzer):
+                logger.info(f"Turn taking: {turn_analyzer.stats()}")
             await task.cancel()
 
         @task.event_handler("on_idle_timeout")
@@ -335,33 +521,176 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
         ################################## Running the Pipeline ################################
         ########################################################################################
         runner = PipelineRunner(handle_sigint=runner_args.handle_sigint)
-        await runner.run(task)
+        # Reported to server.py's session router through /worker/load
+        session_id = webrtc_connection.pc_id if webrtc_connection else f"session-{id(task)}"
+        logger.info(f"Conversation {conversation_id} (session {session_id})")
+        processor_timings.instrument([pipeline], session_id)
+        if session_store:
+            session_store.start_conversation(conversation_id, session_id=session_id)
+        try:
+            with worker_load.session(session_id):
+                await runner.run(task)
+        finally:
+            logger.info(f"Processor loop time (busy ms, max step ms): "
+                        f"{processor_timings.summary(session_id)}")
+            processor_timings.end_session(session_id)
+            if session_store:
+                session_store.end_conversation(conversation_id)
+                await session_store.flush()
+                logger.info(f"Session store: {session_store.stats()}")
+
+############################################################################################
+######################################## Metrics API #######################################
+############################################################################################
+# Mounted on the runner's server (port 7860); server.py polls and proxies it.
+metrics_router = APIRouter()
+
+
+def latency_summary():
+    return {
+        stage: (round(h["p50_ms"]), round(h["p95_ms"]))
+        for stage, h in latency_histograms.snapshot().items() if h["count"]
+    }
+
+
+@metrics_router.get("/metrics/latency")
+async def latency_metrics():
+    """Per-stage turn latency histograms for this worker."""
+    return latency_histograms.snapshot()
+
+
+@metrics_router.get("/worker/load")
+async def worker_load_metrics():
+    """Active sessions and event-loop lag, polled by server.py to place new sessions."""
+    return worker_load.snapshot()
+
+
+@metrics_router.get("/worker/capacity")
+async def worker_capacity():
+    """Whether this worker accepts new sessions and how many more, against its budget."""
+    return worker_load.capacity()
+
+
+@metrics_router.post("/worker/drain")
+async def worker_drain():
+    """Stop accepting new sessions; the active ones run to their end."""
+    worker_load.draining = True
+    return worker_load.capacity()
+
+
+@metrics_router.post("/worker/undrain")
+async def worker_undrain():
+    """Accept new sessions again."""
+    worker_load.draining = False
+    return worker_load.capacity()
+
+
+@metrics_router.get("/turn/inference")
+async def turn_inference_metrics():
+    """Smart Turn batching: batch sizes and p50/p95 queue-to-result latency of this worker."""
+    return turn_engine.stats()
+
+
+@metrics_router.get("/webhook/stats")
+async def webhook_metrics():
+    """n8n webhook cache hits and misses, coalesced calls and upstream p50/p95 latency."""
+    return n8n_client.stats()
+
+
+@metrics_router.get("/debug/loop")
+async def debug_loop():
+    """Event-loop stalls and the loop time of every frame processor, per class and session."""
+    return {"stalls": loop_monitor.stats(), "processors": processor_timings.snapshot()}
+
+
+@metrics_router.get("/debug/profile")
+async def debug_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample the event loop for ``seconds`` and return collapsed stacks (flamegraph.pl, speedscope)."""
+    try:
+        stacks = await loop_monitor.profile(min(max(seconds, 0.1), 60.0), max(interval_ms, 1.0))
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"error": str(e), "status": "error"})
+    return PlainTextResponse(stacks)
+
+
+@metrics_router.get("/avatar/pool")
+async def avatar_pool_metrics():
+    """Pre-warmed HeyGen sessions: hit rate and avatar time to first frame."""
+    return avatar_pool.stats()
+
+
+@metrics_router.get("/cartesia/connections")
+async def cartesia_connection_metrics():
+    """Warm Cartesia websockets: leases served warm or reused, and connect time saved."""
+    return cartesia_connections.stats()
+
+
+@metrics_router.get("/video/quality")
+async def video_quality_metrics():
+    """Host CPU and the latest avatar video level changes of this worker's sessions."""
+    return {"host_cpu_pct": round(host_cpu.percent(), 1), "decisions": list(video_decisions)}
 
 ############################################################################################
 ###################################### Bot Entry Point #####################################
 ############################################################################################
+def create_vad_analyzer():
+    return model_registry.vad_analyzer(params=VADParams(stop_secs=0.2))
+
+
+def create_turn_analyzer():
+    if os.getenv("ADAPTIVE_TURN", "1") != "1":
+        return turn_engine.turn_analyzer(
+            params=SmartTurnParams(
+                stop_secs=2.0,
+                pre_speech_ms=900,  # e.g. 900 ms
+                max_duration_secs=30.0  # e.g. 30 seconds
+            )
+        )
+    # Silence timeout learned per patient between TURN_MIN_STOP_SECS and TURN_MAX_STOP_SECS
+    max_stop_secs = float(os.getenv("TURN_MAX_STOP_SECS", "3.0"))
+    return AdaptiveTurnAnalyzer(
+        turn_engine.turn_analyzer(
+            params=SmartTurnParams(
+                stop_secs=max_stop_secs,
+                pre_speech_ms=900,
+                max_duration_secs=30.0
+            )
+        ),
+        min_stop_secs=float(os.getenv("TURN_MIN_STOP_SECS", "0.3")),
+        max_stop_secs=max_stop_secs,
+    )
+
+
+def daily_params(**kwargs) -> TransportParams:
+    # Daily's native client is only loaded by workers that serve Daily rooms
+    from pipecat.transports.daily.transport import DailyParams
+
+    return DailyParams(**kwargs)
+
+
 async def bot(runner_args: RunnerArguments):
     """Main bot entry point compatible with Pipecat Cloud."""
+    # The analyzers below share the worker's models; wait for them off the event loop
+    await model_registry.aload()
+    # Avatar quality and output resolution can only be chosen when the session starts
+    video = VIDEO_LEVELS[-1]
+    if os.getenv("ADAPTIVE_VIDEO", "1") == "1":
+        video = start_level(
+            cpu_high=float(os.getenv("VIDEO_CPU_HIGH_PCT", "85")),
+            cpu_low=float(os.getenv("VIDEO_CPU_LOW_PCT", "60")),
+        )
     transport_params = {
-        "daily": lambda: DailyParams(
+        "daily": lambda: daily_params(
             audio_in_enabled=True,
             audio_out_enabled=True,
             video_in_enabled=True,
             video_out_enabled=True,
             video_out_is_live=True,
-            video_out_width=1280,
-            video_out_height=720,
-            video_out_bitrate=2_000_000,
-            vad_analyzer=SileroVADAnalyzer(
-                params=VADParams(stop_secs=0.2),
-            ),
-            turn_analyzer=LocalSmartTurnAnalyzerV3(
-                params=SmartTurnParams(
-                    stop_secs=2.0,
-                    pre_speech_ms=900,  # e.g. 900 ms
-                    max_duration_secs=30.0  # e.g. 30 seconds
-                )
-            ),
+            video_out_width=video.width,
+            video_out_height=video.height,
+            video_out_bitrate=video.bitrate,
+            vad_analyzer=create_vad_analyzer(),
+            turn_analyzer=create_turn_analyzer(),
         ),
         "webrtc": lambda: TransportParams(
             audio_in_enabled=True,
@@ -369,25 +698,72 @@ async def bot(runner_args: RunnerArguments):
             video_in_enabled=True,
             video_out_enabled=True,
             video_out_is_live=True,
-            video_out_width=1280,
-            video_out_height=720,
-            vad_analyzer=SileroVADAnalyzer(
-                params=VADParams(stop_secs=0.2),
-            ),
-            turn_analyzer=LocalSmartTurnAnalyzerV3(
-                params=SmartTurnParams(
-                    stop_secs=2.0,
-                    pre_speech_ms=900,
-                    max_duration_secs=30.0
-                )
-            ),
+            video_out_width=video.width,
+            video_out_height=video.height,
+            vad_analyzer=create_vad_analyzer(),
+            turn_analyzer=create_turn_analyzer(),
         ),
     }
     transport = await create_transport(runner_args, transport_params)
-    await run_bot(transport, runner_args)
+    await run_bot(
+        transport,
+        runner_args,
+        create_services=functools.partial(create_ai_services, avatar_quality=video.avatar_quality),
+    )
 
 
-if __name__ == "__main__":
-    from pipecat.runner.run import main
+async def warm_up_models():
+    """Load and warm the VAD / smart-turn models once per worker so sessions only pay for
+    their own streaming state."""
+    try:
+        await asyncio.to_thread(model_registry.warm_up)
+    except Exception as e:
+        logger.warning(f"Model warm-up failed, the first session will load the models: {e}")
 
-    main()
\ No newline at end of file
+
+if __name__ == "__main__":
+    from pipecat.runner import run
+
+    # The metrics, worker and debug endpoints and the pools' lifespan are added to the app the
+    # runner builds in a private helper; pyproject pins the pipecat-ai release it was written for.
+    create_server_app = getattr(run, "_create_server_app", None)
+
+    def create_server_app_with_metrics(*args, **kwargs):
+        app = create_server_app(*args, **kwargs)
+        app.include_router(metrics_router)
+        lifespan = app.router.lifespan_context
+
+        # Fill the avatar pool and warm the models before the first call arrives; on shutdown,
+        # let the calls in progress end before their connections are closed
+        @contextlib.asynccontextmanager
+        async def lifespan_with_avatar_pool(app):
+            avatar_pool.start()
+            warm_up = None
+            if os.getenv("PRELOAD_MODELS", "1") == "1":
+                warm_up = asyncio.create_task(warm_up_models())
+            try:
+                async with lifespan(app) as state:
+                    yield state
+                    await worker_load.drain(timeout_secs=WORKER_DRAIN_TIMEOUT_SECS)
+            finally:
+                if warm_up:
+                    # A load can't be interrupted, and exiting under it aborts onnxruntime
+                    await warm_up
+                await avatar_pool.aclose()
+                await cartesia_connections.aclose()
+                await n8n_client.aclose()
+                turn_engine.shutdown()
+                if session_store:
+                    await session_store.aclose()
+
+        app.router.lifespan_context = lifespan_with_avatar_pool
+        return app
+
+    if create_server_app is None:
+        logger.warning(
+            "pipecat.runner has no _create_server_app: /metrics, /worker and /debug endpoints "
+            "are disabled and server.py will see this worker as down"
+        )
+    else:
+        run._create_server_app = create_server_app_with_metrics
+    run.main()
\ No newline at end of file
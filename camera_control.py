@@ -0,0 +1,241 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from pipecat.frames.frames import Frame, UserImageRequestFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.runner.utils import get_transport_client_id, maybe_capture_participant_camera
+from pipecat.transports.base_transport import BaseTransport
+
+# How often queued frames are thrown away while a WebRTC camera track is paused.
+WEBRTC_DRAIN_SECS = 0.5
+# Data channel message asking the client to stop / resume sending its camera (pipecatService.js).
+CAMERA_CONTROL_MESSAGE = "camera-control"
+VIDEO_TRANSCEIVER_INDEX = 1
+
+
+def thread_cpu_secs(thread) -> Optional[float]:
+    """CPU time (user + system) used so far by one thread of this process; Linux only."""
+    try:
+        with open(f"/proc/self/task/{thread.native_id}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, AttributeError, IndexError, ValueError):
+        return None
+
+
+class DecodeCostMeter:
+    """CPU seconds one second of received camera video costs to decode, measured on this worker.
+
+    Fed by WebRTC sessions with the CPU time of aiortc's video decoder thread while the camera
+    was on; ``None`` until ``min_video_secs`` of video have been measured.
+    """
+
+    def __init__(self, *, min_video_secs: float = 5.0):
+        self._min_video_secs = min_video_secs
+        self.cpu_secs = 0.0
+        self.video_secs = 0.0
+
+    def add(self, cpu_secs: float, video_secs: float):
+        self.cpu_secs += cpu_secs
+        self.video_secs += video_secs
+
+    @property
+    def cpu_per_sec(self) -> Optional[float]:
+        if self.video_secs < self._min_video_secs:
+            return None
+        return self.cpu_secs / self.video_secs
+
+
+decode_cost = DecodeCostMeter()
+
+
+class OnDemandCameraController(FrameProcessor):
+    """Receives the patient's camera only around image requests.
+
+    Placed right after ``transport.input()``: when a ``UserImageRequestFrame`` travels
+    upstream it subscribes to the camera before the transport sees the request, and
+    unsubscribes ``hold_secs`` after the last request. With Daily the subscription itself
+    is dropped, so nothing is received or decoded. With SmallWebRTC the camera track is
+    paused and drained, which skips the per-frame RGB conversion and pipeline traffic, and
+    the client is asked over the data channel to stop sending the camera; aiortc keeps
+    decoding whatever still arrives, so only the time the source was really silent (no
+    frames reached the paused track) counts as decode saved.
+
+    Decode CPU saved is that time multiplied by ``decode_cpu_per_sec``, which when not given
+    is measured from aiortc's decoder thread while the camera is on (``decode_cost``); it is
+    reported as ``None`` until there is a measurement. With ``on_demand=False`` the camera
+    is captured for the whole session, as before.
+    """
+
+    def __init__(self, transport: BaseTransport, *, webrtc_connection: Any = None,
+                 on_demand: bool = True, hold_secs: float = 5.0,
+                 decode_cpu_per_sec: Optional[float] = None):
+        super().__init__()
+        self._transport = transport
+        self._on_demand = on_demand
+        self._webrtc_connection = webrtc_connection
+        self._hold_secs = hold_secs
+        self._decode_cpu_per_sec = decode_cpu_per_sec
+        self._participant_id: Optional[str] = None
+        self._capturing = False
+        self._release_task: Optional[asyncio.Task] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self._off_since: Optional[float] = None
+        self._off_secs = 0.0
+        # Decoder thread CPU and time at the last camera on/off switch (WebRTC)
+        self._decode_mark: Optional[tuple] = None
+        self._decode_cpu_secs_off = 0.0
+        self._source_off_secs = 0.0
+        self.subscriptions = 0
+        self.frames_skipped = 0
+
+    def _is_daily(self) -> bool:
+        try:
+            from pipecat.transports.daily.transport import DailyTransport
+        except Exception:
+            return False
+        return isinstance(self._transport, DailyTransport)
+
+    def _webrtc_track(self):
+        if self._webrtc_connection is None:
+            return None
+        return self._webrtc_connection.video_input_track()
+
+    def _decoder_cpu_secs(self) -> Optional[float]:
+        try:
+            receiver = self._webrtc_connection.pc.getTransceivers()[VIDEO_TRANSCEIVER_INDEX].receiver
+        except (AttributeError, IndexError):
+            return None
+        thread = getattr(receiver, "_RTCRtpReceiver__decoder_thread", None)
+        return thread_cpu_secs(thread) if thread else None
+
+    def _mark_decode(self, *, was_on: bool):
+        """Charge the decoder CPU since the last switch to the state the camera was in."""
+        cpu, now = self._decoder_cpu_secs(), time.monotonic()
+        if cpu is not None and self._decode_mark is not None:
+            last_cpu, last_at = self._decode_mark
+            if not was_on:
+                self._decode_cpu_secs_off += cpu - last_cpu
+            else:
+                decode_cost.add(cpu - last_cpu, now - last_at)
+        self._decode_mark = None if cpu is None else (cpu, now)
+
+    def _ask_client(self, enabled: bool):
+        self._webrtc_connection.send_app_message({"type": CAMERA_CONTROL_MESSAGE, "enabled": enabled})
+
+    async def attach(self, client: Any) -> str:
+        """Start a session for ``client`` with the camera off; returns its participant id."""
+        self._participant_id = get_transport_client_id(self._transport, client)
+        if self._on_demand:
+            await self._stop_capture()
+        else:
+            await maybe_capture_participant_camera(self._transport, client)
+        return self._participant_id
+
+    async def _start_capture(self):
+        if self._capturing or not self._participant_id:
+            return
+        self._capturing = True
+        self.subscriptions += 1
+        if self._off_since is not None:
+            self._off_secs += time.monotonic() - self._off_since
+            self._off_since = None
+
+        if self._is_daily():
+            await self._transport.capture_participant_video(
+                self._participant_id, framerate=0, video_source="camera"
+            )
+        else:
+            if self._drain_task:
+                await self.cancel_task(self._drain_task)
+                self._drain_task = None
+            track = self._webrtc_track()
+            if track:
+                self._mark_decode(was_on=False)
+                self._ask_client(True)
+                await track.discard_old_frames()
+                track.set_enabled(True)
+        logger.debug(f"{self} camera on for {self._participant_id}")
+
+    async def _stop_capture(self):
+        self._capturing = False
+        self._off_since = time.monotonic()
+        if self._is_daily():
+            await self._transport.update_subscriptions(
+                participant_settings={self._participant_id: {"media": {"camera": "unsubscribed"}}}
+            )
+        else:
+            track = self._webrtc_track()
+            if track:
+                self._mark_decode(was_on=True)
+                self._ask_client(False)
+                track.set_enabled(False)
+                if not self._drain_task:
+                    self._drain_task = self.create_task(self._drain(track))
+        logger.debug(f"{self} camera off for {self._participant_id}")
+
+    async def _drain(self, track):
+        # A paused aiortc track keeps queueing decoded frames; drop them so memory stays flat.
+        # An interval in which none arrived means the client really stopped sending.
+        queue = getattr(track, "_queue", None)
+        while True:
+            await asyncio.sleep(WEBRTC_DRAIN_SECS)
+            frames = queue.qsize() if queue is not None else None
+            await track.discard_old_frames()
+            if frames is not None:
+                self.frames_skipped += frames
+                if frames == 0:
+                    self._source_off_secs += WEBRTC_DRAIN_SECS
+
+    async def _release_later(self):
+        await asyncio.sleep(self._hold_secs)
+        self._release_task = None
+        await self._stop_capture()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if self._on_demand and isinstance(frame, UserImageRequestFrame):
+            if self._release_task:
+                await self.cancel_task(self._release_task)
+            await self._start_capture()
+            self._release_task = self.create_task(self._release_later())
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        for task in (self._release_task, self._drain_task):
+            if task:
+                await self.cancel_task(task)
+
+    def stats(self) -> Dict[str, Any]:
+        off_secs = self._off_secs
+        if self._off_since is not None:
+            off_secs += time.monotonic() - self._off_since
+        decode_cpu_per_sec = self._decode_cpu_per_sec
+        if decode_cpu_per_sec is None:
+            decode_cpu_per_sec = decode_cost.cpu_per_sec
+        if self._is_daily():
+            source_off_secs = off_secs
+            transport = {}
+        else:
+            source_off_secs = self._source_off_secs
+            transport = {
+                # Decoded anyway, but never converted to RGB nor sent down the pipeline
+                "frames_skipped": self.frames_skipped,
+                "source_off_secs": source_off_secs,
+                "decode_cpu_secs_while_off": round(self._decode_cpu_secs_off, 2),
+            }
+        return {
+            "subscriptions": self.subscriptions,
+            "camera_off_secs": off_secs,
+            **transport,
+            "decode_cpu_per_sec": decode_cpu_per_sec,
+            "estimated_decode_cpu_secs_saved": (
+                None if decode_cpu_per_sec is None else source_off_secs * decode_cpu_per_sec
+            ),
+        }
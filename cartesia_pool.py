@@ -0,0 +1,273 @@
+import asyncio
+import functools
+import time
+import urllib.parse
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from loguru import logger
+from websockets.asyncio.client import connect as websocket_connect
+from websockets.protocol import State
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+class _Connection:
+    def __init__(self, key: Key, websocket, connect_ms: float):
+        self.key = key
+        self.websocket = websocket
+        self.connect_ms = connect_ms
+        self.created_at = time.monotonic()
+        self.idle_since = self.created_at
+        self.pinged_at = self.created_at
+        self.uses = 0
+        self.reader: Optional[asyncio.Task] = None
+
+    @property
+    def open(self) -> bool:
+        return self.websocket.state is State.OPEN
+
+    async def _drain(self):
+        # Late messages of the previous session (e.g. audio of a cancelled TTS context).
+        async for _ in self.websocket:
+            pass
+
+    def park(self):
+        self.idle_since = time.monotonic()
+        self.reader = asyncio.get_running_loop().create_task(self._drain())
+
+    async def unpark(self):
+        if self.reader:
+            self.reader.cancel()
+            await asyncio.gather(self.reader, return_exceptions=True)
+            self.reader = None
+
+
+class CartesiaConnectionPool:
+    """Per-worker pool of open Cartesia websockets, leased to sessions instead of dialled by them.
+
+    Connections are keyed by URL and headers, so a session only ever gets a connection opened
+    with its own model, language, sample rate and API key; keys are learned from the first
+    lease. For every key the pool keeps up to ``size`` connections idle and open, dialling
+    new ones in the background, pinging idle ones every ``ping_interval_secs`` and replacing
+    them after ``max_idle_secs`` (Cartesia drops connections idle for 5 minutes).
+
+    ``reuse`` keys (TTS) take their connection back when a session ends, up to ``max_uses``
+    sessions per connection; messages arriving while it is idle are discarded. Other keys
+    (STT) are only pre-dialled: a transcript still in flight must never reach the next
+    patient, so their connections are closed after one session. ``stats()`` reports how
+    many leases found a warm connection and the connect time they saved.
+    """
+
+    def __init__(self, *, size: int = 2, max_uses: int = 20, max_idle_secs: float = 240.0,
+                 ping_interval_secs: float = 20.0, ping_timeout_secs: float = 5.0,
+                 check_interval_secs: float = 5.0):
+        self._size = size
+        self._max_uses = max_uses
+        self._max_idle = max_idle_secs
+        self._ping_interval = ping_interval_secs
+        self._ping_timeout = ping_timeout_secs
+        self._check_interval = check_interval_secs
+        self._targets: Dict[Key, Tuple[str, bool]] = {}
+        self._idle: Dict[Key, Deque[_Connection]] = {}
+        self._connecting: Dict[Key, int] = defaultdict(int)
+        self._leased: Dict[Any, _Connection] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._connect_ms: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=500))
+
+    @staticmethod
+    def _key(url: str, headers: Optional[Dict[str, str]]) -> Key:
+        return url, tuple(sorted((headers or {}).items()))
+
+    def start(self):
+        if self._size <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._maintain())
+
+    async def _connect(self, key: Key) -> _Connection:
+        url, headers = key
+        label = self._targets[key][0]
+        start = time.perf_counter()
+        websocket = await websocket_connect(url, additional_headers=dict(headers) or None)
+        connect_ms = (time.perf_counter() - start) * 1000
+        self._connect_ms[label].append(connect_ms)
+        self._counts[label]["connects"] += 1
+        return _Connection(key, websocket, connect_ms)
+
+    async def _close(self, connection: _Connection):
+        await connection.unpark()
+        try:
+            await connection.websocket.close()
+        except Exception as e:
+            logger.debug(f"Error closing Cartesia connection: {e}")
+
+    async def _add(self, key: Key):
+        self._connecting[key] += 1
+        try:
+            connection = await self._connect(key)
+        except Exception as e:
+            self._counts[self._targets[key][0]]["connect_errors"] += 1
+            logger.warning(f"Unable to pre-connect to Cartesia: {e}")
+            return
+        finally:
+            self._connecting[key] -= 1
+        connection.park()
+        self._idle[key].append(connection)
+
+    async def _ping(self, connection: _Connection) -> bool:
+        try:
+            pong = await connection.websocket.ping()
+            await asyncio.wait_for(pong, timeout=self._ping_timeout)
+            connection.pinged_at = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    async def _tend(self, key: Key):
+        label = self._targets[key][0]
+        idle = self._idle[key]
+        for connection in list(idle):
+            now = time.monotonic()
+            if connection not in idle:
+                continue  # leased meanwhile
+            if not connection.open:
+                reason = "closed"
+            elif now - connection.idle_since >= self._max_idle:
+                reason = "expired"
+            elif now - connection.pinged_at >= self._ping_interval and not await self._ping(connection):
+                reason = "ping_failures"
+            else:
+                continue
+            if connection not in idle:
+                continue  # leased while being pinged
+            idle.remove(connection)
+            self._counts[label][reason] += 1
+            await self._close(connection)
+
+    async def _maintain(self):
+        while True:
+            for key in list(self._targets):
+                await self._tend(key)
+                missing = self._size - len(self._idle[key]) - self._connecting[key]
+                if missing > 0:
+                    await asyncio.gather(*(self._add(key) for _ in range(missing)))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def lease(self, url: str, *, headers: Optional[Dict[str, str]] = None,
+                    label: str = "cartesia", reuse: bool = True):
+        """An open websocket to ``url``: an idle one from the pool, or a newly dialled one."""
+        key = self._key(url, headers)
+        if key not in self._targets:
+            self._targets[key] = (label, reuse)
+            self._idle[key] = deque()
+        self.start()
+        if self._wake:
+            self._wake.set()
+        counts = self._counts[label]
+        counts["leases"] += 1
+        idle = self._idle[key]
+        while idle:
+            connection = idle.popleft()
+            await connection.unpark()
+            if connection.open:
+                counts["reused" if connection.uses else "warm"] += 1
+                counts["saved_ms"] += round(connection.connect_ms)
+                break
+            counts["closed"] += 1
+        else:
+            connection = await self._connect(key)
+            counts["cold"] += 1
+        connection.uses += 1
+        self._leased[connection.websocket] = connection
+        return connection.websocket
+
+    async def release(self, websocket):
+        """Hand a leased websocket back; it is kept for the next session or closed."""
+        connection = self._leased.pop(websocket, None)
+        if connection is None:
+            await websocket.close()
+            return
+        _, reuse = self._targets[connection.key]
+        idle = self._idle[connection.key]
+        if reuse and connection.open and connection.uses < self._max_uses and len(idle) < self._size:
+            connection.park()
+            idle.append(connection)
+        else:
+            await self._close(connection)
+
+    async def aclose(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for idle in self._idle.values():
+            while idle:
+                await self._close(idle.popleft())
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for label, counts in self._counts.items():
+            leases = counts["leases"]
+            connect_ms = self._connect_ms[label]
+            stats[label] = {
+                **counts,
+                "hit_rate": (counts["warm"] + counts["reused"]) / leases if leases else 0.0,
+                "connect_ms_p50": round(_percentile(connect_ms, 0.5)),
+                "connect_ms_p95": round(_percentile(connect_ms, 0.95)),
+                "idle": sum(len(idle) for key, idle in self._idle.items()
+                            if self._targets[key][0] == label),
+            }
+        return stats
+
+
+@functools.lru_cache(maxsize=None)
+def pooled_cartesia_stt_class():
+    """``PooledCartesiaSTTService``, defined on first use (bot.py imports Cartesia STT lazily)."""
+    from pipecat.services.cartesia.stt import CartesiaSTTService
+
+    class PooledCartesiaSTTService(CartesiaSTTService):
+        """CartesiaSTTService that leases its websocket from a CartesiaConnectionPool."""
+
+        def __init__(self, *, connections: CartesiaConnectionPool, **kwargs):
+            super().__init__(**kwargs)
+            self._connections = connections
+
+        async def _connect(self):
+            params = self._settings.to_dict()
+            ws_url = f"wss://{self._base_url}/stt/websocket?{urllib.parse.urlencode(params)}"
+            headers = {"Cartesia-Version": "2025-04-16", "X-API-Key": self._api_key}
+            if self._connection:
+                # Timed out between turns; run_stt() reconnects.
+                await self._connections.release(self._connection)
+                self._connection = None
+            try:
+                self._connection = await self._connections.lease(
+                    ws_url, headers=headers, label="stt", reuse=False
+                )
+                if self._receiver_task is None or self._receiver_task.done():
+                    self._receiver_task = asyncio.create_task(self._receive_messages())
+            except Exception as e:
+                logger.error(f"{self}: unable to connect to Cartesia: {e}")
+
+        async def _disconnect(self):
+            if self._receiver_task:
+                self._receiver_task.cancel()
+                await asyncio.gather(self._receiver_task, return_exceptions=True)
+                self._receiver_task = None
+            if self._connection:
+                await self._connections.release(self._connection)
+                self._connection = None
+
+    return PooledCartesiaSTTService
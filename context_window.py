@@ -0,0 +1,231 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from pipecat.frames.frames import Frame, LLMContextFrame
+from pipecat.processors.aggregators.openai_llm_context import (
+    OpenAILLMContext,
+    OpenAILLMContextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.llm_service import LLMService
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+# Approximate input cost of one image part at the detail level gpt-4o uses by default.
+IMAGE_TOKENS = 765
+# Per-message overhead of the chat format (role, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Stands in for an image once the bot has answered about it.
+IMAGE_PLACEHOLDER = "[image the patient showed, already examined]"
+
+SUMMARY_PREFIX = "Summary of the earlier part of this consultation:"
+SUMMARY_INSTRUCTIONS = (
+    "You summarize a doctor-patient voice consultation for the doctor's own notes. "
+    "Keep every symptom, duration, severity, medication, allergy, finding from images, "
+    "advice already given and open question. Write plain sentences, at most 150 words."
+)
+
+
+def count_text_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(message: Dict[str, Any]) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += count_text_tokens(content)
+    elif isinstance(content, list):
+        for part in content:
+            if part.get("type") == "text":
+                tokens += count_text_tokens(part.get("text", ""))
+            else:
+                tokens += IMAGE_TOKENS
+    if message.get("tool_calls"):
+        tokens += count_text_tokens(json.dumps(message["tool_calls"]))
+    return tokens
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(
+            part.get("text", "") if part.get("type") == "text" else "[image]" for part in content
+        )
+    if message.get("tool_calls"):
+        calls = ", ".join(c["function"]["name"] for c in message["tool_calls"])
+        content = f"{content or ''} [called {calls}]"
+    return f"{message.get('role')}: {content or ''}"
+
+
+class ContextWindowManager(FrameProcessor):
+    """Keeps the session's OpenAILLMContext within a token budget.
+
+    Sits right before the LLM. When the prompt grows past ``compact_ratio`` of the budget,
+    older turns are summarized in the background by ``llm`` and later replaced by a single
+    summary message. If the prompt is over budget before a summary is ready, the oldest
+    turns are dropped so the LLM call never waits. The system prompt is always kept.
+
+    The assistant aggregator pushes the context upstream to the LLM after a function call
+    result, so that re-run never passes through here. When ``llm`` takes context hooks
+    (``SpeculativeOpenAILLMService``) the budget is enforced from there, on every request;
+    otherwise on the context frames going past.
+
+    Images are replaced by a short placeholder once the bot has answered about them: the
+    answer stays in the history, and later prompts no longer carry the image.
+    """
+
+    def __init__(self, context: OpenAILLMContext, llm: LLMService, *,
+                 max_tokens: int = 4000, compact_ratio: float = 0.75,
+                 keep_recent_turns: int = 4):
+        super().__init__()
+        self._context = context
+        self._llm = llm
+        self._max_tokens = max_tokens
+        self._compact_at = int(max_tokens * compact_ratio)
+        self._keep_recent_turns = keep_recent_turns
+        self._summary: Optional[str] = None
+        self._summary_task: Optional[asyncio.Task] = None
+        self._compacted: List[Dict[str, Any]] = []
+        self.prompt_tokens: List[int] = []
+        self.compactions = 0
+        self.truncations = 0
+        self.images_evicted = 0
+        self._hooked = hasattr(llm, "add_context_hook")
+        if self._hooked:
+            llm.add_context_hook(self._on_context)
+
+    def _split(self, messages: List[Dict[str, Any]]):
+        """Split history into (system prefix, turns); each turn starts at a user message."""
+        prefix = []
+        index = 0
+        while index < len(messages) and messages[index].get("role") == "system":
+            if not messages[index].get("content", "").startswith(SUMMARY_PREFIX):
+                prefix.append(messages[index])
+            index += 1
+        turns: List[List[Dict[str, Any]]] = []
+        for message in messages[index:]:
+            if message.get("role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return prefix, turns
+
+    def _assemble(self, prefix, turns) -> List[Dict[str, Any]]:
+        messages = list(prefix)
+        if self._summary:
+            messages.append({"role": "system", "content": f"{SUMMARY_PREFIX} {self._summary}"})
+        for turn in turns:
+            messages.extend(turn)
+        return messages
+
+    def _evict_answered_images(self, messages: List[Dict[str, Any]]):
+        """Swap image parts for a placeholder in user messages followed by a spoken answer."""
+        answered = max(
+            (i for i, m in enumerate(messages)
+             if m.get("role") == "assistant" and isinstance(m.get("content"), str) and m["content"]),
+            default=-1,
+        )
+        for message in messages[:answered]:
+            content = message.get("content")
+            if message.get("role") != "user" or not isinstance(content, list):
+                continue
+            if any(part.get("type") == "image_url" for part in content):
+                # In place, so a pending summary still recognizes the message.
+                message["content"] = [
+                    {"type": "text", "text": IMAGE_PLACEHOLDER} if part.get("type") == "image_url"
+                    else part
+                    for part in content
+                ]
+                self.images_evicted += 1
+
+    def _enforce_budget(self):
+        self._evict_answered_images(self._context.messages)
+        prefix, turns = self._split(self._context.messages)
+
+        # Swap in a finished summary for the turns it covers.
+        if self._compacted:
+            covered = {id(m) for m in self._compacted}
+            turns = [t for t in turns if not any(id(m) in covered for m in t)]
+            self._compacted = []
+
+        messages = self._assemble(prefix, turns)
+        tokens = sum(count_message_tokens(m) for m in messages)
+
+        # Hard limit: drop the oldest turns now, keeping at least the current one.
+        while tokens > self._max_tokens and len(turns) > 1:
+            dropped = turns.pop(0)
+            tokens -= sum(count_message_tokens(m) for m in dropped)
+            self.truncations += 1
+        messages = self._assemble(prefix, turns)
+        if messages != self._context.messages:
+            self._context.set_messages(messages)
+
+        # Only compact once enough turns have piled up since the last summary.
+        if (tokens > self._compact_at and len(turns) >= 2 * self._keep_recent_turns
+                and not self._summary_task):
+            old_turns = turns[: len(turns) - self._keep_recent_turns]
+            self._summary_task = self.create_task(
+                self._summarize([m for t in old_turns for m in t])
+            )
+        return tokens
+
+    async def _summarize(self, messages: List[Dict[str, Any]]):
+        transcript = "\n".join(_message_text(m) for m in messages)
+        if self._summary:
+            transcript = f"{SUMMARY_PREFIX} {self._summary}\n{transcript}"
+        summary_context = OpenAILLMContext(messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": transcript},
+        ])
+        try:
+            summary = await self._llm.run_inference(summary_context)
+        except Exception as e:
+            logger.warning(f"{self} unable to summarize context: {e}")
+            summary = None
+        finally:
+            self._summary_task = None
+        if summary:
+            self._summary = summary.strip()
+            self._compacted = messages
+            self.compactions += 1
+            logger.debug(f"{self} compacted {len(messages)} messages into a summary")
+
+    def _on_context(self, context):
+        if context is not self._context:
+            return
+        tokens = self._enforce_budget()
+        self.prompt_tokens.append(tokens)
+        logger.debug(f"{self} prompt size: {tokens} tokens")
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if not self._hooked and isinstance(frame, (OpenAILLMContextFrame, LLMContextFrame)):
+            self._on_context(frame.context)
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._summary_task:
+            await self.cancel_task(self._summary_task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last_prompt_tokens": self.prompt_tokens[-1] if self.prompt_tokens else 0,
+            "max_prompt_tokens": max(self.prompt_tokens, default=0),
+            "turns": len(self.prompt_tokens),
+            "compactions": self.compactions,
+            "truncations": self.truncations,
+            "images_evicted": self.images_evicted,
+        }
@@ -0,0 +1,129 @@
+import base64
+import io
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+CHANNELS = {"L": 1, "RGB": 3, "RGBA": 4}
+
+
+class PreparedImage:
+    """A camera frame ready to be sent to the LLM."""
+
+    def __init__(self, jpeg: bytes, size: Tuple[int, int], phash: int, reused: bool):
+        self.jpeg = jpeg
+        self.size = size
+        self.phash = phash
+        self.reused = reused
+
+    @property
+    def data_url(self) -> str:
+        return f"data:image/jpeg;base64,{base64.b64encode(self.jpeg).decode('utf-8')}"
+
+
+def image_message(text: Optional[str], image: PreparedImage) -> Dict:
+    """A user message carrying ``image``, in the same shape as ``add_image_frame_message``."""
+    content = []
+    if text:
+        content.append({"type": "text", "text": text})
+    content.append({"type": "image_url", "image_url": {"url": image.data_url}})
+    return {"role": "user", "content": content}
+
+
+def difference_hash(pixels: np.ndarray) -> int:
+    """64-bit dHash: sign of horizontal brightness gradients on a 9x8 sample grid."""
+    h, w = pixels.shape[:2]
+    rows = (np.arange(8) * h) // 8
+    cols = (np.arange(9) * w) // 9
+    grid = pixels[rows][:, cols].mean(axis=2)
+    bits = (grid[:, 1:] > grid[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class ImagePreparer:
+    """Per-session camera frame preparation: downscale, JPEG-encode and de-duplicate.
+
+    Frames are box-downscaled with numpy to at most ``max_side`` pixels (cropping the few
+    edge pixels that don't fill a whole block), encoded into a reused JPEG buffer, and
+    remembered by perceptual hash so a near-identical frame sent again in the same
+    session reuses the earlier encoding. Timings of every step are kept in ``timings``.
+    """
+
+    def __init__(self, *, max_side: int = 768, jpeg_quality: int = 80,
+                 max_hash_distance: int = 4, cache_size: int = 8):
+        self._max_side = max_side
+        self._jpeg_quality = jpeg_quality
+        self._max_hash_distance = max_hash_distance
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[int, PreparedImage]" = OrderedDict()
+        self._buffer = io.BytesIO()
+        self.timings: Dict[str, float] = {}
+        self.frames = 0
+        self.reused = 0
+
+    def _downscale(self, pixels: np.ndarray) -> np.ndarray:
+        h, w = pixels.shape[:2]
+        factor = -(-max(h, w) // self._max_side)  # ceil division
+        if factor <= 1:
+            return pixels
+        h, w = (h // factor) * factor, (w // factor) * factor
+        cropped = pixels[:h, :w]
+        # Box filter as factor**2 strided adds, much faster than a reshape + mean.
+        dtype = np.uint16 if factor <= 16 else np.uint32
+        sums = np.zeros((h // factor, w // factor, pixels.shape[2]), dtype=dtype)
+        for dy in range(factor):
+            for dx in range(factor):
+                sums += cropped[dy::factor, dx::factor]
+        return (sums // (factor * factor)).astype(np.uint8)
+
+    def _lookup(self, phash: int) -> Optional[PreparedImage]:
+        for known, prepared in self._cache.items():
+            if bin(known ^ phash).count("1") <= self._max_hash_distance:
+                self._cache.move_to_end(known)
+                return prepared
+        return None
+
+    def prepare(self, image: bytes, size: Tuple[int, int], format: str) -> PreparedImage:
+        """Turn a raw ``UserImageRawFrame`` payload into a prepared JPEG."""
+        self.frames += 1
+        start = time.perf_counter()
+        width, height = size
+        if format in CHANNELS:
+            pixels = np.frombuffer(image, dtype=np.uint8).reshape(height, width, CHANNELS[format])
+        else:
+            pixels = np.asarray(Image.frombytes(format, size, image).convert("RGB"))
+        if pixels.shape[2] == 4:
+            pixels = pixels[:, :, :3]
+        small = self._downscale(pixels)
+        downscaled = time.perf_counter()
+
+        phash = difference_hash(small)
+        cached = self._lookup(phash)
+        hashed = time.perf_counter()
+        self.timings = {
+            "downscale_ms": (downscaled - start) * 1000,
+            "hash_ms": (hashed - downscaled) * 1000,
+        }
+        if cached is not None:
+            self.reused += 1
+            self.timings["encode_ms"] = 0.0
+            return PreparedImage(cached.jpeg, cached.size, phash, reused=True)
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        mode = "L" if small.shape[2] == 1 else "RGB"
+        Image.fromarray(np.squeeze(small, axis=2) if mode == "L" else small, mode).save(
+            self._buffer, format="JPEG", quality=self._jpeg_quality
+        )
+        prepared = PreparedImage(
+            self._buffer.getvalue(), (small.shape[1], small.shape[0]), phash, reused=False
+        )
+        self.timings["encode_ms"] = (time.perf_counter() - hashed) * 1000
+
+        self._cache[phash] = prepared
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return prepared
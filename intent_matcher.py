@@ -0,0 +1,91 @@
+import json
+import os
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_INTENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class IntentMatcher:
+    """Multi-phrase intent matcher over whole words.
+
+    Every phrase of every intent is compiled into one Aho-Corasick automaton whose
+    alphabet is words rather than characters, so matches always fall on word boundaries
+    ("cut" never matches "execute") and scanning costs one tokenizer pass plus one
+    transition per word, independent of how many phrases are configured.
+    """
+
+    def __init__(self, intents: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+        for intent, phrases in intents.items():
+            for phrase in phrases:
+                self._add(intent, phrase)
+        self._build_failure_links()
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentMatcher":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _add(self, intent: str, phrase: str):
+        words = tokenize(phrase)
+        if not words:
+            return
+        state = 0
+        for word in words:
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][word] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((intent, " ".join(words)))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(word, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def _scan(self, text: str):
+        state = 0
+        for word in tokenize(text):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            if self._out[state]:
+                yield from self._out[state]
+
+    def match(self, text: str) -> Optional[str]:
+        """The intent of the first phrase found in ``text``, or None."""
+        for intent, _ in self._scan(text):
+            return intent
+        return None
+
+    def matches(self, text: str) -> List[Tuple[str, str]]:
+        """Every (intent, phrase) found in ``text``, in order of where the phrase ends."""
+        return list(self._scan(text))
+
+
+@lru_cache(maxsize=None)
+def load_intent_matcher(path: Optional[str] = None) -> IntentMatcher:
+    """The process-wide matcher for ``path`` (``INTENTS_FILE`` or the bundled intents.json)."""
+    return IntentMatcher.from_file(path or os.getenv("INTENTS_FILE", DEFAULT_INTENTS_FILE))
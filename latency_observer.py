@@ -0,0 +1,252 @@
+from array import array
+from typing import Any, Dict, Optional
+
+from pipecat.audio.utils import is_silence
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    MetricsFrame,
+    SpeechOutputAudioRawFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserImageRawFrame,
+    UserStoppedSpeakingFrame,
+    VADUserStoppedSpeakingFrame,
+)
+from pipecat.metrics.metrics import ProcessingMetricsData, SmartTurnMetricsData, TTFBMetricsData
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.processors.frame_processor import FrameProcessor
+
+# 16 linear sub-buckets per power of two: every recorded value is within 6.25% of its bucket.
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Values are recorded in microseconds; anything above ~134 s lands in the last bucket.
+MAX_VALUE_BITS = 27
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Stage -> what is measured. Unless noted, times are from the VAD stop of the turn.
+STAGES = {
+    "smart_turn": "VAD stop to the end-of-turn decision",
+    "smart_turn_inference": "smart-turn model inference",
+    "end_of_turn_model": "VAD stop to the end-of-turn decision, for turns the model ended",
+    "end_of_turn_timeout": "VAD stop to the end-of-turn decision, for turns the adaptive timeout ended",
+    "end_of_turn_max_timeout": "VAD stop to the end-of-turn decision, for turns the stop_secs backstop ended",
+    "stt_final": "VAD stop to the final Cartesia transcription",
+    "llm_ttfb": "OpenAI time to first token",
+    "llm_completion": "OpenAI full completion",
+    "tool_call": "n8n medical_assistant call",
+    "tts_first_byte": "Cartesia TTS time to first audio",
+    "avatar_first_frame": "first TTS audio to the first lip-synced HeyGen frame",
+    "transport_output": "first HeyGen speech (or TTS audio) to the bot speaking",
+    "turn": "VAD stop to the bot speaking",
+    "vision_turn": "requested camera image received to the bot speaking about it",
+}
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_lower_bound(index: int) -> int:
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of durations with fixed, preallocated buckets.
+
+    Recording is a couple of integer operations and one array increment, so it can run on
+    every turn without allocating.
+    """
+
+    def __init__(self):
+        self._counts = array("Q", bytes(8 * (_bucket_index((1 << MAX_VALUE_BITS) - 1) + 1)))
+        self._last = len(self._counts) - 1
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    def record(self, value_us: int):
+        if value_us < 0:
+            value_us = 0
+        index = _bucket_index(value_us)
+        self._counts[index if index < self._last else self._last] += 1
+        if not self.count or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+        self.count += 1
+        self.total_us += value_us
+
+    def percentile(self, p: float) -> int:
+        """Lower bound of the bucket holding the ``p``-th percentile, in microseconds."""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for index, n in enumerate(self._counts):
+            seen += n
+            if seen >= rank:
+                return min(max(_bucket_lower_bound(index), self.min_us), self.max_us)
+        return self.max_us
+
+    def reset(self):
+        for index in range(len(self._counts)):
+            self._counts[index] = 0
+        self.count = self.total_us = self.min_us = self.max_us = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "count": self.count,
+            "mean_ms": self.total_us / self.count / 1000 if self.count else 0.0,
+            "min_ms": self.min_us / 1000,
+            "max_ms": self.max_us / 1000,
+        }
+        for p in PERCENTILES:
+            snapshot[f"p{p}_ms"] = self.percentile(p) / 1000
+        # Non-empty buckets as [lower bound ms, count], enough to merge histograms elsewhere.
+        snapshot["buckets"] = [
+            [_bucket_lower_bound(index) / 1000, n] for index, n in enumerate(self._counts) if n
+        ]
+        return snapshot
+
+
+class LatencyHistograms:
+    """One histogram per pipeline stage, shared by every session in the worker."""
+
+    def __init__(self):
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record(self, stage: str, value_us: int):
+        self.stages[stage].record(value_us)
+
+    def reset(self):
+        for histogram in self.stages.values():
+            histogram.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            stage: dict(histogram.snapshot(), description=STAGES[stage])
+            for stage, histogram in self.stages.items()
+        }
+
+
+latency_histograms = LatencyHistograms()
+
+
+class TurnLatencyObserver(BaseObserver):
+    """Breaks every user turn down into per-stage latencies.
+
+    The turn starts at the VAD stop (``VADUserStoppedSpeakingFrame``) and ends when the
+    output transport reports the bot speaking. In between it timestamps the end-of-turn
+    decision, the final transcription, the first TTS audio and the first avatar speech using
+    the pipeline clock, and takes OpenAI and Cartesia TTFB / processing times and smart-turn
+    inference times from the services' own ``MetricsFrame``s (``enable_metrics=True``).
+    Each frame is only looked at once, when the processor that produced it pushes it. With an
+    ``AdaptiveTurnAnalyzer`` the end-of-turn time is also broken down by what ended the turn.
+
+    HeyGen streams idle video all the time, so its first *speaking* frame is taken to be the
+    first non-silent audio it sends back, which arrives together with the lip-synced video.
+    """
+
+    def __init__(self, *, histograms: LatencyHistograms = latency_histograms,
+                 input: FrameProcessor, stt: FrameProcessor, llm: FrameProcessor,
+                 tts: FrameProcessor, avatar: Optional[FrameProcessor] = None,
+                 output: FrameProcessor, **kwargs):
+        super().__init__(**kwargs)
+        self._histograms = histograms
+        self._input = input
+        self._stt = stt
+        self._llm = llm
+        self._tts = tts
+        self._avatar = avatar
+        self._output = output
+        self._turn_start = 0
+        self._decided = False
+        self._transcribed = False
+        self._first_audio = 0
+        self._first_video = 0
+        self._tool_calls: Dict[str, int] = {}
+        self._image_at = 0
+        self.turns = 0
+
+    def _record(self, stage: str, start: int, end: int):
+        self._histograms.record(stage, (end - start) // 1000)
+
+    def _record_metrics(self, frame: MetricsFrame, source: FrameProcessor):
+        for data in frame.data:
+            if data.processor != source.name and source is not self._input:
+                continue
+            if isinstance(data, TTFBMetricsData) and data.value:
+                if source is self._llm:
+                    self._histograms.record("llm_ttfb", int(data.value * 1_000_000))
+                elif source is self._tts:
+                    self._histograms.record("tts_first_byte", int(data.value * 1_000_000))
+            elif isinstance(data, ProcessingMetricsData) and source is self._llm:
+                self._histograms.record("llm_completion", int(data.value * 1_000_000))
+            elif isinstance(data, SmartTurnMetricsData) and source is self._input:
+                self._histograms.record("smart_turn_inference", int(data.inference_time_ms * 1000))
+
+    async def on_push_frame(self, data: FramePushed):
+        frame = data.frame
+        source = data.source
+        now = data.timestamp
+
+        if isinstance(frame, MetricsFrame):
+            if source in (self._input, self._llm, self._tts):
+                self._record_metrics(frame, source)
+            return
+
+        if source is self._input:
+            if isinstance(frame, UserImageRawFrame) and frame.request and not self._image_at:
+                self._image_at = now
+            elif isinstance(frame, VADUserStoppedSpeakingFrame):
+                self._turn_start = now
+                self._decided = self._transcribed = False
+                self._first_audio = self._first_video = 0
+            elif isinstance(frame, UserStoppedSpeakingFrame) and self._turn_start and not self._decided:
+                self._decided = True
+                self._record("smart_turn", self._turn_start, now)
+                # Set by an adaptive turn analyzer: how this turn was ended
+                analyzer = getattr(self._input, "turn_analyzer", None)
+                decision = getattr(analyzer, "last_decision", None)
+                if f"end_of_turn_{decision}" in STAGES:
+                    self._record(f"end_of_turn_{decision}", self._turn_start, now)
+        elif source is self._stt:
+            if isinstance(frame, TranscriptionFrame) and self._turn_start and not self._transcribed:
+                self._transcribed = True
+                self._record("stt_final", self._turn_start, now)
+        elif source is self._llm:
+            if isinstance(frame, FunctionCallInProgressFrame):
+                self._tool_calls[frame.tool_call_id] = now
+        elif source is self._tts:
+            if isinstance(frame, TTSAudioRawFrame) and self._turn_start and not self._first_audio:
+                self._first_audio = now
+        elif source is self._avatar:
+            if (isinstance(frame, SpeechOutputAudioRawFrame) and self._first_audio
+                    and not self._first_video and not is_silence(frame.audio)):
+                self._first_video = now
+                self._record("avatar_first_frame", self._first_audio, now)
+        elif source is self._output:
+            if isinstance(frame, BotStartedSpeakingFrame) and self._turn_start:
+                self._record("transport_output", self._first_video or self._first_audio or now, now)
+                self._record("turn", self._turn_start, now)
+                self._turn_start = 0
+                self.turns += 1
+            if isinstance(frame, BotStartedSpeakingFrame) and self._image_at:
+                self._record("vision_turn", self._image_at, now)
+                self._image_at = 0
+
+        # Tool results are pushed by the LLM service both ways; the first push closes the call.
+        if isinstance(frame, FunctionCallResultFrame):
+            started = self._tool_calls.pop(frame.tool_call_id, 0)
+            if started:
+                self._record("tool_call", started, now)
@@ -0,0 +1,307 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from loguru import logger
+from pipecat.processors.frame_processor import FrameProcessor
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    # co_qualname is new in Python 3.11
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{frame.f_globals.get('__name__', os.path.basename(code.co_filename))}.{name}"
+
+
+def _processor_of(frame) -> Optional[FrameProcessor]:
+    """The innermost ``FrameProcessor.process_frame`` running in ``frame``'s stack."""
+    while frame is not None:
+        if frame.f_code.co_name == "process_frame":
+            processor = frame.f_locals.get("self")
+            if isinstance(processor, FrameProcessor) and not processor.processors:
+                return processor
+        frame = frame.f_back
+    return None
+
+
+def _folded(frame) -> List[str]:
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return labels[::-1]
+
+
+class _Timing:
+    __slots__ = ("calls", "busy", "max_step", "slow_steps")
+
+    def __init__(self):
+        self.calls = 0
+        self.busy = 0.0
+        self.max_step = 0.0
+        self.slow_steps = 0
+
+    def add(self, busy: float, max_step: float, slow: int):
+        self.calls += 1
+        self.busy += busy
+        self.max_step = max(self.max_step, max_step)
+        self.slow_steps += slow
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "busy_ms": round(self.busy * 1000, 1),
+            "mean_us": round(self.busy / self.calls * 1e6, 1) if self.calls else 0.0,
+            "max_step_ms": round(self.max_step * 1000, 2),
+            "slow_steps": self.slow_steps,
+        }
+
+
+class _TimedCall:
+    """Awaitable running a ``process_frame`` coroutine, timing each step it holds the loop."""
+
+    __slots__ = ("_coroutine", "_record")
+
+    def __init__(self, coroutine, record):
+        self._coroutine = coroutine
+        self._record = record
+
+    def __await__(self):
+        steps = self._coroutine.__await__()
+        busy = max_step = 0.0
+        slow = 0
+        send, value = steps.send, None
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    yielded = send(value)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    step = time.perf_counter() - start
+                    busy += step
+                    if step > max_step:
+                        max_step = step
+                    if step >= ProcessorTimings.slow_step_secs:
+                        slow += 1
+                try:
+                    send, value = steps.send, (yield yielded)
+                except BaseException as e:  # CancelledError included: handed to the coroutine
+                    send, value = steps.throw, e
+        finally:
+            self._record(busy, max_step, slow)
+
+
+class ProcessorTimings:
+    """How long each frame processor holds the event loop in ``process_frame``.
+
+    Every session's pipeline is instrumented by wrapping the ``process_frame`` of its
+    processors. Only the time a call actually runs on the loop is counted, not the time it
+    spends awaiting (an LLM stream, a queue), so a busy processor stands out from a slow
+    provider. Timings are kept per processor class, both for the worker and per session;
+    ``max_step_ms`` is the longest the processor held the loop in one go, which is what
+    delays every other session's audio. A processor that runs the next one inline (direct
+    mode) is also charged for that one's time.
+    """
+
+    slow_step_secs = 0.02
+
+    def __init__(self, *, enabled: bool = True, max_finished_sessions: int = 20):
+        self.enabled = enabled
+        self._worker: Dict[str, _Timing] = defaultdict(_Timing)
+        self._sessions: Dict[str, Dict[str, _Timing]] = {}
+        self._finished: Deque[tuple] = deque(maxlen=max_finished_sessions)
+        self._session_of: Dict[int, str] = {}
+
+    def _leaves(self, processors: Iterable[FrameProcessor]):
+        for processor in processors:
+            if processor.processors:
+                yield from self._leaves(processor.processors)
+            else:
+                yield processor
+
+    def instrument(self, processors: Iterable[FrameProcessor], session_id: str):
+        if not self.enabled:
+            return
+        session = self._sessions.setdefault(session_id, defaultdict(_Timing))
+        for processor in self._leaves(processors):
+            if id(processor) in self._session_of:
+                continue
+            name = type(processor).__name__
+            worker_timing, session_timing = self._worker[name], session[name]
+
+            def record(busy, max_step, slow, worker_timing=worker_timing, session_timing=session_timing):
+                worker_timing.add(busy, max_step, slow)
+                session_timing.add(busy, max_step, slow)
+
+            # process_frame is looked up on the instance for every frame.
+            original = processor.process_frame
+            processor.process_frame = (
+                lambda frame, direction, original=original, record=record:
+                _TimedCall(original(frame, direction), record)
+            )
+            self._session_of[id(processor)] = session_id
+
+    def session_of(self, processor: FrameProcessor) -> Optional[str]:
+        return self._session_of.get(id(processor))
+
+    def end_session(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._finished.append((session_id, session))
+        self._session_of = {key: sid for key, sid in self._session_of.items() if sid != session_id}
+
+    @staticmethod
+    def _by_busy(timings: Dict[str, _Timing]) -> Dict[str, Any]:
+        ranked = sorted(timings.items(), key=lambda item: -item[1].busy)
+        return {name: timing.snapshot() for name, timing in ranked}
+
+    def summary(self, session_id: str, top: int = 5) -> Dict[str, tuple]:
+        """The ``top`` processors of a live session by loop time: (busy ms, max step ms)."""
+        ranked = sorted(self._sessions.get(session_id, {}).items(), key=lambda item: -item[1].busy)
+        return {name: (round(t.busy * 1000), round(t.max_step * 1000, 1)) for name, t in ranked[:top]}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "processors": self._by_busy(self._worker),
+            "sessions": {sid: self._by_busy(t) for sid, t in self._sessions.items()},
+            "finished_sessions": {sid: self._by_busy(t) for sid, t in self._finished},
+        }
+
+
+class LoopMonitor:
+    """Event-loop stall detector and on-demand sampling profiler for one worker.
+
+    A callback on the loop beats every ``interval_secs``. A watchdog thread checks the beat;
+    when the loop has not beaten for ``stall_ms``, it takes the loop thread's stack right
+    then, while the stall is still going on. Once the loop beats again the stall is recorded
+    with its duration, its stack and the frame processor (and session) it happened in.
+
+    ``profile()`` samples the loop thread's stack every ``interval_ms`` for a while and
+    returns collapsed stacks (one ``frame;frame;... count`` line per stack), which
+    flamegraph.pl and speedscope read as is. Stacks inside a processor's ``process_frame``
+    are rooted at ``processor:<class>``.
+    """
+
+    def __init__(self, *, timings: Optional[ProcessorTimings] = None, interval_secs: float = 0.02,
+                 stall_ms: float = 100.0, max_stalls: int = 50):
+        self._timings = timings
+        self._interval = interval_secs
+        self._stall = stall_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._beat = 0.0
+        # (beat it was taken after, stack, processor, session) of the stall going on
+        self._capture: Optional[tuple] = None
+        self._profiling = False
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self.stall_count = 0
+        self.stall_ms_total = 0.0
+        self.stall_ms_max = 0.0
+        self._by_processor: Dict[str, Counter] = defaultdict(Counter)
+
+    def start(self):
+        """Start watching the running loop; a no-op when already watching it."""
+        if self._watchdog is not None and self._watchdog.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat = time.perf_counter()
+        self._loop.call_soon(self._heartbeat)
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _attribute(self, frame):
+        processor = _processor_of(frame)
+        if processor is None:
+            return None, None
+        session = self._timings.session_of(processor) if self._timings else None
+        return type(processor).__name__, session
+
+    def _heartbeat(self):
+        if self._stop.is_set():
+            return
+        now = time.perf_counter()
+        gap = now - self._beat - self._interval
+        capture, self._capture = self._capture, None
+        if gap >= self._stall:
+            self._record_stall(gap, capture if capture and capture[0] == self._beat else None)
+        self._beat = now
+        self._loop.call_later(self._interval, self._heartbeat)
+
+    def _record_stall(self, gap: float, capture: Optional[tuple]):
+        _, stack, processor, session = capture or (None, None, None, None)
+        ms = gap * 1000
+        self.stall_count += 1
+        self.stall_ms_total += ms
+        self.stall_ms_max = max(self.stall_ms_max, ms)
+        counts = self._by_processor[processor or "unattributed"]
+        counts["stalls"] += 1
+        counts["stall_ms"] += round(ms)
+        self.stalls.append({
+            "at": time.time(),
+            "duration_ms": round(ms, 1),
+            "processor": processor,
+            "session": session,
+            "stack": stack[-12:] if stack else None,
+        })
+        where = stack[-1] if stack else "unknown"
+        logger.warning(f"Event loop stalled for {ms:.0f} ms in {processor or 'no processor'} ({where})")
+
+    def _watch(self):
+        # The stack is taken half-way through the threshold and kept only if the gap becomes a stall.
+        while not self._stop.wait(self._stall / 4):
+            beat = self._beat
+            if self._capture is None and time.perf_counter() - beat - self._interval >= self._stall / 2:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None:
+                    processor, session = self._attribute(frame)
+                    self._capture = (beat, _folded(frame), processor, session)
+
+    def _sample(self, seconds: float, interval_secs: float) -> Counter:
+        stacks: Counter = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                processor, _ = self._attribute(frame)
+                labels = _folded(frame)
+                if processor:
+                    labels.insert(0, f"processor:{processor}")
+                stacks[";".join(labels)] += 1
+            time.sleep(interval_secs)
+        return stacks
+
+    async def profile(self, seconds: float = 10.0, interval_ms: float = 5.0) -> str:
+        """Collapsed stacks of the event loop thread, sampled for ``seconds``."""
+        if self._profiling:
+            raise RuntimeError("A profile is already being taken")
+        self.start()
+        self._profiling = True
+        try:
+            stacks = await asyncio.to_thread(self._sample, seconds, interval_ms / 1000)
+        finally:
+            self._profiling = False
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stall_ms_threshold": round(self._stall * 1000),
+            "stalls": self.stall_count,
+            "stall_ms_total": round(self.stall_ms_total),
+            "stall_ms_max": round(self.stall_ms_max),
+            "by_processor": {name: dict(counts) for name, counts in self._by_processor.items()},
+            "recent": list(self.stalls),
+        }
@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import threading
+import time
+from importlib import resources
+from typing import Dict, Optional
+
+import numpy as np
+from loguru import logger
+from pipecat.audio.turn.smart_turn.base_smart_turn import BaseSmartTurn, SmartTurnParams
+from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+SILERO_MODEL = ("pipecat.audio.vad.data", "silero_vad.onnx")
+SMART_TURN_MODEL = ("pipecat.audio.turn.smart_turn.data", "smart-turn-v3.0.onnx")
+
+
+def _bundled_model_path(package: str, name: str) -> str:
+    return str(resources.files(package).joinpath(name))
+
+
+class _SileroStream(SileroOnnxModel):
+    """Per-session Silero state (LSTM state and context) on top of a shared ONNX session."""
+
+    def __init__(self, session):
+        self.session = session
+        self.reset_states()
+        self.sample_rates = [8000, 16000]
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+    """Silero VAD analyzer that borrows its ONNX session from the model registry."""
+
+    def __init__(self, *, session, sample_rate: Optional[int] = None,
+                 params: Optional[VADParams] = None):
+        VADAnalyzer.__init__(self, sample_rate=sample_rate, params=params)
+        self._model = _SileroStream(session)
+        self._last_reset_time = 0
+
+
+@functools.lru_cache(maxsize=None)
+def shared_smart_turn_class():
+    """``SharedSmartTurnAnalyzerV3``, defined on first use.
+
+    The local smart-turn module imports ``transformers`` (about a second), which has no place
+    on the import path of bot.py; the model warm-up pays for it instead.
+    """
+    from pipecat.audio.turn.smart_turn.local_smart_turn_v3 import LocalSmartTurnAnalyzerV3
+
+    class SharedSmartTurnAnalyzerV3(LocalSmartTurnAnalyzerV3):
+        """Smart-turn v3 analyzer that borrows its ONNX session and feature extractor."""
+
+        def __init__(self, *, session, feature_extractor, **kwargs):
+            BaseSmartTurn.__init__(self, **kwargs)
+            self._feature_extractor = feature_extractor
+            self._session = session
+
+    return SharedSmartTurnAnalyzerV3
+
+
+class ModelRegistry:
+    """Loads the VAD and smart-turn models once per process and hands out light per-session analyzers.
+
+    ONNX inference sessions are read-only after creation, so every session shares the
+    same weights; only the streaming state (Silero LSTM state, smart-turn audio buffer)
+    lives in the per-session analyzer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._silero_session = None
+        self._smart_turn_session = None
+        self._feature_extractor = None
+        self._load_times: Dict[str, float] = {}
+
+    def _load_silero(self):
+        import onnxruntime as ort
+
+        start = time.perf_counter()
+        opts = ort.SessionOptions()
+        opts.inter_op_num_threads = 1
+        opts.intra_op_num_threads = 1
+        self._silero_session = ort.InferenceSession(
+            _bundled_model_path(*SILERO_MODEL),
+            providers=["CPUExecutionProvider"],
+            sess_options=opts,
+        )
+        self._load_times["silero_vad"] = time.perf_counter() - start
+        logger.info(f"Loaded Silero VAD in {self._load_times['silero_vad'] * 1000:.0f} ms")
+
+    def _load_smart_turn(self):
+        import onnxruntime as ort
+        from transformers import WhisperFeatureExtractor
+
+        start = time.perf_counter()
+        so = ort.SessionOptions()
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.inter_op_num_threads = 1
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._feature_extractor = WhisperFeatureExtractor(chunk_length=8)
+        self._smart_turn_session = ort.InferenceSession(
+            _bundled_model_path(*SMART_TURN_MODEL), sess_options=so
+        )
+        self._load_times["smart_turn_v3"] = time.perf_counter() - start
+        logger.info(
+            f"Loaded Smart Turn v3 in {self._load_times['smart_turn_v3'] * 1000:.0f} ms"
+        )
+
+    def load(self):
+        """Load any model that is not loaded yet. Safe to call from several threads."""
+        with self._lock:
+            if self._silero_session is None:
+                self._load_silero()
+            if self._smart_turn_session is None:
+                self._load_smart_turn()
+
+    async def aload(self):
+        """``load()`` on a worker thread, for the event loop.
+
+        A session that starts while the models are loading (or warming up) waits here
+        without holding up the loop, and the other live sessions, for the whole load.
+        """
+        await asyncio.to_thread(self.load)
+
+    def warm_up(self):
+        """Load both models and run one dummy inference each so the first session is hot."""
+        self.load()
+        start = time.perf_counter()
+        vad = self.vad_analyzer()
+        vad.set_sample_rate(16000)
+        vad.voice_confidence(np.zeros(vad.num_frames_required(), dtype=np.int16).tobytes())
+        turn = self.turn_analyzer()
+        turn._session.run(
+            None, {"input_features": np.zeros((1, 80, 800), dtype=np.float32)}
+        )
+        self._load_times["warm_up"] = time.perf_counter() - start
+        logger.info(f"Model warm-up finished: {self.load_report()}")
+
+    def load_report(self) -> Dict[str, float]:
+        """Seconds spent loading each model and running the warm-up pass."""
+        return dict(self._load_times)
+
+    def smart_turn(self):
+        """The shared smart-turn ONNX session and Whisper feature extractor."""
+        self.load()
+        return self._smart_turn_session, self._feature_extractor
+
+    def vad_analyzer(self, *, sample_rate: Optional[int] = None,
+                     params: Optional[VADParams] = None) -> SharedSileroVADAnalyzer:
+        self.load()
+        return SharedSileroVADAnalyzer(
+            session=self._silero_session, sample_rate=sample_rate, params=params
+        )
+
+    def turn_analyzer(self, *, sample_rate: Optional[int] = None,
+                      params: Optional[SmartTurnParams] = None) -> BaseSmartTurn:
+        self.load()
+        return shared_smart_turn_class()(
+            session=self._smart_turn_session,
+            feature_extractor=self._feature_extractor,
+            sample_rate=sample_rate,
+            params=params,
+        )
+
+
+model_registry = ModelRegistry()
@@ -1,14 +1,35 @@
 import os
 import asyncio
 import httpx
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+from session_router import CapacityExhausted, NoWorkerAvailable, SessionRouter
+
 load_dotenv()
 
-app = FastAPI()
+# Pool of bot.py workers: BOT_WORKERS=N spawns N of them, otherwise BOT_WORKER_URLS are used
+router = SessionRouter.from_env()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled, keep-alive client for every call to the bot workers
+    app.state.upstream = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    await router.start(app.state.upstream)
+    yield
+    await router.stop()
+    await app.state.upstream.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware to allow frontend to call backend
 app.add_middleware(
@@ -37,6 +58,8 @@ class OfferData(BaseModel):
 class WebRTCOffer(BaseModel):
     sdp: str
     type: str = "offer"
+    pc_id: str | None = None
+    restart_pc: bool | None = None
 
 @app.get("/")
 async def root():
@@ -44,34 +67,40 @@ async def root():
 
 @app.post("/api/offer")
 async def api_offer(offer: WebRTCOffer):
-    """Handle WebRTC offer from PipecatService - forward to bot.py."""
+    """Handle WebRTC offer from PipecatService - route it to a bot.py worker."""
     try:
         print(f"📡 Received WebRTC offer: {offer.sdp[:100]}...")
-        
-        # Forward the offer to your bot.py running on port 7860
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    "http://localhost:7860/api/offer",
-                    json={"sdp": offer.sdp, "type": offer.type},
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    bot_response = response.json()
-                    print(f"✅ Bot response: {bot_response}")
-                    return bot_response
-                else:
-                    print(f"⚠️ Bot returned status {response.status_code}")
-                    return {"error": f"Bot returned status {response.status_code}"}
-                    
-            except httpx.ConnectError as e:
-                print(f"⚠️ Bot.py not running on port 7860: {e}")
-                return {"error": "Bot.py not running"}
-            except Exception as e:
-                print(f"⚠️ Error connecting to bot: {e}")
-                return {"error": str(e)}
-        
+
+        # New sessions go to the least-loaded worker, renegotiations to the one owning pc_id
+        try:
+            response = await router.offer(offer.model_dump(exclude_none=True))
+
+            if response.status_code == 200:
+                bot_response = response.json()
+                print(f"✅ Bot response: {bot_response}")
+                return bot_response
+            else:
+                print(f"⚠️ Bot returned status {response.status_code}")
+                return {"error": f"Bot returned status {response.status_code}"}
+
+        except CapacityExhausted as e:
+            # Turned away so the calls in progress keep their latency; the client may retry
+            print(f"⚠️ {e}")
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": "15"},
+                content={"error": "All doctors are busy, please try again shortly", "status": "busy"},
+            )
+        except NoWorkerAvailable as e:
+            print(f"⚠️ {e}")
+            return {"error": "Bot.py not running"}
+        except httpx.ConnectError as e:
+            print(f"⚠️ Bot worker not reachable: {e}")
+            return {"error": "Bot.py not running"}
+        except Exception as e:
+            print(f"⚠️ Error connecting to bot: {e}")
+            return {"error": str(e)}
+
     except Exception as e:
         print(f"❌ Error processing offer: {e}")
         return {
@@ -115,62 +144,36 @@ async def start_session():
         
         print(f"🚀 Starting HeyGen session with API key: {api_key[:10]}...")
         
-        # Check if bot.py is running by testing the /api/offer endpoint
-        async with httpx.AsyncClient() as client:
-            try:
-                print("🔍 Testing bot.py connection...")
-                response = await client.post(
-                    "http://localhost:7860/api/offer",
-                    json={"sdp": "test", "type": "offer"},
-                    timeout=5.0
-                )
-                
-                print(f"📊 Bot response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    bot_data = response.json()
-                    print(f"✅ Bot.py is running and responding: {bot_data}")
-                    return {
-                        "status": "success",
-                        "session_id": "bot-session-123",
-                        "stream_url": None,
-                        "sdp": None,
-                        "type": "offer",
-                        "message": "Bot.py is running - HeyGen streaming will be handled through WebRTC",
-                        "bot_running": True,
-                        "api_key_set": True
-                    }
-                else:
-                    print(f"❌ Bot returned status {response.status_code}")
-                    return {
-                        "status": "error",
-                        "error": f"Bot.py returned status {response.status_code}",
-                        "bot_running": False
-                    }
-                    
-            except httpx.ConnectError as e:
-                print(f"⚠️ Bot.py not running on port 7860: {e}")
-                return {
-                    "status": "error",
-                    "error": "Bot.py is not running. Please start bot.py first to enable HeyGen streaming.",
-                    "message": "Start your bot.py with: python3 bot.py",
-                    "bot_running": False
-                }
-            except httpx.TimeoutException as e:
-                print(f"⚠️ Bot.py timeout: {e}")
-                return {
-                    "status": "error",
-                    "error": "Bot.py is not responding (timeout). Please check if bot.py is running.",
-                    "bot_running": False
-                }
-            except Exception as e:
-                print(f"⚠️ Error checking bot: {e}")
-                return {
-                    "status": "error",
-                    "error": f"Error connecting to bot.py: {str(e)}",
-                    "bot_running": False
-                }
-        
+        # Answered from the background health probe, without calling bot.py
+        health = router.health()
+        if health["bot_running"]:
+            print(f"✅ Bot.py is running: {health['available_workers']}/{health['workers']} workers available")
+            return {
+                "status": "success",
+                "session_id": "bot-session-123",
+                "stream_url": None,
+                "sdp": None,
+                "type": "offer",
+                "message": "Bot.py is running - HeyGen streaming will be handled through WebRTC",
+                "bot_running": True,
+                "api_key_set": True
+            }
+        elif health["error"] == "timeout":
+            print("⚠️ Bot.py timeout")
+            return {
+                "status": "error",
+                "error": "Bot.py is not responding (timeout). Please check if bot.py is running.",
+                "bot_running": False
+            }
+        else:
+            print(f"⚠️ Bot.py not running: {health['error']}")
+            return {
+                "status": "error",
+                "error": "Bot.py is not running. Please start bot.py first to enable HeyGen streaming.",
+                "message": "Start your bot.py with: python3 bot.py",
+                "bot_running": False
+            }
+
     except Exception as e:
         print(f"❌ Error creating HeyGen session: {e}")
         return {
@@ -209,27 +212,15 @@ async def doctor_stream_start(body: dict | None = None):
                 "status": "error"
             }
         
-        # Check if bot.py is running and return its stream
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    "http://localhost:7860/api/offer",
-                    json={"sdp": "test", "type": "offer"},
-                    timeout=5.0
-                )
-                
-                if response.status_code == 200:
-                    return {
-                        "url": None,
-                        "status": "ready",
-                        "message": "Connected to bot.py HeyGen stream",
-                        "bot_running": True
-                    }
-            except httpx.ConnectError as e:
-                print(f"⚠️ Bot.py not running: {e}")
-            except Exception as e:
-                print(f"⚠️ Error connecting to bot: {e}")
-        
+        # Check if bot.py is running (cached health probe) and return its stream
+        if router.health()["bot_running"]:
+            return {
+                "url": None,
+                "status": "ready",
+                "message": "Connected to bot.py HeyGen stream",
+                "bot_running": True
+            }
+
         return {
             "error": "Bot.py is not running. Please start bot.py first.",
             "status": "error",
@@ -255,6 +246,57 @@ async def test_speech(request: dict):
         print(f"❌ Error in test speech: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics/latency")
+async def latency_metrics():
+    """Per-stage turn latency histograms (VAD, smart-turn, STT, LLM, tools, TTS, avatar, output), per bot worker."""
+    async def fetch(worker):
+        try:
+            response = await app.state.upstream.get(f"{worker.url}/metrics/latency", timeout=5.0)
+            if response.status_code == 200:
+                return response.json()
+            print(f"⚠️ {worker.id} returned status {response.status_code}")
+            return {"error": f"Bot returned status {response.status_code}", "status": "error"}
+        except httpx.ConnectError as e:
+            print(f"⚠️ {worker.id} not running at {worker.url}: {e}")
+            return {"error": "Bot.py not running", "status": "error"}
+        except Exception as e:
+            print(f"⚠️ Error fetching latency metrics from {worker.id}: {e}")
+            return {"error": str(e), "status": "error"}
+
+    results = await asyncio.gather(*(fetch(w) for w in router.workers))
+    return {w.id: result for w, result in zip(router.workers, results)}
+
+@app.get("/health")
+async def health():
+    """Whether bot.py workers are up, from the background probe (no upstream call)."""
+    return router.health()
+
+@app.get("/capacity")
+async def capacity():
+    """Fleet capacity for an autoscaler: sessions, free slots, offer queue and desired worker count."""
+    return router.capacity()
+
+@app.get("/workers")
+async def workers():
+    """Bot workers (cached health, sessions, event-loop lag, draining) and which one owns each session."""
+    return router.status()
+
+@app.post("/workers/{worker_id}/drain")
+async def drain_worker(worker_id: str, restart: bool = True):
+    """Stop placing sessions on a worker; once they have ended, restart it (spawned workers only)."""
+    try:
+        return router.drain(worker_id, restart=restart)
+    except KeyError:
+        return {"error": f"Unknown worker {worker_id}", "status": "error"}
+
+@app.post("/workers/{worker_id}/undrain")
+async def undrain_worker(worker_id: str):
+    """Put a draining worker back into rotation."""
+    try:
+        return router.undrain(worker_id)
+    except KeyError:
+        return {"error": f"Unknown worker {worker_id}", "status": "error"}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=7861)  # Server on 7861, bot.py on 7860
+    uvicorn.run(app, host="0.0.0.0", port=7861)  # Server on 7861, bot.py workers on 7860 / BOT_WORKER_BASE_PORT+
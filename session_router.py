@@ -0,0 +1,526 @@
+import asyncio
+import itertools
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+
+
+class NoWorkerAvailable(Exception):
+    pass
+
+
+class CapacityExhausted(NoWorkerAvailable):
+    """Every worker is at its budget and the new session could not wait (any longer) for one."""
+
+
+class BotWorker:
+    """One bot.py process serving WebRTC sessions, as seen by the router."""
+
+    def __init__(self, worker_id: str, url: str, *, port: Optional[int] = None):
+        self.id = worker_id
+        self.url = url.rstrip("/")
+        # Only workers the router spawned itself (on ``port``) can be restarted by it.
+        self.port = port
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.healthy = False
+        self.draining = False
+        self.restarts = 0
+        self.spawned_at = 0.0
+        # Exits in a row soon after being spawned; at the router's limit it is not respawned.
+        self.fast_failures = 0
+        self.respawn_at: Optional[float] = None
+        self.failed = False
+        self.last_seen = 0.0
+        self.checked_at = 0.0
+        self.probe_ms = 0.0
+        self.last_error: Optional[str] = None
+        self.pid: Optional[int] = None
+        self.active_sessions = 0
+        self.reported_sessions: set = set()
+        # When the probe behind the last report was sent
+        self.reported_at = 0.0
+        self.loop_lag_ms = 0.0
+        self.loop_lag_max_ms = 0.0
+        # From the worker's capacity report; workers without one count as always accepting.
+        self.accepting = True
+        self.free_sessions: Optional[int] = None
+        self.max_sessions: Optional[int] = None
+        self.utilization = 0.0
+        self.at_limit: List[str] = []
+
+    @property
+    def managed(self) -> bool:
+        return self.port is not None
+
+    def status(self, owned: int) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "pid": self.pid,
+            "managed": self.managed,
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "restarts": self.restarts,
+            "fast_failures": self.fast_failures,
+            "failed": self.failed,
+            "respawn_in_secs": (
+                round(max(0.0, self.respawn_at - time.monotonic()), 1) if self.respawn_at else None
+            ),
+            "active_sessions": self.active_sessions,
+            "owned_sessions": owned,
+            "loop_lag_ms": self.loop_lag_ms,
+            "loop_lag_max_ms": self.loop_lag_max_ms,
+            "accepting": self.accepting,
+            "free_sessions": self.free_sessions,
+            "utilization": self.utilization,
+            "at_limit": self.at_limit,
+            "probe_ms": self.probe_ms,
+            "last_error": self.last_error,
+            "last_seen_secs_ago": round(time.monotonic() - self.last_seen, 1) if self.last_seen else None,
+            "checked_secs_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+
+class SessionRouter:
+    """Spreads WebRTC sessions over a pool of bot.py worker processes.
+
+    Each worker is its own Python process and event loop. A new offer (no ``pc_id``) goes
+    to the least-loaded healthy worker, judged by its active sessions plus its event-loop
+    lag expressed in sessions (``lag_ms_per_session``); renegotiations carrying a ``pc_id``
+    go back to the worker that owns it. Ownership is kept in an in-process registry which
+    the load poll prunes once a worker stops reporting the session. Draining a worker takes
+    it out of placement, waits for its sessions to end and, for spawned workers, restarts it.
+
+    The same poll is the workers' health check: it only hits the cheap ``/worker/load``
+    endpoint, and ``health()`` answers from its last result without any upstream request.
+
+    Admission control: a worker only gets new sessions while it reports room in its capacity
+    budget (sessions, CPU, loop lag, memory). When no worker has room, a new offer waits up
+    to ``queue_timeout_secs`` for one, with at most ``max_queued`` offers waiting; beyond
+    that it is rejected with ``CapacityExhausted``, so calls in progress keep their latency.
+    ``capacity()`` sums this up for an autoscaler, including a desired worker count.
+
+    With ``spawn`` > 0 the router starts that many ``bot.py`` processes on consecutive ports
+    from ``base_port``; otherwise it routes to the already running workers in ``urls``. A
+    spawned worker that exits is respawned, after a backoff doubling from
+    ``restart_backoff_secs`` when it exits within ``fast_failure_secs`` of starting. After
+    ``max_fast_failures`` such exits in a row it is left down and marked failed until it is
+    drained with a restart.
+    """
+
+    def __init__(self, *, urls: Optional[List[str]] = None, spawn: int = 0,
+                 base_port: int = 7870, poll_interval_secs: float = 1.0,
+                 lag_ms_per_session: float = 20.0, max_loop_lag_ms: float = 500.0,
+                 session_grace_secs: float = 30.0, offer_timeout_secs: float = 10.0,
+                 queue_timeout_secs: float = 10.0, max_queued: int = 10,
+                 target_utilization: float = 0.7, shutdown_timeout_secs: float = 300.0,
+                 restart_backoff_secs: float = 1.0, restart_backoff_max_secs: float = 60.0,
+                 fast_failure_secs: float = 60.0, max_fast_failures: int = 5,
+                 worker_args: Optional[List[str]] = None):
+        if spawn > 0:
+            self.workers = [
+                BotWorker(f"worker-{i}", f"http://localhost:{base_port + i}", port=base_port + i)
+                for i in range(spawn)
+            ]
+        else:
+            self.workers = [BotWorker(f"worker-{i}", url) for i, url in enumerate(urls or [])]
+        self._by_id = {w.id: w for w in self.workers}
+        self._poll_interval = poll_interval_secs
+        self._lag_ms_per_session = lag_ms_per_session
+        self._max_loop_lag_ms = max_loop_lag_ms
+        self._session_grace = session_grace_secs
+        self._offer_timeout = offer_timeout_secs
+        self._queue_timeout = queue_timeout_secs
+        self._max_queued = max_queued
+        self._target_utilization = target_utilization
+        self._shutdown_timeout = shutdown_timeout_secs
+        self._restart_backoff = restart_backoff_secs
+        self._restart_backoff_max = restart_backoff_max_secs
+        self._fast_failure = fast_failure_secs
+        self._max_fast_failures = max_fast_failures
+        self._worker_args = worker_args or ["-t", "webrtc"]
+        # pc_id -> (worker, monotonic time of placement)
+        self._sessions: Dict[str, Tuple[BotWorker, float]] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._owns_client = False
+        self._poll_task: Optional[asyncio.Task] = None
+        self._drains: Dict[str, asyncio.Task] = {}
+        self._round_robin = itertools.count()
+        self._stopping = False
+        # Offers sent to a worker but not answered yet: they hold a slot there.
+        self._placing: Dict[str, int] = {}
+        # Set (and replaced) after every poll, waking the queued offers.
+        self._capacity_changed = asyncio.Event()
+        self.queued = 0
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.rejected = 0
+        self.queue_wait_ms_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "SessionRouter":
+        return cls(
+            urls=os.getenv("BOT_WORKER_URLS", "http://localhost:7860").split(","),
+            spawn=int(os.getenv("BOT_WORKERS", "0")),
+            base_port=int(os.getenv("BOT_WORKER_BASE_PORT", "7870")),
+            lag_ms_per_session=float(os.getenv("ROUTER_LAG_MS_PER_SESSION", "20")),
+            max_loop_lag_ms=float(os.getenv("ROUTER_MAX_LOOP_LAG_MS", "500")),
+            poll_interval_secs=float(os.getenv("ROUTER_POLL_INTERVAL_SECS", "1")),
+            queue_timeout_secs=float(os.getenv("ROUTER_QUEUE_TIMEOUT_SECS", "10")),
+            max_queued=int(os.getenv("ROUTER_MAX_QUEUED", "10")),
+            target_utilization=float(os.getenv("ROUTER_TARGET_UTILIZATION", "0.7")),
+            shutdown_timeout_secs=float(os.getenv("ROUTER_SHUTDOWN_TIMEOUT_SECS", "300")),
+            restart_backoff_max_secs=float(os.getenv("ROUTER_RESTART_BACKOFF_MAX_SECS", "60")),
+            max_fast_failures=int(os.getenv("ROUTER_MAX_FAST_FAILURES", "5")),
+        )
+
+    ###################################### Lifecycle ######################################
+    async def start(self, client: Optional[httpx.AsyncClient] = None):
+        """Spawn the workers and start polling them, over ``client`` when one is shared."""
+        self._stopping = False
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(timeout=5.0)
+        for worker in self.workers:
+            if worker.managed:
+                await self._spawn(worker)
+        await self.poll()
+        self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        """Stop placing sessions and shut the spawned workers down.
+
+        A terminated worker drains itself first, so it gets up to ``shutdown_timeout_secs``
+        for its calls in progress to end before it is killed.
+        """
+        self._stopping = True
+        for worker in self.workers:
+            worker.draining = True
+        tasks = [t for t in [self._poll_task, *self._drains.values()] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(self._terminate(w, self._shutdown_timeout)
+                               for w in self.workers if w.managed))
+        if self._client and self._owns_client:
+            await self._client.aclose()
+        self._client = None
+
+    async def _spawn(self, worker: BotWorker):
+        worker.process = await asyncio.create_subprocess_exec(
+            sys.executable, BOT_SCRIPT, "--port", str(worker.port), *self._worker_args,
+            cwd=os.path.dirname(BOT_SCRIPT),
+        )
+        worker.pid = worker.process.pid
+        worker.spawned_at = time.monotonic()
+        worker.respawn_at = None
+        logger.info(f"Spawned {worker.id} (pid {worker.pid}) on port {worker.port}")
+
+    async def _terminate(self, worker: BotWorker, timeout_secs: float = 10.0):
+        process, worker.process = worker.process, None
+        worker.healthy = False
+        if not process or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout_secs)
+        except asyncio.TimeoutError:
+            logger.warning(f"{worker.id} (pid {process.pid}) did not exit, killing it")
+            process.kill()
+            await process.wait()
+
+    async def _wait_healthy(self, worker: BotWorker, timeout_secs: float = 120.0) -> bool:
+        deadline = time.monotonic() + timeout_secs
+        while time.monotonic() < deadline:
+            await self._poll_worker(worker)
+            if worker.healthy:
+                return True
+            await asyncio.sleep(self._poll_interval)
+        return False
+
+    ####################################### Load poll #####################################
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Worker load poll failed: {e}")
+
+    async def poll(self):
+        await asyncio.gather(*(self._poll_worker(w) for w in self.workers))
+        self._prune_sessions()
+        changed, self._capacity_changed = self._capacity_changed, asyncio.Event()
+        changed.set()
+
+    def _exited(self, worker: BotWorker):
+        """Schedule the respawn of a spawned worker that exited, backing off if it keeps crashing."""
+        uptime = time.monotonic() - worker.spawned_at
+        logger.error(f"{worker.id} exited with code {worker.process.returncode} after {uptime:.0f} s")
+        worker.last_error = f"exited with code {worker.process.returncode}"
+        worker.process = None
+        worker.healthy = False
+        worker.reported_sessions = set()
+        if self._stopping or worker.id in self._drains:
+            return
+        worker.fast_failures = worker.fast_failures + 1 if uptime < self._fast_failure else 0
+        if worker.fast_failures >= self._max_fast_failures:
+            worker.failed = True
+            logger.error(f"{worker.id} exited {worker.fast_failures} times in a row within "
+                         f"{self._fast_failure:.0f} s of starting; not respawning it")
+            return
+        delay = 0.0
+        if worker.fast_failures:
+            delay = min(self._restart_backoff * 2 ** (worker.fast_failures - 1), self._restart_backoff_max)
+            logger.warning(f"Respawning {worker.id} in {delay:.0f} s")
+        worker.respawn_at = time.monotonic() + delay
+
+    async def _poll_worker(self, worker: BotWorker):
+        if worker.managed and worker.process and worker.process.returncode is not None:
+            self._exited(worker)
+        if worker.managed and worker.process is None and worker.respawn_at is not None:
+            if time.monotonic() >= worker.respawn_at and not self._stopping:
+                worker.restarts += 1
+                await self._spawn(worker)
+            return
+        if worker.failed:
+            return
+        start = time.monotonic()
+        try:
+            response = await self._client.get(f"{worker.url}/worker/load", timeout=2.0)
+            response.raise_for_status()
+            load = response.json()
+        except Exception as e:
+            if worker.healthy:
+                logger.warning(f"{worker.id} stopped answering: {e}")
+            worker.healthy = False
+            worker.checked_at = time.monotonic()
+            worker.last_error = (
+                "timeout" if isinstance(e, httpx.TimeoutException)
+                else "not running" if isinstance(e, httpx.ConnectError)
+                else str(e) or type(e).__name__
+            )
+            return
+        worker.checked_at = time.monotonic()
+        worker.probe_ms = round((worker.checked_at - start) * 1000, 2)
+        worker.last_error = None
+        if not worker.healthy:
+            logger.info(f"{worker.id} is up (pid {load.get('pid')})")
+        worker.healthy = True
+        worker.last_seen = worker.checked_at
+        worker.pid = load.get("pid", worker.pid)
+        worker.active_sessions = load.get("active_sessions", 0)
+        worker.reported_sessions = set(load.get("sessions", []))
+        worker.reported_at = start
+        worker.loop_lag_ms = load.get("loop_lag_ms", 0.0)
+        worker.loop_lag_max_ms = load.get("loop_lag_max_ms", 0.0)
+        capacity = load.get("capacity") or {}
+        worker.accepting = capacity.get("accepting", True)
+        worker.free_sessions = capacity.get("free_sessions")
+        worker.max_sessions = (capacity.get("budget") or {}).get("max_sessions") or None
+        worker.utilization = capacity.get("utilization", 0.0)
+        worker.at_limit = capacity.get("at_limit", [])
+
+    def _prune_sessions(self):
+        """Forget sessions their worker no longer runs (after a grace period for new ones)."""
+        now = time.monotonic()
+        for pc_id, (worker, placed) in list(self._sessions.items()):
+            if pc_id in worker.reported_sessions:
+                continue
+            if now - placed > self._session_grace or (worker.managed and not worker.process):
+                del self._sessions[pc_id]
+
+    ####################################### Placement #####################################
+    def _owned(self, worker: BotWorker) -> int:
+        return sum(1 for owner, _ in self._sessions.values() if owner is worker)
+
+    def load(self, worker: BotWorker) -> float:
+        # Sessions placed since the last poll are not reported yet; the registry knows them.
+        sessions = max(worker.active_sessions, self._owned(worker))
+        return sessions + worker.loop_lag_ms / self._lag_ms_per_session
+
+    def _placed_since_report(self, worker: BotWorker) -> int:
+        return sum(1 for pc_id, (owner, placed) in self._sessions.items()
+                   if owner is worker and placed >= worker.reported_at
+                   and pc_id not in worker.reported_sessions)
+
+    def free(self, worker: BotWorker) -> float:
+        """Sessions the worker can still take: its last report, less those placed since."""
+        if not worker.accepting:
+            return 0
+        if worker.free_sessions is None:
+            return math.inf
+        return (worker.free_sessions - self._placed_since_report(worker)
+                - self._placing.get(worker.id, 0))
+
+    def pick(self) -> BotWorker:
+        available = [
+            w for w in self.workers
+            if w.healthy and not w.draining and w.loop_lag_ms < self._max_loop_lag_ms
+        ]
+        if not available:
+            raise NoWorkerAvailable("No bot worker available")
+        candidates = [w for w in available if self.free(w) > 0]
+        if not candidates:
+            raise CapacityExhausted("Every bot worker is at capacity")
+        # Rotate the starting point so ties don't all land on the first worker.
+        start = next(self._round_robin) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        return min(candidates, key=self.load)
+
+    def owner(self, pc_id: Optional[str]) -> Optional[BotWorker]:
+        entry = self._sessions.get(pc_id) if pc_id else None
+        return entry[0] if entry else None
+
+    async def admit(self) -> BotWorker:
+        """A worker with room for a new session, waiting in the bounded queue for one if need be."""
+        try:
+            worker = self.pick()
+            self.admitted += 1
+            return worker
+        except CapacityExhausted:
+            if self.queued >= self._max_queued:
+                self.rejected += 1
+                raise CapacityExhausted("Every bot worker is at capacity and the queue is full")
+        self.queued += 1
+        start = time.monotonic()
+        deadline = start + self._queue_timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise CapacityExhausted(
+                        f"No bot worker had capacity within {self._queue_timeout:.0f} s"
+                    )
+                try:
+                    await asyncio.wait_for(self._capacity_changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    continue
+                try:
+                    worker = self.pick()
+                except CapacityExhausted:
+                    continue
+                self.admitted += 1
+                self.admitted_after_wait += 1
+                return worker
+        finally:
+            self.queued -= 1
+            self.queue_wait_ms_max = max(self.queue_wait_ms_max, (time.monotonic() - start) * 1000)
+
+    async def offer(self, payload: Dict[str, Any]) -> httpx.Response:
+        """Forward an SDP offer to the owning (renegotiation) or least-loaded (new) worker.
+
+        Renegotiations always go through; new sessions are subject to admission control.
+        """
+        worker = self.owner(payload.get("pc_id"))
+        placing = worker is None
+        if placing:
+            worker = await self.admit()
+            self._placing[worker.id] = self._placing.get(worker.id, 0) + 1
+        try:
+            response = await self._client.post(f"{worker.url}/api/offer", json=payload,
+                                               timeout=self._offer_timeout)
+        finally:
+            if placing:
+                self._placing[worker.id] -= 1
+        if response.status_code == 200:
+            pc_id = response.json().get("pc_id")
+            if pc_id and pc_id not in self._sessions:
+                self._sessions[pc_id] = (worker, time.monotonic())
+                logger.info(f"Session {pc_id} placed on {worker.id} (load {self.load(worker):.2f})")
+        return response
+
+    ######################################### Drain #######################################
+    def drain(self, worker_id: str, *, restart: bool = True) -> Dict[str, Any]:
+        """Stop placing sessions on a worker, then restart it once they have all ended."""
+        worker = self._by_id.get(worker_id)
+        if worker is None:
+            raise KeyError(worker_id)
+        if worker_id not in self._drains:
+            worker.draining = True
+            task = asyncio.create_task(self._drain(worker, restart and worker.managed))
+            self._drains[worker_id] = task
+            task.add_done_callback(lambda _: self._drains.pop(worker_id, None))
+        return worker.status(self._owned(worker))
+
+    async def _drain(self, worker: BotWorker, restart: bool):
+        logger.info(f"Draining {worker.id}")
+        while worker.healthy and (worker.active_sessions or self._owned(worker)):
+            await asyncio.sleep(self._poll_interval)
+        if not restart:
+            logger.info(f"{worker.id} drained")
+            return
+        await self._terminate(worker)
+        # A restart asked for by hand gives a failed worker a fresh set of attempts.
+        worker.failed = False
+        worker.fast_failures = 0
+        worker.restarts += 1
+        await self._spawn(worker)
+        if await self._wait_healthy(worker):
+            worker.draining = False
+            logger.info(f"{worker.id} restarted and back in rotation")
+        else:
+            logger.error(f"{worker.id} did not come back after restart")
+
+    def undrain(self, worker_id: str) -> Dict[str, Any]:
+        worker = self._by_id[worker_id]
+        task = self._drains.pop(worker_id, None)
+        if task:
+            task.cancel()
+        worker.draining = False
+        return worker.status(self._owned(worker))
+
+    ######################################### Status ######################################
+    def health(self) -> Dict[str, Any]:
+        """Cached result of the last probe of every worker; never calls upstream."""
+        available = [w for w in self.workers if w.healthy and not w.draining]
+        errors = {w.last_error for w in self.workers if w.last_error}
+        return {
+            "bot_running": bool(available),
+            "available_workers": len(available),
+            "workers": len(self.workers),
+            # "timeout" when every failing worker timed out, else the first other error
+            "error": None if available else (
+                "timeout" if errors == {"timeout"} else next(iter(errors - {"timeout"}), None)
+            ),
+        }
+
+    def capacity(self) -> Dict[str, Any]:
+        """Fleet capacity for an autoscaler: sessions, free slots, queue and desired workers."""
+        available = [w for w in self.workers if w.healthy and not w.draining]
+        sessions = sum(w.active_sessions + self._placed_since_report(w) for w in self.workers)
+        free = [self.free(w) for w in available]
+        per_worker = max((w.max_sessions for w in self.workers if w.max_sessions), default=None)
+        desired = None
+        if per_worker:
+            demand = sessions + self.queued
+            desired = max(1, math.ceil(demand / (per_worker * self._target_utilization)))
+        return {
+            "accepting": any(f > 0 for f in free),
+            "workers": len(self.workers),
+            "available_workers": len(available),
+            "accepting_workers": sum(1 for f in free if f > 0),
+            "active_sessions": sessions,
+            "free_sessions": None if math.inf in free else sum(max(0, int(f)) for f in free),
+            "utilization": round(max((w.utilization for w in available), default=1.0), 3),
+            "queued": self.queued,
+            "max_queued": self._max_queued,
+            "admitted": self.admitted,
+            "admitted_after_wait": self.admitted_after_wait,
+            "rejected": self.rejected,
+            "queue_wait_ms_max": round(self.queue_wait_ms_max),
+            "target_utilization": self._target_utilization,
+            "desired_workers": desired,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workers": {w.id: w.status(self._owned(w)) for w in self.workers},
+            "sessions": {pc_id: worker.id for pc_id, (worker, _) in self._sessions.items()},
+        }
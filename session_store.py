@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from pipecat.frames.frames import (
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    InterruptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    MetricsFrame,
+    TranscriptionFrame,
+    TTSSpeakFrame,
+)
+from pipecat.metrics.metrics import LLMUsageMetricsData, ProcessingMetricsData, TTFBMetricsData
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# Event kinds shed first when the writer falls behind; everything else is waited for.
+SHEDDABLE_KINDS = {"metrics"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    session_id TEXT,
+    started_at REAL,
+    ended_at REAL,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    text TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_conversation ON events (conversation_id, ts);
+"""
+
+Event = Tuple[str, float, str, Optional[str], Optional[str]]
+
+
+class SessionStore:
+    """Write-behind store of conversation transcripts and events, shared by a worker's sessions.
+
+    ``record()`` only appends to an in-memory buffer. A background task writes the buffer to
+    SQLite in batches of up to ``batch_size`` every ``flush_interval_secs`` (sooner when a batch
+    is full), on a single writer thread so the event loop never waits on the disk. If the
+    disk falls behind and ``high_water`` events are pending, sheddable events (metrics) are
+    dropped and counted; at ``max_pending``, ``put()`` waits for the writer to catch up.
+    Transcripts and tool calls are never dropped: when a write fails (e.g. SQLITE_BUSY, a
+    full disk) they go back to the head of the buffer and are retried with exponential
+    backoff from ``retry_secs`` up to ``max_retry_secs``. Only ``aclose()`` gives up, after
+    ``close_attempts`` tries, and logs what it could not write.
+    """
+
+    def __init__(self, path: str, *, batch_size: int = 200, flush_interval_secs: float = 1.0,
+                 high_water: int = 2000, max_pending: int = 10000, retry_secs: float = 0.5,
+                 max_retry_secs: float = 30.0, close_attempts: int = 5):
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval_secs
+        self._high_water = high_water
+        self._max_pending = max_pending
+        self._retry_secs = retry_secs
+        self._max_retry_secs = max_retry_secs
+        self._close_attempts = close_attempts
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: List[Event] = []
+        self._conversations: List[Tuple[str, tuple]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Event] = None
+        self.events = 0
+        self.dropped = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.retries = 0
+        self.pending_max = 0
+        self.write_ms_max = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self._path)
+            # Several bot workers may share the file.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _write(self, conversations: List[Tuple[str, tuple]], events: List[Event]):
+        db = self._connect()
+        with db:
+            for statement, params in conversations:
+                db.execute(statement, params)
+            db.executemany(
+                "INSERT INTO events (conversation_id, ts, kind, text, data) VALUES (?, ?, ?, ?, ?)",
+                events,
+            )
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._room = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._writer())
+
+    async def _writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self, *, attempts: Optional[int] = None) -> bool:
+        """Write the buffer in batches, retrying failed ones; ``False`` after ``attempts`` failures."""
+        failures = 0
+        while self._pending or self._conversations:
+            events, self._pending = self._pending[:self._batch_size], self._pending[self._batch_size:]
+            conversations, self._conversations = self._conversations, []
+            start = time.perf_counter()
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._write, conversations, events
+                )
+            except Exception as e:
+                self.write_errors += 1
+                failures += 1
+                # The batch is rolled back: put it back, less what may be shed.
+                kept = [event for event in events if event[2] not in SHEDDABLE_KINDS]
+                self.dropped += len(events) - len(kept)
+                self._pending[:0] = kept
+                self._conversations[:0] = conversations
+                if attempts is not None and failures >= attempts:
+                    logger.error(f"Unable to write {len(self._pending)} session events: {e}")
+                    return False
+                delay = min(self._max_retry_secs, self._retry_secs * 2 ** (failures - 1))
+                logger.warning(f"Unable to write {len(events)} session events, retrying in {delay:.1f} s: {e}")
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            self.batches += 1
+            self.write_ms_max = max(self.write_ms_max, (time.perf_counter() - start) * 1000)
+            if len(self._pending) < self._max_pending:
+                self._room.set()
+        return True
+
+    def start_conversation(self, conversation_id: str, *, session_id: Optional[str] = None,
+                           metadata: Optional[Dict[str, Any]] = None):
+        self._start()
+        self._conversations.append((
+            "INSERT OR REPLACE INTO conversations (conversation_id, session_id, started_at, metadata) "
+            "VALUES (?, ?, ?, ?)",
+            (conversation_id, session_id, time.time(), json.dumps(metadata or {}, default=str)),
+        ))
+        self._wake.set()
+
+    def end_conversation(self, conversation_id: str):
+        self._start()
+        self._conversations.append((
+            "UPDATE conversations SET ended_at = ? WHERE conversation_id = ?",
+            (time.time(), conversation_id),
+        ))
+        self._wake.set()
+
+    def record(self, conversation_id: str, kind: str, *, text: Optional[str] = None,
+               data: Optional[Dict[str, Any]] = None) -> bool:
+        """Buffer one event; ``False`` when it was shed because the writer is behind."""
+        self._start()
+        if kind in SHEDDABLE_KINDS and len(self._pending) >= self._high_water:
+            self.dropped += 1
+            return False
+        self._pending.append((
+            conversation_id,
+            time.time(),
+            kind,
+            text,
+            None if data is None else json.dumps(data, default=str),
+        ))
+        self.events += 1
+        self.pending_max = max(self.pending_max, len(self._pending))
+        if len(self._pending) >= self._batch_size:
+            self._wake.set()
+        return True
+
+    async def put(self, conversation_id: str, kind: str, *, text: Optional[str] = None,
+                  data: Optional[Dict[str, Any]] = None) -> bool:
+        """``record()``, waiting first while ``max_pending`` events are already buffered."""
+        self._start()
+        while len(self._pending) >= self._max_pending:
+            self._room.clear()
+            self._wake.set()
+            await self._room.wait()
+        return self.record(conversation_id, kind, text=text, data=data)
+
+    async def flush(self):
+        """Write everything buffered so far; what still fails is left to the background writer."""
+        self._start()
+        await self._flush_pending(attempts=self._close_attempts)
+
+    async def aclose(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if not await self._flush_pending(attempts=self._close_attempts):
+            logger.error(f"Session store closed with {len(self._pending)} events unwritten")
+        if self._db is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._db.close)
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "pending": len(self._pending),
+            "pending_max": self.pending_max,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "retries": self.retries,
+            "write_ms_max": round(self.write_ms_max, 1),
+        }
+
+
+class SessionRecorder(BaseObserver):
+    """Feeds one session's transcript, replies, tool calls and service metrics to a SessionStore.
+
+    Patient turns are final transcripts from ``stt``; bot replies are the LLM text between the
+    start and end of a response (marked ``interrupted`` when the patient barged in), plus
+    fixed phrases spoken through ``TTSSpeakFrame``. TTFB, processing time and token usage of
+    every service are recorded as sheddable ``metrics`` events. Observers run on their own task, so
+    waiting on the store never holds up the pipeline.
+    """
+
+    def __init__(self, store: SessionStore, conversation_id: str, *,
+                 stt: FrameProcessor, llm: FrameProcessor, **kwargs):
+        super().__init__(**kwargs)
+        self._store = store
+        self._conversation_id = conversation_id
+        self._stt = stt
+        self._llm = llm
+        self._reply: List[str] = []
+        self._in_reply = False
+
+    async def _put(self, kind: str, **kwargs):
+        await self._store.put(self._conversation_id, kind, **kwargs)
+
+    async def _end_reply(self, *, interrupted: bool):
+        text = "".join(self._reply).strip()
+        self._reply = []
+        self._in_reply = False
+        if text:
+            await self._put("assistant", text=text, data={"interrupted": True} if interrupted else None)
+
+    def _record_metrics(self, frame: MetricsFrame, source: FrameProcessor):
+        metrics = {}
+        for data in frame.data:
+            # Metrics frames travel down the whole pipeline; take them from their producer only.
+            if data.processor != source.name:
+                continue
+            if isinstance(data, TTFBMetricsData) and data.value:
+                metrics[f"{data.processor}.ttfb_ms"] = round(data.value * 1000)
+            elif isinstance(data, ProcessingMetricsData):
+                metrics[f"{data.processor}.processing_ms"] = round(data.value * 1000)
+            elif isinstance(data, LLMUsageMetricsData):
+                metrics[f"{data.processor}.prompt_tokens"] = data.value.prompt_tokens
+                metrics[f"{data.processor}.completion_tokens"] = data.value.completion_tokens
+        if metrics:
+            self._store.record(self._conversation_id, "metrics", data=metrics)
+
+    async def on_push_frame(self, data: FramePushed):
+        frame = data.frame
+        if data.direction != FrameDirection.DOWNSTREAM:
+            return
+
+        if isinstance(frame, MetricsFrame):
+            self._record_metrics(frame, data.source)
+        elif data.source is self._stt:
+            if isinstance(frame, TranscriptionFrame) and frame.text.strip():
+                await self._put("user", text=frame.text.strip(), data={"user_id": frame.user_id})
+        elif data.source is self._llm:
+            if isinstance(frame, LLMFullResponseStartFrame):
+                self._reply = []
+                self._in_reply = True
+            elif isinstance(frame, LLMTextFrame) and self._in_reply:
+                self._reply.append(frame.text)
+            elif isinstance(frame, LLMFullResponseEndFrame):
+                await self._end_reply(interrupted=False)
+            elif isinstance(frame, InterruptionFrame) and self._in_reply:
+                await self._end_reply(interrupted=True)
+            elif isinstance(frame, TTSSpeakFrame):
+                await self._put("assistant", text=frame.text, data={"phrase": True})
+            elif isinstance(frame, FunctionCallInProgressFrame):
+                await self._put("tool_call", text=frame.function_name, data={
+                    "tool_call_id": frame.tool_call_id, "arguments": frame.arguments,
+                })
+            elif isinstance(frame, FunctionCallResultFrame):
+                await self._put("tool_result", text=frame.function_name, data={
+                    "tool_call_id": frame.tool_call_id, "result": frame.result,
+                })
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+from pipecat.frames.frames import (
+    Frame,
+    InterimTranscriptionFrame,
+    InterruptionFrame,
+    TranscriptionFrame,
+)
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.openai.llm import OpenAILLMService
+
+from barge_in import CHARS_PER_TOKEN, InterruptibleOpenAILLMService
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_transcript(text: str) -> str:
+    """Interim and final transcripts differ in case and punctuation, not in words."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class SpeculationStats:
+    """Per-session counters for speculative completions."""
+
+    def __init__(self):
+        self.turns = 0
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.superseded = 0
+        self.wasted_output_tokens = 0
+        self.tool_prefetches = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats = dict(vars(self))
+        # Share of user turns answered from a speculation, and share of speculations thrown away.
+        stats["hit_rate"] = self.hits / self.turns if self.turns else 0.0
+        stats["waste_rate"] = (self.started - self.hits) / self.started if self.started else 0.0
+        return stats
+
+
+class PromptCacheStats:
+    """Per-session prompt tokens as reported by OpenAI, and the share served from its prompt cache.
+
+    OpenAI caches prompt prefixes of 1024 tokens and more, so the ratio only rises once the
+    system prompt, tools and history in front of the new turn stay byte-identical between calls.
+    """
+
+    def __init__(self):
+        self.completions = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.vision_completions = 0
+        self.vision_prompt_tokens = 0
+        self.vision_cached_tokens = 0
+
+    def record(self, usage, *, vision: bool):
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        self.completions += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_tokens += cached
+        if vision:
+            self.vision_completions += 1
+            self.vision_prompt_tokens += usage.prompt_tokens
+            self.vision_cached_tokens += cached
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats = dict(vars(self))
+        stats["cached_ratio"] = self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+        stats["vision_cached_ratio"] = (
+            self.vision_cached_tokens / self.vision_prompt_tokens if self.vision_prompt_tokens else 0.0
+        )
+        return stats
+
+
+def _has_image(message: Dict[str, Any]) -> bool:
+    content = message.get("content")
+    return isinstance(content, list) and any(part.get("type") == "image_url" for part in content)
+
+
+def _is_vision_request(params: Dict[str, Any]) -> bool:
+    messages = params.get("messages") or []
+    return bool(messages) and _has_image(messages[-1])
+
+
+class _Speculation:
+    """A completion started ahead of the end of turn, buffered until it is committed."""
+
+    def __init__(self, text: str, params: Dict[str, Any]):
+        self.text = text
+        self.params = params
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.committed = False
+        self.streamed_chars = 0
+        self.tool_calls: Dict[int, Dict[str, str]] = {}
+        self.task: Optional[asyncio.Task] = None
+        self._stream = None
+        self._changed = asyncio.Event()
+
+    def matches(self, params: Dict[str, Any]) -> bool:
+        messages = params.get("messages") or []
+        if not messages or len(messages) != len(self.params["messages"]):
+            return False
+        last = messages[-1]
+        if last.get("role") != "user" or not isinstance(last.get("content"), str):
+            return False
+        return (
+            normalize_transcript(last["content"]) == self.text
+            and messages[:-1] == self.params["messages"][:-1]
+            and params.get("tools") == self.params.get("tools")
+            and params.get("tool_choice") == self.params.get("tool_choice")
+        )
+
+    async def run(self, open_stream: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        try:
+            self._stream = await open_stream(self.params)
+            async for chunk in self._stream:
+                self._collect(chunk)
+                self.chunks.append(chunk)
+                self._changed.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+            if self._stream is not None and not self.committed:
+                await self._stream.close()
+
+    def _collect(self, chunk):
+        if not chunk.choices or not chunk.choices[0].delta:
+            return
+        delta = chunk.choices[0].delta
+        if delta.content:
+            self.streamed_chars += len(delta.content)
+        for tool_call in delta.tool_calls or []:
+            call = self.tool_calls.setdefault(tool_call.index, {"name": "", "arguments": ""})
+            if tool_call.function and tool_call.function.name:
+                call["name"] += tool_call.function.name
+            if tool_call.function and tool_call.function.arguments:
+                call["arguments"] += tool_call.function.arguments
+
+    def __aiter__(self):
+        return self._replay()
+
+    async def _replay(self):
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+                continue
+            if self.done:
+                break
+            self._changed.clear()
+            await self._changed.wait()
+        if self.error:
+            raise self.error
+
+    async def close(self):
+        """Abandon the completion (stream interface used on barge-in)."""
+        if self.task and not self.task.done():
+            self.committed = False
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        elif self._stream is not None:
+            await self._stream.close()
+
+
+class SpeculativeOpenAILLMService(InterruptibleOpenAILLMService):
+    """Starts the completion for a turn while the end-of-turn detector is still deciding.
+
+    ``TranscriptSpeculator`` calls ``speculate()`` with the patient's words once the interim
+    transcript has been stable for a while. The completion for the current context plus those
+    words is streamed into a buffer in the background. When the turn really ends and the
+    context arrives, the request is compared with the speculative one (same messages, last
+    user message equal up to case and punctuation): on a hit the buffered and still-arriving
+    chunks are replayed through the normal response path, so TTS starts without waiting for
+    the first token; otherwise the speculation is closed and the request goes out as usual.
+
+    When a speculative completion ends in a call to a function with a registered prefetcher
+    (``prefetch_function``), the prefetcher is started too, e.g. to warm the n8n webhook cache.
+
+    Hooks added with ``add_context_hook`` see every context before its completion is
+    requested, whichever side of the LLM it arrived from.
+    """
+
+    def __init__(self, *, speculate: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.speculation_stats = SpeculationStats()
+        self.prompt_cache_stats = PromptCacheStats()
+        self._speculate_enabled = speculate
+        self._speculation: Optional[_Speculation] = None
+        self._context = None
+        self._prefetchers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {}
+        self._prefetch_tasks: List[asyncio.Task] = []
+        self._context_hooks: List[Callable[[Any], Any]] = []
+        self.contexts_processed = 0
+
+    def prefetch_function(self, function_name: str,
+                          prefetcher: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        self._prefetchers[function_name] = prefetcher
+
+    def add_context_hook(self, hook: Callable[[Any], Any]):
+        """Call ``hook(context)`` on every context just before its completion is requested.
+
+        Context frames come downstream from the user aggregator and upstream from the
+        assistant aggregator once a function call result is in.
+        """
+        self._context_hooks.append(hook)
+
+    async def speculate(self, text: str):
+        """Start a completion for the context as if the patient's turn ended with ``text``."""
+        normalized = normalize_transcript(text)
+        if not self._speculate_enabled or not normalized:
+            return
+        # An image stays in the context until it has been answered; a speculation would pay
+        # for it again.
+        if not isinstance(self._context, OpenAILLMContext) or any(
+            _has_image(message) for message in self._context.get_messages()
+        ):
+            return
+        if self._speculation and self._speculation.text == normalized:
+            return
+        await self._discard_speculation(superseded=True)
+
+        params = dict(self._speculation_params())
+        params["messages"] = [*params["messages"], {"role": "user", "content": text}]
+        speculation = _Speculation(normalized, params)
+        speculation.task = self.create_task(self._run_speculation(speculation))
+        self._speculation = speculation
+        self.speculation_stats.started += 1
+        logger.debug(f"{self} speculating on: {text!r}")
+
+    def _speculation_params(self) -> Dict[str, Any]:
+        return {
+            "messages": list(self._context.get_messages()),
+            "tools": self._context.tools,
+            "tool_choice": self._context.tool_choice,
+        }
+
+    async def _run_speculation(self, speculation: _Speculation):
+        await speculation.run(lambda params: OpenAILLMService.get_chat_completions(self, params))
+        if speculation.error or not speculation.tool_calls:
+            return
+        for call in speculation.tool_calls.values():
+            prefetcher = self._prefetchers.get(call["name"])
+            if prefetcher is None:
+                continue
+            try:
+                arguments = json.loads(call["arguments"] or "{}")
+            except json.JSONDecodeError:
+                continue
+            self.speculation_stats.tool_prefetches += 1
+            task = self.create_task(self._prefetch(prefetcher, call["name"], arguments))
+            self._prefetch_tasks.append(task)
+            task.add_done_callback(self._prefetch_tasks.remove)
+
+    async def _prefetch(self, prefetcher, function_name: str, arguments: Dict[str, Any]):
+        try:
+            await prefetcher(arguments)
+        except Exception as e:
+            logger.debug(f"{self} prefetch of {function_name} failed: {e}")
+
+    async def _discard_speculation(self, *, superseded: bool):
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return
+        if superseded:
+            self.speculation_stats.superseded += 1
+        else:
+            self.speculation_stats.misses += 1
+        await speculation.close()
+        self.speculation_stats.wasted_output_tokens += speculation.streamed_chars // CHARS_PER_TOKEN
+
+    async def _record_usage(self, stream, *, vision: bool):
+        # pipecat's usage metrics leave out the cached part of the prompt.
+        async for chunk in stream:
+            if chunk.usage:
+                self.prompt_cache_stats.record(chunk.usage, vision=vision)
+            yield chunk
+
+    async def get_chat_completions(self, params):
+        vision = _is_vision_request(params)
+        speculation = self._speculation
+        if speculation is not None and speculation.matches(params):
+            self._speculation = None
+            speculation.committed = True
+            self.speculation_stats.hits += 1
+            self._active_stream = speculation
+            logger.debug(f"{self} speculation hit")
+            return self._record_usage(speculation, vision=vision)
+        if speculation is not None:
+            logger.debug(f"{self} speculation miss")
+            await self._discard_speculation(superseded=False)
+        return self._record_usage(await super().get_chat_completions(params), vision=vision)
+
+    async def _process_context(self, context):
+        for hook in self._context_hooks:
+            hook(context)
+        self._context = context
+        self.contexts_processed += 1
+        messages = context.get_messages()
+        if messages and messages[-1].get("role") == "user":
+            self.speculation_stats.turns += 1
+        await super()._process_context(context)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        # The patient started talking again: whatever was speculated is out of date.
+        if isinstance(frame, InterruptionFrame):
+            await self._discard_speculation(superseded=True)
+        await super().process_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._discard_speculation(superseded=True)
+        for task in list(self._prefetch_tasks):
+            await self.cancel_task(task)
+
+
+class TranscriptSpeculator(FrameProcessor):
+    """Feeds the patient's words to a ``SpeculativeOpenAILLMService`` once they stop changing.
+
+    Placed right after the STT service. The text of the turn is every final transcript since
+    the LLM last ran plus the current interim one, as the user context aggregator will
+    assemble it. ``stable_secs`` after it last changed, and if it has at least ``min_words``,
+    ``speculate()`` is called; at most ``max_per_turn`` speculations are started per turn.
+    """
+
+    def __init__(self, llm: SpeculativeOpenAILLMService, *, stable_secs: float = 0.5,
+                 min_words: int = 2, max_per_turn: int = 3):
+        super().__init__()
+        self._llm = llm
+        self._stable_secs = stable_secs
+        self._min_words = min_words
+        self._max_per_turn = max_per_turn
+        self._finals: List[str] = []
+        self._interim = ""
+        self._turn = -1
+        self._speculations = 0
+        self._timer: Optional[asyncio.Task] = None
+
+    def _text(self) -> str:
+        return " ".join([*self._finals, self._interim]).strip()
+
+    async def _update(self, text: str, final: bool):
+        if self._turn != self._llm.contexts_processed:
+            self._turn = self._llm.contexts_processed
+            self._finals = []
+            self._interim = ""
+            self._speculations = 0
+        previous = self._text()
+        if final:
+            if text.strip():
+                self._finals.append(text.strip())
+            self._interim = ""
+        else:
+            self._interim = text.strip()
+
+        # Interim results are resent unchanged; only a change restarts the stability clock.
+        text = self._text()
+        if text == previous and (self._timer or self._speculations):
+            return
+        if self._timer:
+            await self.cancel_task(self._timer)
+            self._timer = None
+        if len(text.split()) >= self._min_words and self._speculations < self._max_per_turn:
+            self._timer = self.create_task(self._speculate_when_stable(text))
+
+    async def _speculate_when_stable(self, text: str):
+        await asyncio.sleep(self._stable_secs)
+        self._timer = None
+        if self._turn == self._llm.contexts_processed:
+            self._speculations += 1
+            await self._llm.speculate(text)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TranscriptionFrame):
+            await self._update(frame.text, final=True)
+        elif isinstance(frame, InterimTranscriptionFrame):
+            await self._update(frame.text, final=False)
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._timer:
+            await self.cancel_task(self._timer)
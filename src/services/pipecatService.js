@@ -13,6 +13,7 @@ class PipecatService {
     this.onConversationUpdate = null;
     this.audioTrack = null;
     this.videoTrack = null;
+    this.videoSender = null;
     this.dataChannel = null;
     this.isAudioMuted = false;
     this.isVideoMuted = false;
@@ -52,7 +53,10 @@ class PipecatService {
       // Add local tracks to connection
       this.localStream.getTracks().forEach(track => {
         console.log(`📡 Adding ${track.kind} track to WebRTC connection`);
-        this.webrtcConnection.addTrack(track, this.localStream);
+        const sender = this.webrtcConnection.addTrack(track, this.localStream);
+        if (track.kind === 'video') {
+          this.videoSender = sender;
+        }
       });
 
       // Store audio and video tracks for debugging
@@ -72,6 +76,10 @@ class PipecatService {
         try {
           const message = JSON.parse(event.data);
           console.log('📨 Received message from bot:', message);
+          if (message.type === 'camera-control') {
+            this.setCameraSending(message.enabled);
+            return;
+          }
           
           // Notify components about conversation updates
           if (this.onConversationUpdate) {
@@ -115,6 +123,10 @@ class PipecatService {
           try {
             const message = JSON.parse(event.data);
             console.log('📨 Received message via incoming channel:', message);
+            if (message.type === 'camera-control') {
+              this.setCameraSending(message.enabled);
+              return;
+            }
             
             if (this.onConversationUpdate) {
               this.onConversationUpdate(message);
@@ -249,6 +261,26 @@ sendTextMessage(message) {
     }
   }
 
+  // The bot only looks at the camera around image requests; in between it asks us to stop
+  // sending it, so it is neither sent nor decoded. Acknowledged with a trackStatus signal.
+  async setCameraSending(enabled) {
+    if (!this.videoSender) {
+      return;
+    }
+    try {
+      await this.videoSender.replaceTrack(enabled ? this.videoTrack : null);
+      console.log(`📹 Camera ${enabled ? 'sent to' : 'withheld from'} bot`);
+      if (this.dataChannel && this.dataChannel.readyState === 'open') {
+        this.dataChannel.send(JSON.stringify({
+          type: 'signalling',
+          message: { type: 'trackStatus', receiver_index: 1, enabled }
+        }));
+      }
+    } catch (error) {
+      console.error('❌ Failed to switch camera sending:', error);
+    }
+  }
+
   // Set video mute state
   setVideoMuted(muted) {
     if (this.videoTrack) {
@@ -290,6 +322,7 @@ sendTextMessage(message) {
       this.remoteStream = null;
       this.audioTrack = null;
       this.videoTrack = null;
+      this.videoSender = null;
       this.isCallActive = false;
       this.isConnected = false;
       this.isAudioMuted = false;
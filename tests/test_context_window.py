@@ -0,0 +1,79 @@
+import asyncio
+
+from pipecat.frames.frames import Frame, TextFrame
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.processors.aggregators.openai_llm_context import (
+    OpenAILLMContext,
+    OpenAILLMContextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.tests.utils import run_test
+
+from context_window import ContextWindowManager, count_message_tokens
+from speculative_llm import SpeculativeOpenAILLMService
+
+MAX_TOKENS = 300
+
+
+class RecordingLLM(SpeculativeOpenAILLMService):
+    """Records the messages of every completion request instead of sending it."""
+
+    def __init__(self):
+        super().__init__(api_key="test", speculate=False)
+        self.requests = []
+
+    async def get_chat_completions(self, params):
+        self.requests.append(list(params["messages"]))
+
+        async def no_chunks():
+            return
+            yield
+
+        return no_chunks()
+
+
+class ToolResultRerun(FrameProcessor):
+    """Stands in for the assistant aggregator: adds a tool result and pushes the context upstream."""
+
+    def __init__(self, context: OpenAILLMContext):
+        super().__init__()
+        self._context = context
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, TextFrame) and frame.text == "tool result":
+            self._context.add_messages([
+                {"role": "assistant", "tool_calls": [{
+                    "id": "call_1", "type": "function",
+                    "function": {"name": "medical_assistant", "arguments": "{}"},
+                }]},
+                {"role": "tool", "tool_call_id": "call_1", "content": "dose guidance " * 40},
+            ])
+            await self.push_frame(OpenAILLMContextFrame(self._context), FrameDirection.UPSTREAM)
+            return
+        await self.push_frame(frame, direction)
+
+
+def consultation() -> OpenAILLMContext:
+    messages = [{"role": "system", "content": "You are a doctor."}]
+    for turn in range(8):
+        messages.append({"role": "user", "content": f"symptom {turn} " * 20})
+        messages.append({"role": "assistant", "content": f"advice {turn} " * 20})
+    messages.append({"role": "user", "content": "What dose should I take?"})
+    return OpenAILLMContext(messages=messages)
+
+
+def test_tool_result_rerun_is_kept_within_budget():
+    context = consultation()
+    llm = RecordingLLM()
+    window = ContextWindowManager(context, llm, max_tokens=MAX_TOKENS, compact_ratio=10.0)
+    pipeline = Pipeline([window, llm, ToolResultRerun(context)])
+
+    asyncio.run(run_test(pipeline, frames_to_send=[TextFrame("tool result")]))
+
+    assert len(llm.requests) == 1
+    messages = llm.requests[0]
+    assert messages[-1]["role"] == "tool"
+    assert messages[0]["role"] == "system"
+    assert sum(count_message_tokens(m) for m in messages) <= MAX_TOKENS
+    assert window.truncations > 0
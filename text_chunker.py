@@ -0,0 +1,156 @@
+import re
+from typing import Any, Dict
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    InterruptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TTSSpeakFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# Punctuation followed by whitespace; what follows the whitespace starts the next chunk.
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_CLAUSE_END = re.compile(r"[,;:—–]\s+|\s+[-—–]\s+")
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "vs", "e.g", "i.e", "etc", "approx"}
+
+# Markdown and list numbering the system prompt forbids, but which still slip through.
+_LIST_MARKER = re.compile(r"^[ \t]*(?:[-*+•]|\d{1,2}[.)])[ \t]+", re.M)
+_HEADING = re.compile(r"^[ \t]*#{1,6}[ \t]*", re.M)
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_EMPHASIS = re.compile(r"\*{1,3}|_{2,3}|`+|~~")
+_STRAY_SYMBOLS = re.compile(r"[#|•>]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def clean_for_speech(text: str, *, line_start: bool) -> str:
+    """Drop markdown emphasis, headings, links and list markers; collapse whitespace.
+
+    ``line_start`` says whether ``text`` begins a line, where a list marker may appear.
+    """
+    if line_start:
+        text = "\n" + text
+    text = _LIST_MARKER.sub("", text)
+    text = _HEADING.sub("", text)
+    text = _LINK.sub(r"\1", text)
+    text = _EMPHASIS.sub("", text)
+    text = _STRAY_SYMBOLS.sub(" ", text)
+    trailing = " " if text[-1:].isspace() else ""
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text + trailing if text else ""
+
+
+class ClauseTextAggregator(FrameProcessor):
+    """Streams LLM tokens to TTS in clause-sized chunks.
+
+    Placed between the LLM and the TTS service (which runs with ``aggregate_sentences=False``).
+    The first chunk of a response is flushed at the first clause or sentence boundary after
+    ``first_min_chars`` (or at a word boundary after ``first_max_chars``), so audio starts
+    early; later chunks wait for a boundary after ``min_chars`` and are cut at ``max_chars``,
+    so the rest of the reply goes out in a few well-phrased pieces rather than token by
+    token. A period after a digit or a common abbreviation is not a boundary.
+
+    Every chunk is cleaned for speech: markdown emphasis, headings, links, bullets and
+    ``1.``-style numbering (which the system prompt forbids) are removed.
+    """
+
+    def __init__(self, *, first_min_chars: int = 15, first_max_chars: int = 60,
+                 min_chars: int = 60, max_chars: int = 200):
+        super().__init__()
+        self._first_min_chars = first_min_chars
+        self._first_max_chars = first_max_chars
+        self._min_chars = min_chars
+        self._max_chars = max_chars
+        self._buffer = ""
+        self._first = True
+        self._line_start = True
+        self.responses = 0
+        self.tokens = 0
+        self.chunks = 0
+        self.chars_out = 0
+        self.chars_removed = 0
+
+    def _is_boundary(self, match: re.Match) -> bool:
+        if match.re is not _SENTENCE_END or self._buffer[match.start()] != ".":
+            return True
+        word = self._buffer[:match.start()].rsplit(None, 1)[-1:] or [""]
+        word = word[0].lower()
+        return not (word[-1:].isdigit() or word in _ABBREVIATIONS)
+
+    def _split_point(self) -> int:
+        """Index up to which the buffer should be flushed now, or 0 to keep waiting."""
+        min_chars = self._first_min_chars if self._first else self._min_chars
+        max_chars = self._first_max_chars if self._first else self._max_chars
+        patterns = (_SENTENCE_END, _CLAUSE_END) if self._first else (_SENTENCE_END,)
+        split = 0
+        for pattern in patterns:
+            for match in pattern.finditer(self._buffer):
+                if match.end() >= min_chars and self._is_boundary(match):
+                    split = match.end() if not split else min(split, match.end())
+                    break
+        if split:
+            return split
+        if len(self._buffer) >= max_chars:
+            # No boundary in sight: cut at a clause, else at the last space.
+            clauses = [m.end() for m in _CLAUSE_END.finditer(self._buffer, 0, max_chars)]
+            if clauses:
+                return clauses[-1]
+            space = self._buffer.rfind(" ", 0, max_chars)
+            return space + 1 if space > 0 else max_chars
+        return 0
+
+    async def _flush(self, end: int):
+        raw, self._buffer = self._buffer[:end], self._buffer[end:]
+        text = clean_for_speech(raw, line_start=self._line_start)
+        self._line_start = "\n" in raw[len(raw.rstrip()):]
+        self.chars_removed += len(raw) - len(text)
+        if text.strip():
+            self._first = False
+            self.chunks += 1
+            self.chars_out += len(text)
+            await self.push_frame(LLMTextFrame(text))
+
+    async def _flush_all(self):
+        if self._buffer:
+            await self._flush(len(self._buffer))
+
+    def _reset(self):
+        self._buffer = ""
+        self._first = True
+        self._line_start = True
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, LLMTextFrame) and not frame.skip_tts:
+            self.tokens += 1
+            self._buffer += frame.text
+            split = self._split_point()
+            while split:
+                await self._flush(split)
+                split = self._split_point()
+            return
+
+        if isinstance(frame, InterruptionFrame):
+            self._reset()
+        elif isinstance(frame, LLMFullResponseStartFrame):
+            self.responses += 1
+            self._reset()
+        elif isinstance(frame, (LLMFullResponseEndFrame, TTSSpeakFrame, EndFrame)):
+            await self._flush_all()
+            if isinstance(frame, LLMFullResponseEndFrame):
+                self._reset()
+
+        await self.push_frame(frame, direction)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "responses": self.responses,
+            "tokens_in": self.tokens,
+            "chunks_out": self.chunks,
+            "mean_chunk_chars": self.chars_out / self.chunks if self.chunks else 0.0,
+            "chars_removed": self.chars_removed,
+        }
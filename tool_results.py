@@ -0,0 +1,162 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from context_window import count_text_tokens
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "can", "do", "does", "for", "from", "how", "i", "in", "is", "it",
+    "my", "of", "on", "or", "should", "the", "to", "what", "when", "with", "you",
+}
+
+
+def _size(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _keywords(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    return {word for word in words if word not in _STOPWORDS and len(word) > 2}
+
+
+class ToolResultCompactor:
+    """Shrinks function-call results before they are added to the LLM context.
+
+    Whatever a tool returns stays in the conversation context for the rest of the session and
+    is sent again with every later prompt, so webhook payloads are cut down to what the model
+    needs to answer:
+
+    * only ``fields`` are kept (matched by key name or dotted path at any depth); if none of
+      them is present the payload is kept whole rather than emptied,
+    * empty values are dropped and lists are cut to ``max_list_items``,
+    * strings are whitespace-collapsed and cut to ``max_text_chars``; with ``extract`` and a
+      query, the sentences sharing the most words with the query are kept instead of the head,
+    * if the result is still over ``max_tokens``, the text limit is halved until it fits, and
+      as a last resort the serialized result is truncated.
+
+    ``stats()`` reports sizes before and after compaction for the whole worker.
+    """
+
+    def __init__(self, *, fields: Optional[Iterable[str]] = None, max_tokens: int = 400,
+                 max_text_chars: int = 1200, max_list_items: int = 5, extract: bool = True,
+                 min_text_chars: int = 150):
+        self._fields = {field.strip() for field in fields or () if field.strip()}
+        self._max_tokens = max_tokens
+        self._max_text_chars = max_text_chars
+        self._max_list_items = max_list_items
+        self._extract = extract
+        self._min_text_chars = min_text_chars
+        self.results = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.fields_dropped = 0
+        self.texts_truncated = 0
+        self.texts_extracted = 0
+
+    def _select(self, value: Any, path: str = "") -> Any:
+        """Keep only allow-listed keys; ``None`` when nothing under ``value`` is allowed."""
+        if isinstance(value, dict):
+            kept = {}
+            for key, item in value.items():
+                item_path = f"{path}.{key}" if path else str(key)
+                if key in self._fields or item_path in self._fields:
+                    kept[key] = item
+                    continue
+                selected = self._select(item, item_path)
+                if selected is None:
+                    self.fields_dropped += 1
+                else:
+                    kept[key] = selected
+            return kept or None
+        if isinstance(value, list):
+            kept = [selected for selected in (self._select(item, path) for item in value)
+                    if selected is not None]
+            return kept or None
+        return None
+
+    def _extract_relevant(self, text: str, query: str, limit: int) -> Optional[str]:
+        keywords = _keywords(query)
+        sentences = [s.strip() for s in _SENTENCE.split(text) if s.strip()]
+        if not keywords or len(sentences) < 2:
+            return None
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(keywords & _keywords(sentences[i])), i),
+        )
+        chosen: List[int] = []
+        length = 0
+        for i in ranked:
+            if not keywords & _keywords(sentences[i]):
+                break
+            if length + len(sentences[i]) + 1 > limit:
+                continue
+            chosen.append(i)
+            length += len(sentences[i]) + 1
+        if not chosen:
+            return None
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+    def _shrink(self, value: Any, query: Optional[str], limit: int) -> Any:
+        if isinstance(value, dict):
+            shrunk = {key: self._shrink(item, query, limit) for key, item in value.items()}
+            return {key: item for key, item in shrunk.items() if item not in (None, "", [], {})}
+        if isinstance(value, list):
+            return [self._shrink(item, query, limit) for item in value[:self._max_list_items]]
+        if not isinstance(value, str):
+            return value
+        text = " ".join(value.split())
+        if len(text) <= limit:
+            return text
+        if self._extract and query:
+            extracted = self._extract_relevant(text, query, limit)
+            if extracted:
+                self.texts_extracted += 1
+                return extracted
+        self.texts_truncated += 1
+        cut = text.rfind(" ", 0, limit)
+        return text[:cut if cut > limit // 2 else limit].rstrip(" ,;:") + "…"
+
+    def compact(self, data: Any, query: Optional[str] = None) -> Any:
+        raw = _size(data)
+        result = data
+        if self._fields and isinstance(data, (dict, list)):
+            result = self._select(data) or data
+        limit = self._max_text_chars
+        result = self._shrink(result, query, limit)
+        compacted = _size(result)
+        while count_text_tokens(compacted) > self._max_tokens and limit > self._min_text_chars:
+            limit //= 2
+            result = self._shrink(result, query, limit)
+            compacted = _size(result)
+        if count_text_tokens(compacted) > self._max_tokens:
+            result = {"text": self._shrink(compacted, None, self._min_text_chars * 2)}
+            compacted = _size(result)
+
+        self.results += 1
+        self.bytes_in += len(raw.encode())
+        self.bytes_out += len(compacted.encode())
+        tokens_in, tokens_out = count_text_tokens(raw), count_text_tokens(compacted)
+        self.tokens_in += tokens_in
+        self.tokens_out += tokens_out
+        if tokens_out < tokens_in:
+            logger.debug(f"Tool result compacted from {tokens_in} to {tokens_out} tokens")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "results": self.results,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "token_ratio": self.tokens_out / self.tokens_in if self.tokens_in else 1.0,
+            "fields_dropped": self.fields_dropped,
+            "texts_truncated": self.texts_truncated,
+            "texts_extracted": self.texts_extracted,
+        }
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+import uuid
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+from pipecat.frames.frames import Frame, TTSAudioRawFrame, TTSStartedFrame
+from pipecat.services.cartesia.tts import CartesiaTTSService
+from websockets.protocol import State
+
+from cartesia_pool import CartesiaConnectionPool
+
+CARTESIA_BYTES_URL = "https://api.cartesia.ai/tts/bytes"
+CARTESIA_VERSION = "2025-04-16"
+
+# Cached audio is pushed in 100 ms chunks, like a streamed response would be.
+CHUNK_SECS = 0.1
+
+
+class PhraseAudioCache:
+    """On-disk cache of synthesized PCM for fixed phrases, memory-mapped when played.
+
+    Entries are keyed by text, voice, model, speed, language and sample rate, stored as raw
+    16-bit mono PCM next to a small JSON file with approximate word timestamps. Mapped files
+    are shared by every session in the worker (and through the page cache, across workers).
+    """
+
+    def __init__(self, directory: str, *, api_key: Optional[str] = None):
+        self._directory = directory
+        self._api_key = api_key
+        self._mapped: Dict[str, Tuple[mmap.mmap, List[Tuple[str, float]]]] = {}
+        self._lock = threading.Lock()
+        self._warm_thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, *, voice_id: str, model: str, speed: Optional[str],
+            language: str, sample_rate: int) -> str:
+        raw = json.dumps([text.strip(), voice_id, model, speed, language, sample_rate])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self._directory, key)
+        return f"{base}.pcm", f"{base}.json"
+
+    def get(self, key: str) -> Optional[Tuple[mmap.mmap, List[Tuple[str, float]]]]:
+        """Mapped PCM and word timestamps for ``key``, or None when not cached."""
+        entry = self._mapped.get(key)
+        if entry is None:
+            pcm_path, words_path = self._paths(key)
+            if not os.path.exists(pcm_path) or not os.path.exists(words_path):
+                self.misses += 1
+                return None
+            with self._lock:
+                entry = self._mapped.get(key)
+                if entry is None:
+                    with open(pcm_path, "rb") as f:
+                        audio = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    with open(words_path) as f:
+                        words = [tuple(w) for w in json.load(f)]
+                    entry = self._mapped[key] = (audio, words)
+        self.hits += 1
+        return entry
+
+    def _synthesize(self, client: httpx.Client, text: str, *, voice_id: str, model: str,
+                    speed: Optional[str], language: str, sample_rate: int) -> bytes:
+        payload = {
+            "model_id": model,
+            "transcript": text,
+            "voice": {"mode": "id", "id": voice_id},
+            "output_format": {
+                "container": "raw",
+                "encoding": "pcm_s16le",
+                "sample_rate": sample_rate,
+            },
+            "language": language,
+        }
+        if speed:
+            payload["speed"] = speed
+        resp = client.post(
+            CARTESIA_BYTES_URL,
+            json=payload,
+            headers={"Cartesia-Version": CARTESIA_VERSION, "X-API-Key": self._api_key},
+        )
+        resp.raise_for_status()
+        return resp.content
+
+    @staticmethod
+    def _estimate_word_timestamps(text: str, duration: float) -> List[Tuple[str, float]]:
+        """Spread words over the clip in proportion to their length (the bytes API has no timestamps)."""
+        words = text.split()
+        total = sum(len(w) + 1 for w in words) or 1
+        timestamps, offset = [], 0
+        for word in words:
+            timestamps.append((word, duration * offset / total))
+            offset += len(word) + 1
+        return timestamps
+
+    def warm_up(self, phrases: Iterable[str], *, voice_id: str, model: str,
+                speed: Optional[str], language: str, sample_rate: int,
+                background: bool = False):
+        """Synthesize and store every phrase that is not cached yet.
+
+        With ``background=True`` this runs on a daemon thread; sessions that start before it
+        finishes just fall back to live synthesis.
+        """
+        if background:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(
+                    target=self.warm_up,
+                    args=(list(phrases),),
+                    kwargs=dict(voice_id=voice_id, model=model, speed=speed,
+                                language=language, sample_rate=sample_rate),
+                    name="tts-cache-warm-up",
+                    daemon=True,
+                )
+                self._warm_thread.start()
+            return
+
+        if not self._api_key:
+            logger.warning("No Cartesia API key, skipping TTS phrase cache warm-up")
+            return
+
+        os.makedirs(self._directory, exist_ok=True)
+        with httpx.Client(timeout=30) as client:
+            for text in phrases:
+                key = self.key(text, voice_id=voice_id, model=model, speed=speed,
+                               language=language, sample_rate=sample_rate)
+                pcm_path, words_path = self._paths(key)
+                if os.path.exists(pcm_path) and os.path.exists(words_path):
+                    continue
+                start = time.perf_counter()
+                try:
+                    audio = self._synthesize(client, text, voice_id=voice_id, model=model,
+                                             speed=speed, language=language,
+                                             sample_rate=sample_rate)
+                except Exception as e:
+                    logger.error(f"Unable to pre-render TTS phrase [{text}]: {e}")
+                    continue
+                words = self._estimate_word_timestamps(text, len(audio) / 2 / sample_rate)
+                # Write to temporary files and rename so readers never see a partial entry.
+                for path, data, mode in ((pcm_path, audio, "wb"),
+                                         (words_path, json.dumps(words), "w")):
+                    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                    with open(tmp_path, mode) as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                logger.info(
+                    f"Pre-rendered TTS phrase [{text[:40]}] in {(time.perf_counter() - start) * 1000:.0f} ms"
+                )
+
+
+class CachedCartesiaTTSService(CartesiaTTSService):
+    """CartesiaTTSService that plays pre-rendered audio for cached phrases without a network round-trip.
+
+    With ``connections`` the websocket is leased from the worker's pool rather than dialled,
+    and handed back when the session ends.
+    """
+
+    def __init__(self, *, phrase_cache: PhraseAudioCache,
+                 connections: Optional[CartesiaConnectionPool] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._phrase_cache = phrase_cache
+        self._connections = connections
+
+    async def _connect_websocket(self):
+        if self._connections is None:
+            return await super()._connect_websocket()
+        if self._websocket and self._websocket.state is State.OPEN:
+            return
+        if self._websocket:
+            # Cartesia closed it after 5 idle minutes; _receive_messages() reconnects.
+            await self._connections.release(self._websocket)
+            self._websocket = None
+        try:
+            self._websocket = await self._connections.lease(
+                f"{self._url}?api_key={self._api_key}&cartesia_version={self._cartesia_version}",
+                label="tts",
+            )
+        except Exception as e:
+            logger.error(f"{self} initialization error: {e}")
+            await self._call_event_handler("on_connection_error", f"{e}")
+
+    async def _disconnect_websocket(self):
+        if self._connections is None:
+            return await super()._disconnect_websocket()
+        try:
+            await self.stop_all_metrics()
+            if self._websocket:
+                # The next session starts clean: no context of ours is left generating.
+                if self._context_id and self._websocket.state is State.OPEN:
+                    await self._websocket.send(json.dumps({"context_id": self._context_id, "cancel": True}))
+                await self._connections.release(self._websocket)
+        except Exception as e:
+            logger.error(f"{self} error releasing websocket: {e}")
+        finally:
+            self._context_id = None
+            self._websocket = None
+
+    def _lookup(self, text: str):
+        # Only whole utterances can come from the cache; text streamed into an open
+        # Cartesia context has to keep going there to preserve ordering.
+        if self._context_id or not self.sample_rate:
+            return None
+        key = self._phrase_cache.key(
+            text,
+            voice_id=self._voice_id,
+            model=self.model_name,
+            speed=self._settings["speed"],
+            language=self._settings["language"],
+            sample_rate=self.sample_rate,
+        )
+        return self._phrase_cache.get(key)
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        cached = self._lookup(text)
+        if cached is None:
+            async for frame in super().run_tts(text):
+                yield frame
+            return
+
+        logger.debug(f"{self}: Playing cached TTS [{text}]")
+        audio, words = cached
+        yield TTSStartedFrame()
+        context_id = str(uuid.uuid4())
+        await self.create_audio_context(context_id)
+        self.start_word_timestamps()
+        chunk_size = int(self.sample_rate * CHUNK_SECS) * 2
+        for offset in range(0, len(audio), chunk_size):
+            await self.append_to_audio_context(
+                context_id,
+                TTSAudioRawFrame(
+                    audio=audio[offset:offset + chunk_size],
+                    sample_rate=self.sample_rate,
+                    num_channels=1,
+                ),
+            )
+        await self.add_word_timestamps(list(words) + [("TTSStoppedFrame", 0), ("Reset", 0)])
+        await self.remove_audio_context(context_id)
+        yield None
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from pipecat.audio.turn.smart_turn.base_smart_turn import BaseSmartTurn, SmartTurnParams
+
+from model_cache import ModelRegistry
+
+SMART_TURN_SAMPLE_RATE = 16000
+SMART_TURN_WINDOW_SECS = 8
+
+
+def _fit_to_window(audio: np.ndarray) -> np.ndarray:
+    """Keep the last 8 seconds of audio, left-padding with silence when shorter."""
+    max_samples = SMART_TURN_WINDOW_SECS * SMART_TURN_SAMPLE_RATE
+    if len(audio) > max_samples:
+        return audio[-max_samples:]
+    if len(audio) < max_samples:
+        return np.pad(audio, (max_samples - len(audio), 0), mode="constant")
+    return audio
+
+
+class BatchedSmartTurnAnalyzer(BaseSmartTurn):
+    """Per-session smart-turn analyzer that sends its predictions to a shared inference engine."""
+
+    def __init__(self, *, engine: "SmartTurnInferenceEngine", **kwargs):
+        super().__init__(**kwargs)
+        self._engine = engine
+
+    async def _predict_endpoint(self, audio_array: np.ndarray) -> Dict[str, Any]:
+        return await self._engine.predict(audio_array)
+
+
+class SmartTurnInferenceEngine:
+    """Cross-session batched end-of-turn inference.
+
+    Requests from every session that arrive within ``batch_window_ms`` of each other are
+    run as a single batched ONNX call on a worker thread (onnxruntime releases the GIL
+    while it runs), so the event loop never blocks on inference and N concurrent turn
+    checks cost roughly one model call instead of N.
+    """
+
+    def __init__(self, registry: ModelRegistry, *, batch_window_ms: float = 10.0,
+                 max_batch_size: int = 16, workers: int = 1, latency_window: int = 1000):
+        self._registry = registry
+        self._batch_window = batch_window_ms / 1000
+        self._max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="smart-turn")
+        self._pending: List[Tuple[np.ndarray, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._latencies = deque(maxlen=latency_window)
+        self._batches = 0
+        self._requests = 0
+
+    def turn_analyzer(self, *, sample_rate: Optional[int] = None,
+                      params: Optional[SmartTurnParams] = None) -> BatchedSmartTurnAnalyzer:
+        return BatchedSmartTurnAnalyzer(engine=self, sample_rate=sample_rate, params=params)
+
+    async def predict(self, audio: np.ndarray) -> Dict[str, Any]:
+        """Queue one segment for the next batch and wait for its prediction."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((_fit_to_window(audio), future, time.perf_counter()))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        loop = asyncio.get_running_loop()
+        audios = [audio for audio, _, _ in batch]
+        try:
+            probabilities, inference_time = await loop.run_in_executor(
+                self._executor, self._infer, audios
+            )
+        except Exception as e:
+            logger.error(f"Smart turn batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._batches += 1
+        self._requests += len(batch)
+        now = time.perf_counter()
+        for (_, future, queued_at), probability in zip(batch, probabilities):
+            total_time = now - queued_at
+            self._latencies.append(total_time)
+            if future.done():
+                continue
+            future.set_result({
+                "prediction": 1 if probability > 0.5 else 0,
+                "probability": float(probability),
+                "metrics": {"inference_time": inference_time, "total_time": total_time},
+            })
+
+    def _infer(self, audios: List[np.ndarray]) -> Tuple[np.ndarray, float]:
+        session, feature_extractor = self._registry.smart_turn()
+        start = time.perf_counter()
+        inputs = feature_extractor(
+            audios,
+            sampling_rate=SMART_TURN_SAMPLE_RATE,
+            return_tensors="np",
+            padding="max_length",
+            max_length=SMART_TURN_WINDOW_SECS * SMART_TURN_SAMPLE_RATE,
+            truncation=True,
+            do_normalize=True,
+        )
+        features = inputs.input_features.astype(np.float32)
+        outputs = session.run(None, {"input_features": features})
+        return outputs[0].reshape(-1), time.perf_counter() - start
+
+    def stats(self) -> Dict[str, float]:
+        """Batching efficiency and queue-to-result latency over the recent window."""
+        latencies = sorted(self._latencies)
+        p50 = latencies[len(latencies) // 2] if latencies else 0.0
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from pipecat.audio.turn.base_turn_analyzer import BaseTurnAnalyzer, EndOfTurnState
+from pipecat.audio.turn.smart_turn.base_smart_turn import BaseSmartTurn
+from pipecat.metrics.metrics import MetricsData
+
+# Pauses assumed for a speaker we have not heard pause yet (ms of silence after speech).
+PRIOR_PAUSES_MS = (300, 450, 600, 800, 1000, 1300)
+
+# How each turn can end.
+DECISIONS = ("model", "timeout", "max_timeout")
+
+
+class PauseModel:
+    """Recent mid-turn pauses of one speaker, starting from a prior that real pauses push out."""
+
+    def __init__(self, prior_ms: Iterable[float] = PRIOR_PAUSES_MS, window: int = 40):
+        self._pauses = deque(prior_ms, maxlen=window)
+        self.observed = 0
+
+    def add(self, pause_ms: float):
+        self._pauses.append(pause_ms)
+        self.observed += 1
+
+    def quantile(self, q: float) -> float:
+        pauses = sorted(self._pauses)
+        return pauses[min(len(pauses) - 1, int(q * len(pauses)))]
+
+
+class AdaptiveTurnAnalyzer(BaseTurnAnalyzer):
+    """Per-session end-of-turn controller around a smart-turn analyzer.
+
+    The wrapped analyzer still runs on every VAD stop and a "complete" verdict still ends the
+    turn at once. On an "incomplete" verdict, instead of a fixed ``stop_secs`` of silence, the
+    turn ends after a timeout taken from this speaker's own pause distribution: a high
+    quantile when the model is sure the patient is mid-sentence, a lower one when its
+    probability of completion is close to 0.5, times ``margin`` and clamped to
+    ``[min_stop_secs, max_stop_secs]``. The wrapped analyzer's ``stop_secs`` stays as a
+    backstop and should be ``max_stop_secs``.
+
+    Pauses are learned online from silences the patient ended by speaking again, either while
+    we were waiting or within ``resume_window_secs`` after we ended the turn (a cut-off).
+    ``last_decision`` says how the latest turn was ended (see ``DECISIONS``); the latency
+    observer breaks the end-of-turn time down by it.
+    """
+
+    def __init__(self, analyzer: BaseSmartTurn, *, min_stop_secs: float = 0.3,
+                 max_stop_secs: Optional[float] = None, margin: float = 1.2,
+                 confident_quantile: float = 0.95, borderline_quantile: float = 0.6,
+                 resume_window_secs: float = 1.5, pauses: Optional[PauseModel] = None):
+        super().__init__()
+        self._analyzer = analyzer
+        self._min_stop_ms = min_stop_secs * 1000
+        self._max_stop_ms = (max_stop_secs or analyzer.params.stop_secs) * 1000
+        self._margin = margin
+        self._confident_quantile = confident_quantile
+        self._borderline_quantile = borderline_quantile
+        self._resume_window_ms = resume_window_secs * 1000
+        self.pauses = pauses or PauseModel()
+        self._silence_ms = 0.0
+        self._timeout_ms: Optional[float] = None
+        # Decision of the turn just ended, and the silence at that point, to spot cut-offs.
+        self._ended_by: Optional[str] = None
+        self._ended_at_ms = 0.0
+        self.last_decision: Optional[str] = None
+        self.last_timeout_ms: Optional[float] = None
+        self.decisions = {decision: 0 for decision in DECISIONS}
+        self.cut_offs = {decision: 0 for decision in DECISIONS}
+
+    @property
+    def sample_rate(self) -> int:
+        return self._analyzer.sample_rate
+
+    def set_sample_rate(self, sample_rate: int):
+        self._analyzer.set_sample_rate(sample_rate)
+
+    @property
+    def speech_triggered(self) -> bool:
+        return self._analyzer.speech_triggered
+
+    @property
+    def params(self):
+        return self._analyzer.params
+
+    def timeout_ms(self, probability: Optional[float]) -> float:
+        """Silence after which a turn judged incomplete with ``probability`` is ended anyway."""
+        # 0 when the model is sure the turn goes on, 1 when it is on the fence.
+        doubt = min(max((probability or 0.0) / 0.5, 0.0), 1.0)
+        q = self._confident_quantile - (self._confident_quantile - self._borderline_quantile) * doubt
+        timeout = self.pauses.quantile(q) * self._margin
+        return min(max(timeout, self._min_stop_ms), self._max_stop_ms)
+
+    def _end_turn(self, decision: str):
+        self.decisions[decision] += 1
+        self.last_decision = decision
+        self._ended_by = decision
+        self._ended_at_ms = self._silence_ms
+        self._timeout_ms = None
+
+    def append_audio(self, buffer: bytes, is_speech: bool) -> EndOfTurnState:
+        chunk_ms = len(buffer) / 2 / (self.sample_rate / 1000)
+        if is_speech:
+            if self._silence_ms > 0 and self._timeout_ms is not None:
+                self.pauses.add(self._silence_ms)
+            elif self._silence_ms > 0 and self._ended_by is not None:
+                self.cut_offs[self._ended_by] += 1
+                self.pauses.add(self._silence_ms)
+                logger.debug(f"Turn ended by {self._ended_by} after {self._silence_ms:.0f} ms was a pause")
+            self._silence_ms = 0.0
+            self._ended_by = None
+        elif self._analyzer.speech_triggered or self._ended_by is not None:
+            self._silence_ms += chunk_ms
+            if self._ended_by is not None and self._silence_ms - self._ended_at_ms > self._resume_window_ms:
+                self._ended_by = None
+
+        state = self._analyzer.append_audio(buffer, is_speech)
+        if state == EndOfTurnState.COMPLETE:
+            self._end_turn("max_timeout")
+        elif self._timeout_ms is not None and self._silence_ms >= self._timeout_ms:
+            self._analyzer.clear()
+            self._end_turn("timeout")
+            state = EndOfTurnState.COMPLETE
+        return state
+
+    async def analyze_end_of_turn(self) -> Tuple[EndOfTurnState, Optional[MetricsData]]:
+        state, metrics = await self._analyzer.analyze_end_of_turn()
+        if state == EndOfTurnState.COMPLETE:
+            self._end_turn("model")
+        else:
+            self._timeout_ms = self.timeout_ms(getattr(metrics, "probability", None))
+            self.last_timeout_ms = self._timeout_ms
+        return state, metrics
+
+    def clear(self):
+        self._analyzer.clear()
+        self._silence_ms = 0.0
+        self._timeout_ms = None
+        self._ended_by = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "decisions": dict(self.decisions),
+            "cut_offs": dict(self.cut_offs),
+            "pauses_observed": self.pauses.observed,
+            "pause_p50_ms": self.pauses.quantile(0.5),
+            "pause_p95_ms": self.pauses.quantile(0.95),
+            "last_timeout_ms": self.last_timeout_ms,
+        }
@@ -0,0 +1,376 @@
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from loguru import logger
+from pipecat.frames.frames import CancelFrame, EndFrame, Frame, OutputImageRawFrame, StartFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.heygen.api import AvatarQuality
+
+
+class VideoLevel(NamedTuple):
+    name: str
+    avatar_quality: AvatarQuality
+    width: int
+    height: int
+    bitrate: int
+    framerate: int
+
+
+# Lowest to highest. "high" is the resolution and frame rate every session used to get.
+VIDEO_LEVELS = (
+    VideoLevel("low", AvatarQuality.low, 640, 360, 500_000, 15),
+    VideoLevel("medium", AvatarQuality.medium, 960, 540, 1_000_000, 20),
+    VideoLevel("high", AvatarQuality.high, 1280, 720, 2_000_000, 30),
+)
+
+# Recent decisions of every session on this worker, newest last.
+video_decisions: deque = deque(maxlen=200)
+
+
+class HostCpu:
+    """Host-wide CPU busy percentage, measured between calls at most every ``min_interval_secs``."""
+
+    def __init__(self, *, min_interval_secs: float = 1.0):
+        self._min_interval = min_interval_secs
+        self._checked_at = 0.0
+        self._times: Optional[List[int]] = None
+        self.percent_busy = 0.0
+
+    @staticmethod
+    def _read() -> Optional[List[int]]:
+        try:
+            with open("/proc/stat") as f:
+                return [int(value) for value in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+
+    def percent(self) -> float:
+        now = time.monotonic()
+        if now - self._checked_at < self._min_interval:
+            return self.percent_busy
+        self._checked_at = now
+        times = self._read()
+        if times is None:
+            # No /proc (e.g. macOS dev machines): fall back to the load average.
+            self.percent_busy = min(100.0, os.getloadavg()[0] / (os.cpu_count() or 1) * 100)
+            return self.percent_busy
+        if self._times is not None:
+            # Fields: user nice system idle iowait irq softirq steal ...
+            deltas = [now_t - then_t for now_t, then_t in zip(times, self._times)]
+            total = sum(deltas[:8])
+            if total > 0:
+                self.percent_busy = (total - deltas[3] - deltas[4]) / total * 100
+        self._times = times
+        return self.percent_busy
+
+
+host_cpu = HostCpu()
+
+
+def start_level(*, cpu_high: float = 85.0, cpu_low: float = 60.0) -> VideoLevel:
+    """Level a new session starts at, from the host CPU right now.
+
+    Avatar quality and output resolution are fixed when the HeyGen session and the transport
+    are created, so this is where they adapt; during the call only frame rate and bitrate do.
+    """
+    cpu = host_cpu.percent()
+    if cpu >= cpu_high:
+        level = VIDEO_LEVELS[0]
+    elif cpu >= cpu_low:
+        level = VIDEO_LEVELS[1]
+    else:
+        level = VIDEO_LEVELS[-1]
+    if level is not VIDEO_LEVELS[-1]:
+        logger.info(f"Host CPU at {cpu:.0f}%: starting session at {level.name} video")
+    return level
+
+
+def level_index(width: int, height: int) -> int:
+    """Index of the level with this output resolution (the highest one if none matches)."""
+    for index, level in enumerate(VIDEO_LEVELS):
+        if (level.width, level.height) == (width, height):
+            return index
+    return len(VIDEO_LEVELS) - 1
+
+
+class VideoSample(NamedTuple):
+    cpu_pct: float
+    queue_frames: int
+    egress_kbps: Optional[float]
+    loss: Optional[float]
+    # Bandwidth the receiver says it can take (aiortc's REMB target), when known
+    available_kbps: Optional[float] = None
+    # Most the encoder will send (its codec's max bitrate on aiortc), when known
+    max_kbps: Optional[float] = None
+
+
+class AdaptiveVideoController(FrameProcessor):
+    """Moves one session's avatar video between ``VIDEO_LEVELS`` as the host and network allow.
+
+    Placed between the avatar service and ``transport.output()``. Every ``interval_secs`` it
+    samples host CPU, the number of avatar frames waiting in the output transport, and, when
+    the transport exposes them, the video egress throughput and packet loss reported by
+    WebRTC (``connection``) or Daily. A level is dropped after ``degrade_after`` samples in a
+    row over any high-water mark and raised again only after ``upgrade_after`` samples under
+    all low-water marks, and never sooner than ``min_dwell_secs`` after the last change.
+
+    Egress is judged against the rate the sender can actually reach, since a constrained
+    uplink does not back up the output queue on aiortc. On WebRTC that is the encoder's
+    target bitrate, which aiortc sets from the receiver's REMB and clamps to the codec's range
+    (250 kbps to 1.5 Mbps for VP8); a level's bitrate counts only up to the codec's max. Egress
+    under ``egress_low`` of the target is pressure, and so is a receiver estimate under
+    ``egress_low`` of the level's reachable bitrate once the estimate has ramped up (it starts
+    at 500 kbps) or ``ramp_up_secs`` have passed. Going up needs egress at ``egress_high`` of
+    the target and, when the estimate is known, ``egress_high`` of the next level's reachable
+    bitrate.
+
+    A level change takes effect at once by dropping avatar frames down to the level's frame
+    rate and, on Daily, by updating the camera's max bitrate and frame rate. aiortc's encoder
+    keeps to the REMB target whatever the level, so on WebRTC a lower level spends the same
+    bandwidth on fewer, sharper frames. Every decision is logged, kept in ``decisions`` and in
+    the worker-wide ``video_decisions``.
+    """
+
+    def __init__(self, transport, *, connection=None, interval_secs: float = 2.0,
+                 cpu_high: float = 85.0, cpu_low: float = 60.0,
+                 queue_high: int = 10, queue_low: int = 2,
+                 loss_high: float = 0.05, loss_low: float = 0.01,
+                 egress_low: float = 0.7, egress_high: float = 0.9, ramp_up_secs: float = 20.0,
+                 degrade_after: int = 2, upgrade_after: int = 5, min_dwell_secs: float = 10.0,
+                 session_id: Optional[str] = None):
+        super().__init__()
+        self._transport = transport
+        self._connection = connection
+        self._interval = interval_secs
+        self._cpu_high, self._cpu_low = cpu_high, cpu_low
+        self._queue_high, self._queue_low = queue_high, queue_low
+        self._loss_high, self._loss_low = loss_high, loss_low
+        self._egress_low, self._egress_high = egress_low, egress_high
+        self._ramp_up_until = time.monotonic() + ramp_up_secs
+        self._ramped_up = False
+        self._degrade_after = degrade_after
+        self._upgrade_after = upgrade_after
+        self._min_dwell = min_dwell_secs
+        self._session_id = session_id or getattr(connection, "pc_id", None) or f"session-{id(self)}"
+        params = transport.output()._params
+        self._level = level_index(params.video_out_width, params.video_out_height)
+        self._transport_framerate = params.video_out_framerate
+        self._over = 0
+        self._under = 0
+        self._changed_at = time.monotonic()
+        self._next_frame_at = 0.0
+        self._bytes_sent: Optional[int] = None
+        self._bytes_sent_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.last_sample: Optional[VideoSample] = None
+        self.decisions: List[Dict[str, Any]] = []
+        self.frames_in = 0
+        self.frames_dropped = 0
+
+    @property
+    def level(self) -> VideoLevel:
+        return VIDEO_LEVELS[self._level]
+
+    def _queue_frames(self) -> int:
+        senders = getattr(self._transport.output(), "_media_senders", {})
+        return sum(
+            queue.qsize() for queue in
+            (getattr(sender, "_video_queue", None) for sender in senders.values())
+            if queue is not None
+        )
+
+    def _encoder_rates(self):
+        """The video encoder's target bitrate, which aiortc sets from the receiver's REMB, and
+        the most its codec will send, in kbps."""
+        for sender in self._connection.pc.getSenders():
+            if getattr(sender, "kind", None) == "video":
+                encoder = getattr(sender, "_RTCRtpSender__encoder", None)
+                target = getattr(encoder, "target_bitrate", None)
+                if target:
+                    # aiortc keeps the clamp as a constant of the codec's module
+                    codec_max = getattr(sys.modules.get(type(encoder).__module__), "MAX_BITRATE", None)
+                    return target / 1000, codec_max / 1000 if codec_max else None
+        return None, None
+
+    async def _egress(self):
+        """Cumulative video bytes sent (WebRTC) or send rate (Daily), packet loss, available rate
+        and the encoder's max rate."""
+        if self._connection is not None:
+            bytes_sent, loss = None, None
+            for stats in (await self._connection.pc.getStats()).values():
+                if getattr(stats, "kind", None) != "video":
+                    continue
+                if stats.type == "outbound-rtp":
+                    bytes_sent = (bytes_sent or 0) + stats.bytesSent
+                elif stats.type == "remote-inbound-rtp":
+                    loss = max(loss or 0.0, stats.fractionLost)
+            return (bytes_sent, None, loss, *self._encoder_rates())
+        client = getattr(getattr(self._transport, "_client", None), "_client", None)
+        if client is not None and hasattr(client, "get_network_stats"):
+            latest = client.get_network_stats().get("stats", {}).get("latest", {})
+            bits_per_sec = latest.get("videoSendBitsPerSecond")
+            kbps = None if bits_per_sec is None else bits_per_sec / 1000
+            return None, kbps, latest.get("videoSendPacketLoss"), None, None
+        return None, None, None, None, None
+
+    async def sample(self) -> VideoSample:
+        try:
+            bytes_sent, egress_kbps, loss, available_kbps, max_kbps = await self._egress()
+        except Exception as e:
+            logger.debug(f"{self} unable to read egress stats: {e}")
+            bytes_sent, egress_kbps, loss, available_kbps, max_kbps = None, None, None, None, None
+        if bytes_sent is not None:
+            now = time.monotonic()
+            if self._bytes_sent is not None and now > self._bytes_sent_at:
+                egress_kbps = (bytes_sent - self._bytes_sent) * 8 / 1000 / (now - self._bytes_sent_at)
+            self._bytes_sent, self._bytes_sent_at = bytes_sent, now
+        return VideoSample(host_cpu.percent(), self._queue_frames(), egress_kbps, loss,
+                           available_kbps, max_kbps)
+
+    @staticmethod
+    def _reachable_kbps(level: VideoLevel, sample: VideoSample) -> float:
+        """The level's bitrate, capped at what the encoder can send."""
+        level_kbps = level.bitrate / 1000
+        return min(level_kbps, sample.max_kbps) if sample.max_kbps else level_kbps
+
+    def _sending_kbps(self, sample: VideoSample) -> float:
+        """What the sender is trying to send now: the encoder's target when known."""
+        reachable = self._reachable_kbps(self.level, sample)
+        return min(reachable, sample.available_kbps) if sample.available_kbps else reachable
+
+    def _pressure(self, sample: VideoSample) -> Optional[str]:
+        """Why the session should go down a level now, if it should."""
+        sending_kbps = self._sending_kbps(sample)
+        reachable_kbps = self._reachable_kbps(self.level, sample)
+        if sample.available_kbps is not None and sample.available_kbps >= self._egress_high * reachable_kbps:
+            self._ramped_up = True
+        if sample.cpu_pct >= self._cpu_high:
+            return f"host cpu {sample.cpu_pct:.0f}%"
+        if sample.queue_frames >= self._queue_high:
+            return f"{sample.queue_frames} frames queued"
+        if sample.loss is not None and sample.loss >= self._loss_high:
+            return f"packet loss {sample.loss:.1%}"
+        if sample.egress_kbps is not None and sample.egress_kbps < self._egress_low * sending_kbps:
+            return f"egress {sample.egress_kbps:.0f} of {sending_kbps:.0f} kbps"
+        ramping_up = not self._ramped_up and time.monotonic() < self._ramp_up_until
+        if (sample.available_kbps is not None and not ramping_up
+                and sample.available_kbps < self._egress_low * reachable_kbps):
+            return f"available bandwidth {sample.available_kbps:.0f} of {reachable_kbps:.0f} kbps"
+        return None
+
+    def _egress_headroom(self, sample: VideoSample) -> bool:
+        """Whether the link carries what is sent now and, if known, has room for the next level."""
+        sending_kbps = self._sending_kbps(sample)
+        if sample.egress_kbps is not None and sample.egress_kbps < self._egress_high * sending_kbps:
+            return False
+        if sample.available_kbps is not None and self._level < len(VIDEO_LEVELS) - 1:
+            next_kbps = self._reachable_kbps(VIDEO_LEVELS[self._level + 1], sample)
+            return sample.available_kbps >= self._egress_high * next_kbps
+        return True
+
+    def _relaxed(self, sample: VideoSample) -> bool:
+        return (
+            sample.cpu_pct < self._cpu_low
+            and sample.queue_frames <= self._queue_low
+            and (sample.loss is None or sample.loss < self._loss_low)
+            and self._egress_headroom(sample)
+        )
+
+    async def evaluate(self, sample: VideoSample):
+        self.last_sample = sample
+        reason = self._pressure(sample)
+        self._over = self._over + 1 if reason else 0
+        self._under = self._under + 1 if self._relaxed(sample) else 0
+        if time.monotonic() - self._changed_at < self._min_dwell:
+            return
+        if self._over >= self._degrade_after and self._level > 0:
+            await self._set_level(self._level - 1, reason, sample)
+        elif self._under >= self._upgrade_after and self._level < len(VIDEO_LEVELS) - 1:
+            await self._set_level(self._level + 1, "load back to normal", sample)
+
+    async def _set_level(self, index: int, reason: str, sample: VideoSample):
+        previous, self._level = self.level, index
+        self._over = self._under = 0
+        self._changed_at = time.monotonic()
+        decision = {
+            "time": time.time(),
+            "session": self._session_id,
+            "from": previous.name,
+            "to": self.level.name,
+            "reason": reason,
+            **sample._asdict(),
+        }
+        self.decisions.append(decision)
+        video_decisions.append(decision)
+        logger.info(f"{self} video {previous.name} -> {self.level.name}: {reason}")
+        if hasattr(self._transport, "update_publishing"):
+            try:
+                await self._transport.update_publishing({
+                    "camera": {
+                        "sendSettings": {
+                            "maxQuality": "low",
+                            "encodings": {
+                                "low": {
+                                    "maxBitrate": self.level.bitrate,
+                                    "maxFramerate": self.level.framerate,
+                                }
+                            },
+                        }
+                    }
+                })
+            except Exception as e:
+                logger.warning(f"{self} unable to update video publishing: {e}")
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.evaluate(await self.sample())
+
+    def _keep_frame(self) -> bool:
+        if self.level.framerate >= self._transport_framerate:
+            return True
+        now = time.monotonic()
+        period = 1 / self.level.framerate
+        # A little early is fine: avatar frames arrive with jitter.
+        if now < self._next_frame_at - period / 4:
+            return False
+        # Stay on the frame grid unless we fell more than a frame behind.
+        self._next_frame_at = max(self._next_frame_at + period, now + period / 2)
+        return True
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, StartFrame) and self._task is None:
+            self._task = self.create_task(self._monitor())
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            await self._stop()
+        elif isinstance(frame, OutputImageRawFrame) and direction == FrameDirection.DOWNSTREAM:
+            self.frames_in += 1
+            if not self._keep_frame():
+                self.frames_dropped += 1
+                return
+
+        await self.push_frame(frame, direction)
+
+    async def _stop(self):
+        if self._task:
+            await self.cancel_task(self._task)
+            self._task = None
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "level": self.level.name,
+            "changes": len(self.decisions),
+            "frames_in": self.frames_in,
+            "frames_dropped": self.frames_dropped,
+            "last_sample": self.last_sample._asdict() if self.last_sample else None,
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import copy
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: case, surrounding punctuation and repeated whitespace don't matter."""
+    return re.sub(r"\s+", " ", query.strip().strip("?.!,").lower())
+
+
+class WebhookClient:
+    """Long-lived client for the medical_assistant n8n webhook.
+
+    Keeps one pooled keep-alive connection set for the whole worker, caches responses
+    per normalized query (TTL + LRU), and collapses concurrent identical queries from
+    different sessions into a single upstream request.
+    """
+
+    def __init__(self, url: Optional[str], auth: Optional[Tuple[str, str]] = None, *,
+                 timeout: float = 15.0, cache_ttl_secs: float = 300.0, cache_size: int = 256,
+                 max_connections: int = 20, keepalive_expiry_secs: float = 60.0,
+                 latency_window: int = 1000):
+        self._url = url
+        self._auth = auth
+        self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry_secs,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache_ttl = cache_ttl_secs
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._latencies = deque(maxlen=latency_window)
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._errors = 0
+        self._cancelled = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                headers={"Accept": "application/json"},
+            )
+        return self._client
+
+    def _cache_get(self, key: str):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return data
+
+    def _cache_put(self, key: str, data: Any):
+        self._cache[key] = (time.monotonic() + self._cache_ttl, data)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    async def query(self, query: str) -> Any:
+        """Return the webhook answer for ``query``, from cache when possible.
+
+        Raises the underlying ``httpx`` error when the upstream call fails; failures are
+        never cached.
+        """
+        key = normalize_query(query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self._hits += 1
+            return copy.deepcopy(cached)
+
+        self._misses += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(key, query))
+            self._in_flight[key] = task
+            task.add_done_callback(
+                lambda t: self._in_flight.pop(key) if self._in_flight.get(key) is t else None
+            )
+        else:
+            self._coalesced += 1
+
+        # Shield the shared request so one session giving up doesn't cancel it for the others;
+        # only when the last waiter is gone (e.g. every asker barged in) is it aborted.
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            data = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+                # A caller arriving before the task has finished cancelling starts a new one.
+                if self._in_flight.get(key) is task:
+                    del self._in_flight[key]
+                self._cancelled += 1
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+        return copy.deepcopy(data)
+
+    async def _fetch(self, key: str, query: str) -> Any:
+        start = time.perf_counter()
+        try:
+            resp = await self._get_client().get(
+                self._url, params={"query": query}, auth=self._auth
+            )
+            # Only answered requests count towards latency; aborted ones would pull it down.
+            self._latencies.append(time.perf_counter() - start)
+            resp.raise_for_status()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._errors += 1
+            raise
+
+        try:
+            data = resp.json()
+        except ValueError:
+            data = {"text": resp.text}
+        self._cache_put(key, data)
+        logger.debug(f"n8n webhook answered in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return data
+
+    def stats(self) -> Dict[str, float]:
+        latencies = sorted(self._latencies)
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "errors": self._errors,
+            "cancelled": self._cancelled,
+            "cached_entries": len(self._cache),
+            "upstream_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            "upstream_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
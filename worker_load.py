@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, NamedTuple, Optional
+
+from loguru import logger
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return 0.0
+
+
+class CapacityBudget(NamedTuple):
+    """What one worker may take on before it stops accepting sessions; 0 disables a limit."""
+
+    max_sessions: int = 8
+    # Process CPU, in percent of one core (the event loop runs on one).
+    max_cpu_pct: float = 90.0
+    max_loop_lag_ms: float = 200.0
+    max_rss_mb: float = 0.0
+
+
+class WorkerLoad:
+    """Active sessions, event-loop lag, CPU and memory of one bot worker process.
+
+    server.py polls ``snapshot()`` (``GET /worker/load``) to place new sessions on the
+    least-loaded worker and to learn which of its sessions have ended. Lag is how late a
+    short periodic sleep wakes up: a smoothed value for placement and the worst one since
+    the last snapshot. CPU is smoothed the same way.
+
+    ``capacity()`` holds this against ``budget``: a worker at any of its limits, or draining,
+    accepts no new session, so the calls it already runs keep their latency.
+    """
+
+    def __init__(self, *, interval_secs: float = 0.1, smoothing: float = 0.2,
+                 budget: CapacityBudget = CapacityBudget()):
+        self._interval = interval_secs
+        self._smoothing = smoothing
+        self.budget = budget
+        self._task: Optional[asyncio.Task] = None
+        self._sessions: Dict[str, float] = {}
+        self.sessions_started = 0
+        self.loop_lag_ms = 0.0
+        self._loop_lag_max_ms = 0.0
+        self.cpu_pct = 0.0
+        self.draining = False
+
+    def start(self):
+        """Start the lag probe on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def _probe(self):
+        cpu = time.process_time()
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            now, now_cpu = time.perf_counter(), time.process_time()
+            lag_ms = max(0.0, (now - start - self._interval) * 1000)
+            self.loop_lag_ms += self._smoothing * (lag_ms - self.loop_lag_ms)
+            self._loop_lag_max_ms = max(self._loop_lag_max_ms, lag_ms)
+            cpu_pct = (now_cpu - cpu) / (now - start) * 100
+            self.cpu_pct += self._smoothing * (cpu_pct - self.cpu_pct)
+            cpu = now_cpu
+
+    @contextmanager
+    def session(self, session_id: str):
+        """Count a session as active for the duration of the block."""
+        self.start()
+        self._sessions[session_id] = time.time()
+        self.sessions_started += 1
+        logger.debug(f"Worker {os.getpid()}: session {session_id} started, {len(self._sessions)} active")
+        try:
+            yield
+        finally:
+            self._sessions.pop(session_id, None)
+            logger.debug(f"Worker {os.getpid()}: session {session_id} ended, {len(self._sessions)} active")
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+    def capacity(self) -> Dict[str, Any]:
+        """Whether this worker takes new sessions, how many more, and which limits it is at."""
+        self.start()
+        budget = self.budget
+        usage = {
+            "sessions": (len(self._sessions), budget.max_sessions),
+            "cpu_pct": (self.cpu_pct, budget.max_cpu_pct),
+            "loop_lag_ms": (self.loop_lag_ms, budget.max_loop_lag_ms),
+            "rss_mb": (rss_mb(), budget.max_rss_mb),
+        }
+        utilization = {name: value / limit for name, (value, limit) in usage.items() if limit > 0}
+        at_limit = sorted(name for name, used in utilization.items() if used >= 1)
+        accepting = not self.draining and not at_limit
+        free_sessions = None
+        if budget.max_sessions > 0:
+            free_sessions = max(0, budget.max_sessions - len(self._sessions)) if accepting else 0
+        return {
+            "accepting": accepting,
+            "draining": self.draining,
+            "free_sessions": free_sessions,
+            "utilization": round(max(utilization.values(), default=0.0), 3),
+            "at_limit": at_limit,
+            "usage": {name: round(value, 1) for name, (value, _) in usage.items()},
+            "budget": budget._asdict(),
+        }
+
+    async def drain(self, *, timeout_secs: float = 300.0) -> bool:
+        """Stop accepting sessions and wait for the active ones to end; ``False`` on timeout."""
+        self.draining = True
+        logger.info(f"Worker {os.getpid()}: draining {len(self._sessions)} sessions")
+        deadline = time.monotonic() + timeout_secs
+        while self._sessions and time.monotonic() < deadline:
+            await asyncio.sleep(0.5)
+        if self._sessions:
+            logger.warning(f"Worker {os.getpid()}: {len(self._sessions)} sessions still active after drain")
+        return not self._sessions
+
+    def snapshot(self) -> Dict[str, Any]:
+        self.start()
+        loop_lag_max_ms, self._loop_lag_max_ms = self._loop_lag_max_ms, 0.0
+        return {
+            "pid": os.getpid(),
+            "active_sessions": len(self._sessions),
+            "sessions": list(self._sessions),
+            "sessions_started": self.sessions_started,
+            "loop_lag_ms": round(self.loop_lag_ms, 2),
+            "loop_lag_max_ms": round(loop_lag_max_ms, 2),
+            "capacity": self.capacity(),
+        }
+
+
+worker_load = WorkerLoad()